@@ -0,0 +1,146 @@
+"""Milestone achievements, checked only when a GameState field they depend on rises
+
+Every achievement is a set of minimums on GameState fields. The engine keeps
+one sorted threshold list per field; when GameState reports a field going
+from old to new, a bisect finds the achievements whose minimum on that field
+was just crossed, and only those are checked. An achievement is unlocked by
+whichever of its fields reaches its minimum last, so nothing else needs
+checking, and the cost per change stays flat however many achievements
+there are. Unlocks are kept per player in achievements.json, so each one
+happens once.
+"""
+import json
+import os
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ACHIEVEMENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "achievements.json")
+
+# GameState fields an achievement can require a minimum of
+FIELDS = ("level", "score", "total_keys", "keys_collected")
+
+# Rarity as passed to SpacePuzzleNFT.createAchievement
+COMMON, UNCOMMON, RARE, EPIC, LEGENDARY = range(5)
+
+@dataclass(frozen=True)
+class Achievement:
+    name: str
+    description: str
+    rarity: int
+    requires: Tuple[Tuple[str, int], ...]  # (GameState field, minimum value)
+
+def milestone(name: str, description: str, rarity: int, level: int, score: int, keys: int) -> Achievement:
+    """An achievement in the PRD's terms: a level reached, a score and keys in hand"""
+    return Achievement(name, description, rarity,
+                       (("level", level), ("score", score), ("total_keys", keys)))
+
+# PRD/achievements.md, levels 1 to 10
+MILESTONES = [
+    milestone("First Light", "You've entered the world of Space Puzzle. The journey begins!",
+              COMMON, 1, 100, 1),
+    milestone("Space Explorer", "Explored new frontiers of the galaxy. You've just scratched the surface.",
+              COMMON, 2, 250, 2),
+    milestone("Starship Pilot", "Mastered the art of piloting your starship through asteroid fields.",
+              UNCOMMON, 3, 400, 3),
+    milestone("Nebula Navigator", "Successfully navigated through the most dangerous nebula in the galaxy.",
+              UNCOMMON, 4, 600, 4),
+    milestone("Cosmic Champion", "Defeated the rogue AI in deep space. The galaxy is safe for now.",
+              RARE, 5, 800, 5),
+    milestone("Asteroid Slayer", "Destroyed 100+ asteroids to clear the way for the fleet.",
+              RARE, 6, 1000, 6),
+    milestone("Gravity Bender", "Survived the gravity field of a black hole and emerged victorious.",
+              EPIC, 7, 1200, 7),
+    milestone("Quantum Leap", "Unlocked the secrets of quantum travel and reached the unknown dimensions.",
+              EPIC, 8, 1500, 8),
+    milestone("Galactic Hero", "Heroically defeated the space invaders threatening the galaxy's core.",
+              LEGENDARY, 9, 2000, 9),
+    milestone("Starlord", "Achieved the highest honor in the galaxy by mastering all challenges of space.",
+              LEGENDARY, 10, 3000, 10),
+]
+
+class AchievementStore:
+    """Unlocks per player in a local JSON file, rewritten whole on each unlock"""
+
+    def __init__(self, path: str = ACHIEVEMENTS_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.players: Dict[str, Dict[str, float]] = json.load(f)
+        except (OSError, ValueError):
+            self.players = {}
+
+    def unlocked(self, player: str) -> Dict[str, float]:
+        """Achievement names the player has unlocked, with when"""
+        return self.players.setdefault(player, {})
+
+    def record(self, player: str, name: str, at: float):
+        self.unlocked(player)[name] = at
+        temp = self.path + ".tmp"
+        try:
+            with open(temp, "w") as f:
+                json.dump(self.players, f, indent=1)
+            os.replace(temp, self.path)
+        except OSError:
+            pass  # Kept in memory for this run; unlocking again next run is harmless
+
+class AchievementEngine:
+    """Checks achievements as GameState reports changes; attach() it to a GameState"""
+
+    def __init__(self, achievements: Iterable[Achievement], store: Optional[AchievementStore] = None,
+                 player: str = "local"):
+        self.achievements = list(achievements)
+        self.store = store
+        self.player = player
+        self.unlocked: Dict[str, float] = dict(store.unlocked(player)) if store else {}
+        self.on_unlock: Optional[Callable[[Achievement], None]] = None
+        self.state = None
+        self.checks = 0  # Achievements checked so far, to confirm the cost stays flat
+
+        # Per field, every minimum sorted, with the achievement each belongs to
+        entries: Dict[str, List[Tuple[int, int]]] = {}
+        for i, achievement in enumerate(self.achievements):
+            for field, minimum in achievement.requires:
+                if field not in FIELDS:
+                    raise ValueError(f"{achievement.name} requires unknown field {field!r}")
+                entries.setdefault(field, []).append((minimum, i))
+        self.thresholds: Dict[str, List[int]] = {}
+        self.owners: Dict[str, List[int]] = {}
+        for field, pairs in entries.items():
+            pairs.sort()
+            self.thresholds[field] = [minimum for minimum, _ in pairs]
+            self.owners[field] = [i for _, i in pairs]
+
+    def attach(self, state):
+        """Listen to state's changes, first unlocking anything it already meets"""
+        self.state = state
+        state.on_change = self.changed
+        for achievement in self.achievements:
+            self._check(achievement)
+
+    def changed(self, field: str, old: int, new: int):
+        """GameState field went from old to new; check what that crossed"""
+        if new <= old:
+            return  # Falling values cannot unlock anything
+        thresholds = self.thresholds.get(field)
+        if not thresholds:
+            return
+        owners = self.owners[field]
+        for i in range(bisect_right(thresholds, old), bisect_right(thresholds, new)):
+            self._check(self.achievements[owners[i]])
+
+    def _check(self, achievement: Achievement):
+        self.checks += 1
+        if achievement.name in self.unlocked:
+            return
+        state = self.state
+        for field, minimum in achievement.requires:
+            if getattr(state, field) < minimum:
+                return
+        at = time.time()
+        self.unlocked[achievement.name] = at
+        if self.store is not None:
+            self.store.record(self.player, achievement.name, at)
+        if self.on_unlock:
+            self.on_unlock(achievement)
@@ -0,0 +1,46 @@
+import pygame
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+Color = Tuple[int, int, int]
+
+class SpriteCache:
+    """Tinted sprite variants built once in the display's pixel format and shared"""
+
+    def __init__(self, max_variants: int = 64):
+        self.max_variants = max_variants
+        self.images: Dict[str, pygame.Surface] = {}
+        self.variants: "OrderedDict[Tuple[str, Optional[Color]], pygame.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, name: str, surface: pygame.Surface, alpha: bool = True) -> pygame.Surface:
+        """Convert a loaded image to the display format and keep it as a base image"""
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        self.images[name] = surface
+        return surface
+
+    def get(self, name: str, tint: Optional[Color] = None) -> pygame.Surface:
+        """The base image multiplied by tint, built on first use"""
+        if tint is None:
+            return self.images[name]
+        key = (name, tint)
+        surface = self.variants.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.images[name].copy()
+        surface.fill(tint, special_flags=pygame.BLEND_RGB_MULT)
+        self.variants[key] = surface
+        if len(self.variants) > self.max_variants:
+            # Least recently used variant goes first
+            self.variants.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.variants.clear()
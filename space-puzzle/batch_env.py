@@ -0,0 +1,308 @@
+"""Many independent games stepped together, for bots and training
+
+    env = BatchEnv(4096, seed=1)
+    obs = env.reset()
+    obs, rewards, dones = env.step(actions)   # actions: (N,) ints into engine.DIRECTIONS
+
+Each game follows the same rules as GameEngine and GameState: blocked moves,
+key collection, barriers that spend a key or end the game, teleporters, and
+the portal once every key is taken. Level scores and carried keys match
+GameState.complete_level. Game state lives in NumPy arrays, so one step
+costs a fixed number of array operations however many games there are.
+Finished games are reset at once to a fresh game on a newly drawn level.
+
+NumPy is optional for the game itself and only needed here.
+"""
+import multiprocessing
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("batch_env needs NumPy, which the game itself does not: "
+                      "pip install -r requirements-optional.txt") from error
+
+from engine import DIRECTIONS
+from game_state import (GameState, CompactLevel, DEFAULT_GRID, iter_bits,
+                        EMPTY, PORTAL, KEY, ASTEROID, BARRIER, TELEPORTER)
+from level_generator import generate_level_data
+from levelpack import LevelPack
+
+SHIP = 7  # Marks the ship's cell in observations, over whatever is beneath it
+
+class LevelPool:
+    """Pre-encoded layouts for each level number, drawn at random on reset
+
+    A level's pool is generated the first time it is needed. After every
+    refresh_every draws one entry is replaced by a newly generated layout,
+    so long runs keep seeing new levels without generating one per reset.
+    With a pack, its layouts for that level are used instead and nothing is
+    generated."""
+
+    def __init__(self, grid_size: Tuple[int, int] = DEFAULT_GRID, size: int = 64,
+                 refresh_every: int = 64, seed: int = 0, pack: Optional[LevelPack] = None):
+        self.grid_size = grid_size
+        self.cells = grid_size[0] * grid_size[1]
+        self.size = size
+        self.refresh_every = refresh_every
+        self.rng = random.Random(seed)  # For generation, which takes a random.Random
+        self.picker = np.random.default_rng(seed)
+        self.pack = pack
+        # The pack's seeds for each level number, indexed once rather than per fill
+        self.pack_seeds: Dict[int, List[int]] = {}
+        if pack is not None:
+            for number, pack_seed in pack.index:
+                self.pack_seeds.setdefault(number, []).append(pack_seed)
+        self.levels: Dict[int, Dict[str, np.ndarray]] = {}
+        self.draws: Dict[int, int] = {}
+        self.generated = 0
+
+    def encode(self, layout: CompactLevel) -> Tuple[np.ndarray, np.ndarray]:
+        """Cell codes, and the cell each cell leads to (its partner for teleporters)"""
+        codes = np.zeros(self.cells, np.uint8)
+        for board, code in ((layout.asteroids, ASTEROID), (layout.barriers, BARRIER),
+                            (layout.keys, KEY), (layout.teleporters, TELEPORTER)):
+            codes[list(iter_bits(board))] = code
+        codes[layout.portal] = PORTAL
+        leads = np.arange(self.cells, dtype=np.int32)
+        for first, second in layout.pairs.items():
+            leads[first] = second
+        return codes, leads
+
+    def _layouts(self, level_num: int, count: int) -> List[CompactLevel]:
+        seeds = self.pack_seeds.get(level_num)
+        if seeds:
+            return [self.pack.get(level_num, seed).layout for seed in seeds]
+        self.generated += count
+        return [generate_level_data(level_num, rng=self.rng, grid_size=self.grid_size).layout
+                for _ in range(count)]
+
+    def _fill(self, level_num: int) -> Dict[str, np.ndarray]:
+        layouts = self._layouts(level_num, self.size)
+        encoded = [self.encode(layout) for layout in layouts]
+        pool = {
+            "codes": np.stack([codes for codes, _ in encoded]),
+            "leads": np.stack([leads for _, leads in encoded]),
+            "start": np.array([layout.start for layout in layouts], np.int32),
+            "keys": np.array([bin(layout.keys).count("1") for layout in layouts], np.int32),
+        }
+        self.levels[level_num] = pool
+        self.draws[level_num] = 0
+        return pool
+
+    def draw(self, level_num: int, count: int) -> Dict[str, np.ndarray]:
+        """count random layouts of one level number, as arrays with a leading count axis"""
+        pool = self.levels.get(level_num)
+        if pool is None:
+            pool = self._fill(level_num)
+        if self.pack is None and self.refresh_every:
+            self.draws[level_num] += count
+            while self.draws[level_num] >= self.refresh_every:
+                self.draws[level_num] -= self.refresh_every
+                slot = self.rng.randrange(len(pool["start"]))
+                layout = self._layouts(level_num, 1)[0]
+                pool["codes"][slot], pool["leads"][slot] = self.encode(layout)
+                pool["start"][slot] = layout.start
+                pool["keys"][slot] = bin(layout.keys).count("1")
+        picks = self.picker.integers(0, len(pool["start"]), count)
+        return {name: array[picks] for name, array in pool.items()}
+
+class BatchEnv:
+    """N games in arrays, stepped with one call
+
+    A game ends (its done flag is set) on game over, after episode_levels
+    levels if that is set, or after max_steps moves on one level. Ended games
+    are reset within the same step, so the observation returned is already
+    the first of the next game. Rewards are the score each step earned.
+    Keys in hand, levels and scores are in the keys, level and score arrays."""
+
+    def __init__(self, num_envs: int, grid_size: Tuple[int, int] = DEFAULT_GRID, seed: int = 0,
+                 start_level: int = 1, episode_levels: Optional[int] = None, max_steps: int = 200,
+                 pool: Optional[LevelPool] = None):
+        self.num_envs = num_envs
+        self.width, self.height = grid_size
+        self.cells = self.width * self.height
+        self.start_level = start_level
+        self.episode_levels = episode_levels
+        self.max_steps = max_steps
+        self.pool = pool or LevelPool(grid_size, seed=seed)
+        self.rows = np.arange(num_envs)
+
+        self.codes = np.zeros((num_envs, self.cells), np.uint8)
+        self.leads = np.zeros((num_envs, self.cells), np.int32)
+        self.position = np.zeros(num_envs, np.int32)
+        self.keys_left = np.zeros(num_envs, np.int32)  # Keys still on the board
+        self.keys = np.zeros(num_envs, np.int32)  # GameState.total_keys
+        self.collected = np.zeros(num_envs, np.int32)  # GameState.keys_collected
+        self.level = np.zeros(num_envs, np.int32)
+        self.score = np.zeros(num_envs, np.int64)
+        self.steps = np.zeros(num_envs, np.int32)  # Moves on the current level
+        self.levels_done = np.zeros(num_envs, np.int32)  # Levels finished this game
+        self.truncated = np.zeros(num_envs, bool)  # Ended by max_steps in the last step
+        self._level_scores = np.zeros(1, np.int64)
+
+        directions = np.array(DIRECTIONS, np.int32)
+        self.dx, self.dy = directions[:, 0], directions[:, 1]
+        self.total_steps = 0
+        self.episodes = 0
+
+    def level_scores(self, top: int) -> np.ndarray:
+        """Score for finishing each level up to top, as GameState.complete_level gives it"""
+        if top >= len(self._level_scores):
+            size = max(top + 1, 2 * len(self._level_scores))
+            self._level_scores = np.array(
+                [0] + [round(100 * level * GameState.config_for_level(level).difficulty_multiplier)
+                       for level in range(1, size)], np.int64)
+        return self._level_scores
+
+    def _load(self, rows: np.ndarray):
+        """Put the games in rows onto a fresh layout of their current level"""
+        levels = self.level[rows]
+        for level_num in np.unique(levels):
+            chosen = rows[levels == level_num]
+            drawn = self.pool.draw(int(level_num), len(chosen))
+            self.codes[chosen] = drawn["codes"]
+            self.leads[chosen] = drawn["leads"]
+            self.position[chosen] = drawn["start"]
+            self.keys_left[chosen] = drawn["keys"]
+        self.steps[rows] = 0
+
+    def _reset_rows(self, rows: np.ndarray):
+        self.level[rows] = self.start_level
+        self.keys[rows] = 0
+        self.collected[rows] = 0
+        self.score[rows] = 0
+        self.levels_done[rows] = 0
+        self._load(rows)
+
+    def observe(self) -> np.ndarray:
+        """Cell codes per game, (N, height, width), with SHIP on the ship's cell"""
+        obs = self.codes.copy()
+        obs[self.rows, self.position] = SHIP
+        return obs.reshape(self.num_envs, self.height, self.width)
+
+    def reset(self) -> np.ndarray:
+        self._reset_rows(self.rows)
+        return self.observe()
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Apply one action per game; returns observations, rewards and done flags"""
+        actions = np.asarray(actions, np.intp)
+        width = self.width
+        x = self.position % width + self.dx[actions]
+        y = self.position // width + self.dy[actions]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < self.height)
+        target = np.where(inside, y * width + x, 0)
+        code = np.where(inside, self.codes[self.rows, target], ASTEROID)  # Off the grid blocks too
+
+        barrier = code == BARRIER
+        game_over = barrier & (self.keys == 0)
+        opened = barrier & ~game_over
+        moving = (code != ASTEROID) & ~game_over
+        self.keys -= opened
+        # Teleporters lead to their partner, every other cell to itself
+        landed = self.leads[self.rows, target]
+        self.position = np.where(moving, landed, self.position)
+
+        taken = moving & (code == KEY)
+        cleared = np.flatnonzero(opened | taken)
+        self.codes[cleared, target[cleared]] = EMPTY
+        self.keys += taken
+        self.collected += taken
+        self.keys_left -= taken
+
+        finished = moving & (code == PORTAL) & (self.keys_left == 0)
+        rewards = np.zeros(self.num_envs, np.float32)
+        done_levels = np.flatnonzero(finished)
+        if len(done_levels):
+            scores = self.level_scores(int(self.level[done_levels].max()))
+            rewards[done_levels] = scores[self.level[done_levels]]
+            self.score[done_levels] += scores[self.level[done_levels]]
+            self.level[done_levels] += 1
+            # As in GameState.complete_level, keys collected count again on completion
+            self.keys[done_levels] += self.collected[done_levels]
+            self.collected[done_levels] = 0
+            self.levels_done[done_levels] += 1
+
+        self.steps += 1
+        self.truncated = (self.steps >= self.max_steps) & ~finished & ~game_over
+        dones = game_over | self.truncated
+        if self.episode_levels is not None:
+            dones |= finished & (self.levels_done >= self.episode_levels)
+        ended = np.flatnonzero(dones)
+        if len(ended):
+            self._reset_rows(ended)
+        advancing = np.flatnonzero(finished & ~dones)
+        if len(advancing):
+            self._load(advancing)
+        self.total_steps += self.num_envs
+        self.episodes += len(ended)
+        return self.observe(), rewards, dones
+
+def _shard(conn, kwargs):
+    env = BatchEnv(**kwargs)
+    while True:
+        command, actions = conn.recv()
+        if command == "step":
+            conn.send(env.step(actions))
+        elif command == "reset":
+            conn.send(env.reset())
+        else:
+            conn.close()
+            return
+
+class ShardedBatchEnv:
+    """BatchEnv split across worker processes, with the same step() and reset()
+
+    Each worker holds num_envs // workers games (the first few one more) and
+    its own level pool. Actions and results travel over pipes, so shards pay
+    off once each holds a few thousand games."""
+
+    def __init__(self, num_envs: int, workers: int, seed: int = 0, **kwargs):
+        sizes = [num_envs // workers + (i < num_envs % workers) for i in range(workers)]
+        self.bounds = np.cumsum([0] + sizes)
+        self.num_envs = num_envs
+        self.pipes = []
+        self.processes = []
+        for i, size in enumerate(sizes):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard, args=(child, dict(kwargs, num_envs=size, seed=seed + i)), daemon=True)
+            process.start()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def reset(self) -> np.ndarray:
+        for pipe in self.pipes:
+            pipe.send(("reset", None))
+        return np.concatenate([pipe.recv() for pipe in self.pipes])
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        actions = np.asarray(actions)
+        for pipe, start, end in zip(self.pipes, self.bounds, self.bounds[1:]):
+            pipe.send(("step", actions[start:end]))
+        results = [pipe.recv() for pipe in self.pipes]
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def close(self):
+        for pipe in self.pipes:
+            pipe.send(("close", None))
+        for process in self.processes:
+            process.join(timeout=1.0)
+
+def throughput(env, seconds: float = 2.0, seed: int = 0) -> Tuple[float, float]:
+    """(game steps per second, games ended per second) under random actions"""
+    rng = np.random.default_rng(seed)
+    env.reset()
+    actions = rng.integers(0, len(DIRECTIONS), size=(64, env.num_envs))
+    steps = ended = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for batch in actions:
+            _, _, dones = env.step(batch)
+            ended += int(dones.sum())
+        steps += len(actions) * env.num_envs
+    elapsed = time.perf_counter() - started
+    return steps / elapsed, ended / elapsed
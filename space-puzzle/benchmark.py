@@ -0,0 +1,342 @@
+"""Benchmarks for the hot paths: level generation, validation, move logic and drawing
+
+    python benchmark.py                       # run everything, write bench_baseline.json
+    python benchmark.py --compare bench_baseline.json --threshold 0.2
+
+bench_baseline.json next to this file is the committed reference baseline.
+"""
+import argparse
+import array
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence
+
+from dataclasses import replace
+
+from game_state import GameState, PathValidator, DEFAULT_GRID
+from level_generator import generate_level_data
+from engine import GameEngine, LEVEL_COMPLETE, GAME_OVER
+from profiler import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAX_ATTEMPTS = 50  # generate_level_data tries this many layouts before recursing
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of samples given in seconds, reported in milliseconds"""
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples, default=0.0) * 1000,
+    }
+
+def peak_memory(run: Callable[[], Dict[str, float]]) -> float:
+    """Peak kilobytes allocated by a run, traced separately since tracing skews timings"""
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+def bench_generation(repeats: int) -> Dict[str, float]:
+    """generate_level_data throughput and tail latency over levels 1-50"""
+    rng = random.Random(1)
+    samples = []
+    fallbacks = 0
+    started = time.perf_counter()
+    for level_num in range(1, 51):
+        for _ in range(repeats):
+            t = time.perf_counter()
+            level = generate_level_data(level_num, rng=rng)
+            samples.append(time.perf_counter() - t)
+            if level.attempts > MAX_ATTEMPTS:
+                fallbacks += 1
+    elapsed = time.perf_counter() - started
+    result = {"levels_per_second": len(samples) / elapsed, "fallback_rate": fallbacks / len(samples)}
+    result.update(latency_summary(samples))
+    return result
+
+def level_fixtures(count: int = 60) -> List:
+    """A fixed set of layouts across the difficulty range, the same on every run"""
+    rng = random.Random(2024)
+    return [generate_level_data(1 + i % 50, rng=rng).layout for i in range(count)]
+
+def bench_validation(repeats: int) -> Dict[str, float]:
+    """PathValidator.solve_level latency on the fixed fixtures"""
+    fixtures = level_fixtures()
+    samples = []
+    for layout in fixtures:
+        for _ in range(repeats):
+            t = time.perf_counter()
+            PathValidator.solve_level(layout)
+            samples.append(time.perf_counter() - t)
+    result = {"solves_per_second": len(samples) / sum(samples)}
+    result.update(latency_summary(samples))
+    return result
+
+def bench_logic(moves: int) -> Dict[str, float]:
+    """Cost of one move through GameEngine.step, which replaced check_move"""
+    fixtures = level_fixtures()
+    rng = random.Random(3)
+    actions = [rng.randrange(4) for _ in range(moves)]
+    engine = GameEngine()
+    engine.load(fixtures[0])
+    loaded = 0
+    started = time.perf_counter()
+    for action in actions:
+        events = engine.act(action)
+        if events & (LEVEL_COMPLETE | GAME_OVER):
+            if events & GAME_OVER:
+                engine.state.reset_game()
+            loaded += 1
+            engine.load(fixtures[loaded % len(fixtures)])
+    elapsed = time.perf_counter() - started
+    return {"moves_per_second": moves / elapsed, "ns_per_move": elapsed / moves * 1e9}
+
+def bench_render(frames: int) -> Dict[str, float]:
+    """DrawInGameLoop frame time under the SDL dummy video driver"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.chdir(HERE)
+    import game
+
+    game.replay_dir = None
+    game.achievements.store = None  # Keep runs out of the player's unlocks
+    game.level_pipeline.start(1)
+    game.generate_level(1)
+
+    # Net memory blocks and garbage collections over each run of frames
+    allocations = {}
+
+    def collections() -> int:
+        return sum(generation["collections"] for generation in gc.get_stats())
+
+    def frame_times(prepare: Callable[[int], None]) -> Sequence[float]:
+        # Raw doubles, so recording a sample does not allocate a float object
+        samples = array.array("d", bytes(8 * frames))
+        blocks, collected = sys.getallocatedblocks(), collections()
+        for i in range(frames):
+            prepare(i)
+            t = time.perf_counter()
+            game.DrawInGameLoop()
+            samples[i] = time.perf_counter() - t
+        allocations[len(allocations)] = ((sys.getallocatedblocks() - blocks) / frames,
+                                         collections() - collected)
+        return samples
+
+    moves = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+    full = frame_times(lambda i: game.renderer.invalidate())
+    moving = frame_times(lambda i: game.handle_move(*moves[i % 4]) if not game.game_state.game_over
+                         else game.reset_game())
+    idle = frame_times(lambda i: None)
+    game.level_pipeline.stop()
+
+    result = {}
+    for index, (name, samples) in enumerate([("full", full), ("move", moving), ("idle", idle)]):
+        summary = latency_summary(samples)
+        result[f"{name}_frame_p50_ms"] = summary["p50_ms"]
+        result[f"{name}_frame_p95_ms"] = summary["p95_ms"]
+        blocks, collected = allocations[index]
+        result[f"{name}_blocks_per_frame"] = blocks
+        result[f"{name}_gc_collections"] = collected
+    return result
+
+def bench_levelpack(seeds: int) -> Dict[str, float]:
+    """Loading levels 1-20 back from a level pack by (level, seed)"""
+    import tempfile
+    from levelpack import LevelPack, write_pack, generate, pair_slots_for
+
+    level_nums = range(1, 21)
+    keys = [(level_num, seed) for seed in range(seeds) for level_num in level_nums]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.splp")
+        write_pack(path, generate(keys, DEFAULT_GRID), DEFAULT_GRID, pair_slots_for(level_nums, DEFAULT_GRID))
+        t = time.perf_counter()
+        pack = LevelPack(path)
+        opened = time.perf_counter() - t
+        samples = array.array("d")
+        for level_num, seed in keys:
+            t = time.perf_counter()
+            pack.get(level_num, seed)
+            samples.append(time.perf_counter() - t)
+        pack.close()
+    result = {"loads_per_second": len(samples) / sum(samples), "open_ms": opened * 1000}
+    result.update(latency_summary(samples))
+    return result
+
+def bench_batch_env(seconds: float) -> Dict[str, float]:
+    """BatchEnv steps under random actions, 4096 games on the standard grid"""
+    try:
+        from batch_env import BatchEnv, throughput
+    except ImportError:
+        print("  numpy is not installed, skipped")
+        return {}
+    env = BatchEnv(4096, seed=1)
+    steps, ended = throughput(env, seconds)
+    return {"steps_per_second": steps, "games_ended_per_second": ended}
+
+def bench_screening(count: int) -> Dict[str, float]:
+    """Batch prefilter throughput on the standard grid and on large grids"""
+    try:
+        from prefilter import throughput
+    except ImportError:
+        print("  numpy is not installed, skipped")
+        return {}
+    from level_generator import build_candidate
+
+    rng = random.Random(1)
+    result = {}
+    for width, height in [(6, 5), (16, 16), (64, 64)]:
+        if (width, height) == DEFAULT_GRID:
+            config = GameState.config_for_level(10)
+            candidates = count
+        else:
+            config = replace(GameState.large_grid_config(10, (width, height)), engine="sampler")
+            candidates = max(100, count * 30 // (width * height))
+        layouts = [build_candidate(config, rng) for _ in range(candidates)]
+        rate, rejected = throughput(layouts)
+        result[f"{width}x{height}_candidates_per_second"] = rate
+        result[f"{width}x{height}_rejected"] = rejected
+    return result
+
+_FIRST_FRAME = """
+import game
+game.level_pipeline.start(1)
+game.generate_level(1)
+game.DrawInGameLoop()
+game.level_pipeline.stop()
+"""
+
+def bench_startup(runs: int) -> Dict[str, float]:
+    """Wall time from launching a fresh interpreter to the first game frame"""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               PYGAME_HIDE_SUPPORT_PROMPT="1")
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, "-c", _FIRST_FRAME], cwd=HERE, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - t)
+    summary = latency_summary(samples)
+    return {"first_frame_p50_ms": summary["p50_ms"], "first_frame_max_ms": summary["max_ms"]}
+
+BENCHMARKS = {
+    "generation": lambda quick: bench_generation(2 if quick else 10),
+    "validation": lambda quick: bench_validation(3 if quick else 20),
+    "logic": lambda quick: bench_logic(50_000 if quick else 500_000),
+    "render": lambda quick: bench_render(100 if quick else 600),
+    "levelpack": lambda quick: bench_levelpack(20 if quick else 200),
+    "screening": lambda quick: bench_screening(2_000 if quick else 20_000),
+    "batch_env": lambda quick: bench_batch_env(1.0 if quick else 5.0),
+    "startup": lambda quick: bench_startup(3 if quick else 10),
+}
+
+# Results that describe the workload rather than its speed; never regressions
+INFORMATIONAL = ("fallback_rate", "_rejected")
+
+# Smallest absolute change per metric, by suffix, that can count as a
+# regression; below it run-to-run noise swamps the relative change
+NOISE_FLOORS = (
+    ("_ms", 0.25),
+    ("ns_per_move", 50.0),
+    ("_blocks_per_frame", 1.0),
+    ("_gc_collections", 1.0),
+    ("peak_kb", 64.0),
+    ("_per_second", 0.0),  # Averaged over the whole run; the threshold alone decides
+)
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_second")
+
+def noise_floor(metric: str) -> float:
+    for suffix, floor in NOISE_FLOORS:
+        if metric.endswith(suffix):
+            return floor
+    return 0.0
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Describe every metric that got worse than the baseline by more than
+    threshold and by more than its noise floor"""
+    regressions = []
+    for bench, metrics in current.get("results", {}).items():
+        for metric, value in metrics.items():
+            old = baseline.get("results", {}).get(bench, {}).get(metric)
+            if old is None or metric.endswith(INFORMATIONAL):
+                continue
+            worse = old - value if higher_is_better(metric) else value - old
+            if worse <= noise_floor(metric):
+                continue
+            if old == 0:
+                # No relative change from zero; anything past the floor counts
+                regressions.append(f"{bench}.{metric}: 0 -> {value:.4g}")
+            elif worse / old > threshold:
+                regressions.append(f"{bench}.{metric}: {old:.4g} -> {value:.4g} ({worse / old:+.0%} worse)")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma separated subset of " + ",".join(BENCHMARKS))
+    parser.add_argument("--output", help="where to write results "
+                        "(default bench_baseline.json, or nowhere when comparing)")
+    parser.add_argument("--compare", help="baseline file to check results against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fractional slowdown that counts as a regression")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if bool(baseline.get("meta", {}).get("quick")) != args.quick:
+            # Fewer iterations shift percentiles and warm-up; the numbers do not compare
+            print(f"{args.compare} was recorded {'with' if baseline.get('meta', {}).get('quick') else 'without'} "
+                  f"--quick; run the same way to compare against it")
+            return 2
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    results = {}
+    for name in names:
+        print(f"running {name}...", flush=True)
+        results[name] = BENCHMARKS[name](args.quick)
+        results[name]["peak_kb"] = peak_memory(lambda: BENCHMARKS[name](True))
+        for metric, value in results[name].items():
+            print(f"  {metric:<24} {value:12.4f}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+
+    status = 0
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            status = 1
+        else:
+            print(f"no regressions beyond {args.threshold:.0%}")
+    output = args.output or (None if args.compare else os.path.join(HERE, "bench_baseline.json"))
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {output}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Measure generated levels per difficulty tier and write the per-level config table
+
+    python calibrate.py                          # levels 1-50, 2000 levels per tier
+    python calibrate.py --trials 500 --workers 4 --output /tmp/level_table.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from game_state import GameState, LevelConfig, PathValidator, LEVEL_TABLE_PATH
+from level_generator import build_candidate, sample_level_data
+from profiler import percentile
+try:
+    from prefilter import screen_layouts
+except ImportError:  # NumPy not installed; every layout goes to the solver
+    screen_layouts = None
+
+MAX_ATTEMPTS = 50  # sample_level_data gives up and simplifies after this many
+CHUNK = 250  # Levels per worker task
+
+Tier = Tuple[int, int, int]  # keys, asteroids, teleporter pairs
+
+@dataclass
+class TierStats:
+    tier: Tier
+    trials: int = 0
+    solvable: int = 0
+    moves: List[int] = field(default_factory=list)
+    levels: int = 0  # Levels generated end to end by sample_level_data
+    attempts: int = 0  # Layouts those levels sampled, fallbacks included
+    fallbacks: int = 0
+
+    @property
+    def solvable_rate(self) -> float:
+        return self.solvable / self.trials if self.trials else 0.0
+
+    @property
+    def mean_attempts(self) -> float:
+        """Layouts sample_level_data sampled per level, including the accepted one"""
+        return self.attempts / self.levels if self.levels else 0.0
+
+    @property
+    def fallback_rate(self) -> float:
+        """Chance a level needs the retry-and-recurse path"""
+        return (1 - self.solvable_rate) ** MAX_ATTEMPTS
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "trials": self.trials,
+            "solvable_rate": round(self.solvable_rate, 4),
+            "mean_attempts": round(self.mean_attempts, 3),
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallback_rate,
+            "moves_p50": percentile(self.moves, 50),
+            "moves_p95": percentile(self.moves, 95),
+            "moves_max": max(self.moves, default=0),
+        }
+
+def _tier_config(tier: Tier) -> LevelConfig:
+    keys, asteroids, teleporters = tier
+    return LevelConfig(num_keys=keys, num_asteroids=asteroids, num_teleporters=teleporters,
+                       grid_size=(6, 5), difficulty_multiplier=1.0)
+
+def _run_chunk(task: Tuple[Tier, int, int]) -> Tuple[Tier, int, List[int], int, int]:
+    """Sample and solve count layouts for one tier, then generate count levels
+    the way the game does; returns the solvable count, their move counts and
+    the levels' total attempts and fallbacks"""
+    tier, seed, count = task
+    config = _tier_config(tier)
+    rng = random.Random(seed)
+    layouts = [build_candidate(config, rng) for _ in range(count)]
+    # Layouts the batch prefilter proves unsolvable skip the exact solve
+    plausible = screen_layouts(layouts) if screen_layouts else [True] * count
+    moves = []
+    for layout, keep in zip(layouts, plausible):
+        if not keep:
+            continue
+        result = PathValidator.solve_level(layout)
+        if result.solvable:
+            moves.append(result.moves)
+    attempts = fallbacks = 0
+    for _ in range(count):
+        level = sample_level_data(0, config, rng)
+        attempts += level.attempts
+        fallbacks += level.fallbacks
+    return tier, len(moves), moves, attempts, fallbacks
+
+def measure_tiers(tiers: List[Tier], trials: int, pool: ProcessPoolExecutor,
+                  seed: int = 0) -> Dict[Tier, TierStats]:
+    """Spread trials for every tier over the pool in fixed-size chunks"""
+    tasks = []
+    for index, tier in enumerate(tiers):
+        for start in range(0, trials, CHUNK):
+            tasks.append((tier, seed * 1_000_003 + index * 10_007 + start, min(CHUNK, trials - start)))
+    stats = {tier: TierStats(tier) for tier in tiers}
+    for (tier, _, count), (_, solvable, moves, attempts, fallbacks) in zip(tasks, pool.map(_run_chunk, tasks)):
+        stats[tier].trials += count
+        stats[tier].solvable += solvable
+        stats[tier].moves.extend(moves)
+        stats[tier].levels += count
+        stats[tier].attempts += attempts
+        stats[tier].fallbacks += fallbacks
+    return stats
+
+def _simpler(tier: Tier) -> Tier:
+    """The next tier down, reduced the way sample_level_data simplifies"""
+    keys, asteroids, teleporters = tier
+    return keys, max(1, asteroids - 2), max(0, teleporters - 1)
+
+def calibrate(levels: int, trials: int, min_rate: float, workers: int, seed: int = 0) -> Dict:
+    """For each level, the hardest tier at or below the difficulty curve whose
+    layouts are solvable at least min_rate of the time"""
+    curve = {level: GameState.curve_config(level) for level in range(1, levels + 1)}
+    wanted = {level: (c.num_keys, c.num_asteroids, c.num_teleporters) for level, c in curve.items()}
+    measured: Dict[Tier, TierStats] = {}
+    chosen: Dict[int, Tier] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while len(chosen) < levels:
+            # Measure every tier still needed in one parallel wave
+            needed = sorted({tier for level, tier in wanted.items()
+                             if level not in chosen and tier not in measured})
+            if needed:
+                print(f"measuring {len(needed)} tiers x {trials} levels...", flush=True)
+                measured.update(measure_tiers(needed, trials, pool, seed))
+            for level, tier in wanted.items():
+                if level in chosen:
+                    continue
+                if measured[tier].solvable_rate >= min_rate or tier == _simpler(tier):
+                    chosen[level] = tier
+                else:
+                    wanted[level] = _simpler(tier)
+
+    table = []
+    for level in range(1, levels + 1):
+        keys, asteroids, teleporters = chosen[level]
+        table.append({
+            "level": level,
+            "num_keys": keys,
+            "num_asteroids": asteroids,
+            "num_teleporters": teleporters,
+            "grid_size": list(curve[level].grid_size),
+            "difficulty_multiplier": curve[level].difficulty_multiplier,
+            "engine": curve[level].engine,
+            "stats": measured[chosen[level]].summary(),
+        })
+    return {
+        "meta": {"trials": trials, "min_rate": min_rate, "seed": seed,
+                 "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "levels": table,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, default=50)
+    parser.add_argument("--trials", type=int, default=2000, help="levels generated per tier")
+    parser.add_argument("--min-rate", type=float, default=0.5,
+                        help="lowest acceptable share of solvable layouts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=LEVEL_TABLE_PATH)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    table = calibrate(args.levels, args.trials, args.min_rate, args.workers, args.seed)
+    print(f"calibrated {args.levels} levels in {time.perf_counter() - started:.1f}s")
+    print("level  tier         solvable  attempts  moves p50/p95")
+    for row in table["levels"]:
+        stats = row["stats"]
+        tier = f"{row['num_keys']}k {row['num_asteroids']}a {row['num_teleporters']}t"
+        print(f"{row['level']:5}  {tier:<11} {stats['solvable_rate']:9.3f} {stats['mean_attempts']:9.2f}"
+              f"  {stats['moves_p50']:5}/{stats['moves_p95']}")
+    with open(args.output, "w") as f:
+        json.dump(table, f, indent=1)
+    print(f"wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
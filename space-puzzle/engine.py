@@ -0,0 +1,99 @@
+from typing import Optional, Tuple
+
+from game_state import GameState, CompactLevel
+
+# Event flags reported by GameEngine.step, combined with |
+MOVED = 1
+KEY_COLLECTED = 2
+BARRIER_OPENED = 4
+TELEPORTED = 8
+LEVEL_COMPLETE = 16
+GAME_OVER = 32
+BLOCKED = 64
+
+# Moves in the order used for integer actions
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+ACTIONS = {direction: action for action, direction in enumerate(DIRECTIONS)}
+
+class GameEngine:
+    """The game rules with no display, sound or sprites
+
+    Holds the GameState and a private copy of the level being played, and
+    applies one move at a time. Callers react to the returned event flags."""
+
+    def __init__(self, game_state: Optional[GameState] = None):
+        self.state = game_state or GameState()
+        self.layout: Optional[CompactLevel] = None
+        self.position = 0
+        self.previous = 0  # Cell the last move started from
+        self.moves = 0
+
+    def load(self, layout: CompactLevel):
+        """Start playing a level"""
+        self.layout = layout.copy()
+        self.position = self.layout.start
+        self.previous = self.position
+
+    @property
+    def grid_position(self) -> Tuple[int, int]:
+        return self.layout.geometry.position(self.position)
+
+    @property
+    def portal_active(self) -> bool:
+        return self.layout.keys == 0
+
+    def step(self, dx: int, dy: int) -> int:
+        """Apply one move, returning the event flags it caused"""
+        state = self.state
+        if state.game_over:
+            return BLOCKED
+        layout = self.layout
+        geometry = layout.geometry
+        width = geometry.width
+        x = self.position % width + dx
+        y = self.position // width + dy
+        self.previous = self.position
+
+        # Check if move is valid (within grid)
+        if x < 0 or x >= width or y < 0 or y >= geometry.height:
+            return BLOCKED
+        cell = y * width + x
+        bit = 1 << cell
+
+        # Check for asteroid (blocking)
+        if layout.asteroids & bit:
+            return BLOCKED
+
+        events = MOVED
+        # Check for barrier
+        if layout.barriers & bit:
+            if not state.use_key():  # Running out of keys ends the game
+                return GAME_OVER
+            layout.barriers &= ~bit
+            events |= BARRIER_OPENED
+
+        # Check for teleporter
+        elif layout.teleporters & bit:
+            self.position = layout.pairs[cell]
+            self.moves += 1
+            return events | TELEPORTED
+
+        self.position = cell
+        self.moves += 1
+        if layout.keys & bit:
+            layout.keys &= ~bit
+            state.collect_key()
+            events |= KEY_COLLECTED
+        if cell == layout.portal and not layout.keys:
+            state.complete_level()
+            events |= LEVEL_COMPLETE
+        return events
+
+    def act(self, action: int) -> int:
+        """step() with the move given as an index into DIRECTIONS"""
+        dx, dy = DIRECTIONS[action]
+        return self.step(dx, dy)
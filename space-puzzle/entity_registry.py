@@ -0,0 +1,59 @@
+from typing import Dict, Tuple, Iterable
+
+# Entity kinds, matching the MemoryManager pool names
+PORTALS = 'portals'
+KEYS = 'keys'
+BARRIERS = 'barriers'
+ASTEROIDS = 'asteroids'
+TELEPORTERS = 'teleporters'
+
+class EntityRegistry:
+    """Incrementally indexed sprites, by cell and by kind, for drawing
+
+    The rules live in GameEngine; this only finds the sprite on a cell when
+    the engine reports a change there. Teleporter partners come from the
+    layout's pair map and portal activation from GameEngine.portal_active,
+    both O(1), so the registry keeps no second copy of either."""
+
+    def __init__(self):
+        self.entities: Dict[int, object] = {}  # Insertion ordered for drawing
+        self.cells: Dict[Tuple[int, int], Dict[str, object]] = {}
+        self.kinds: Dict[str, Dict[int, object]] = {
+            PORTALS: {}, KEYS: {}, BARRIERS: {}, ASTEROIDS: {}, TELEPORTERS: {}
+        }
+
+    def clear(self):
+        """Forget every entity"""
+        self.entities.clear()
+        self.cells.clear()
+        for entities in self.kinds.values():
+            entities.clear()
+
+    def add(self, entity, kind: str):
+        self.entities[id(entity)] = entity
+        self.kinds[kind][id(entity)] = entity
+        self.cells.setdefault((entity.grid_x, entity.grid_y), {})[kind] = entity
+
+    def remove(self, entity, kind: str):
+        del self.entities[id(entity)]
+        del self.kinds[kind][id(entity)]
+        cell = (entity.grid_x, entity.grid_y)
+        del self.cells[cell][kind]
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def get(self, x: int, y: int, kind: str):
+        """The entity of a kind on a cell, if any"""
+        entities = self.cells.get((x, y))
+        if entities is None:
+            return None
+        return entities.get(kind)
+
+    def of_kind(self, kind: str) -> Iterable:
+        return self.kinds[kind].values()
+
+    def __iter__(self):
+        return iter(self.entities.values())
+
+    def __len__(self) -> int:
+        return len(self.entities)
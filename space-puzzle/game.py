@@ -1,9 +1,28 @@
+import time
+STARTED = time.perf_counter()
+
+import logging
+import os
 import pygame
-import random
-from collections import defaultdict
-from game_state import GameState, MemoryManager
+from game_state import GameState, MemoryManager, iter_bits
+from level_pipeline import LevelPipeline
+from levelpack import LevelPack
+from engine import (GameEngine, UP, DOWN, LEFT, RIGHT, DIRECTIONS, ACTIONS, KEY_COLLECTED, BARRIER_OPENED,
+                    TELEPORTED, LEVEL_COMPLETE, GAME_OVER)
+from renderer import DirtyRenderer, TextField, TextPanel, OverlayLayer, Camera, Sprite
+from profiler import FrameProfiler
+from scheduler import FrameScheduler, InputQueue, InputLatency, CpuMeter
+from replay import Replay
+from hints import HintService, MAX_CELLS as HINT_MAX_CELLS
+from achievements import AchievementEngine, AchievementStore, MILESTONES
+from assets import SpriteCache
+from entity_registry import EntityRegistry, PORTALS, KEYS, BARRIERS, ASTEROIDS, TELEPORTERS
+from startup import StartupTimer, init_subsystems, show_splash, load_parallel, load_font, load_scaled
 
-pygame.init()
+log = logging.getLogger(__name__)  # Reports go to the console through logging, not print()
+startup = StartupTimer(STARTED)
+startup.mark("imports")
+init_subsystems()
 
 # Game constants
 w_width = 660
@@ -11,468 +30,576 @@ w_height = 600
 GRID_SIZE = 80
 GRID_OFFSET_X = 100
 GRID_OFFSET_Y = 100
-GRID_COLS = 6
-GRID_ROWS = 5
+VIEW_COLS = 6  # Most cells shown at once; bigger grids scroll
+VIEW_ROWS = 6
+# Grid size, e.g. SPACE_PUZZLE_GRID=64x64 for large-grid mode
+GRID_COLS, GRID_ROWS = (int(n) for n in os.environ.get("SPACE_PUZZLE_GRID", "6x5").split("x"))
 
 # Initialize game window and state
 window = pygame.display.set_mode((w_width, w_height))
 pygame.display.set_caption("Space Puzzle")
+show_splash(window)
+startup.mark("display")
 game_state = GameState()
+engine = GameEngine(game_state)
 memory_manager = MemoryManager()
+# Pre-validated levels, e.g. SPACE_PUZZLE_PACK=levels.splp (see levelpack.py)
+PACK_PATH = os.environ.get("SPACE_PUZZLE_PACK")
+level_pack = LevelPack(PACK_PATH) if PACK_PATH else None
+if level_pack is not None and level_pack.grid_size != (GRID_COLS, GRID_ROWS):
+    raise SystemExit(f"{PACK_PATH} holds {level_pack.grid_size[0]}x{level_pack.grid_size[1]} levels, "
+                     f"the grid is {GRID_COLS}x{GRID_ROWS}")
+level_pipeline = LevelPipeline(depth=3, grid_size=(GRID_COLS, GRID_ROWS), pack=level_pack)
+profiler = FrameProfiler()
+
+# Every game is driven by its own seed and recorded so it can be replayed
+replay = Replay(seed=level_pipeline.seed, grid_size=(GRID_COLS, GRID_ROWS))
+replay_dir = "replays"  # None to stop saving replays
+
+# H shows the best next move, searched off the main thread
+hints = HintService()
+show_hints = False
+hints_available = GRID_COLS * GRID_ROWS <= HINT_MAX_CELLS
+HINT_READY = pygame.event.custom_type()
+# Answers arrive on the worker thread; an event wakes the loop if it is idle
+hints.on_answer = lambda: pygame.event.post(pygame.event.Event(HINT_READY))
+
+# Scores are sent from a background queue when an endpoint is configured
+SUBMIT_URL = os.environ.get("SPACE_PUZZLE_SUBMIT_URL")
+PLAYER = os.environ.get("SPACE_PUZZLE_PLAYER", "local")
+submissions = None
+if SUBMIT_URL:
+    # Imported only when needed, asyncio and http add noticeably to startup
+    from submission import SubmissionQueue, HttpEndpoint
+    submissions = SubmissionQueue(HttpEndpoint(SUBMIT_URL))
+
+# Milestones from PRD/achievements.md, each unlocked once per player
+# (attached to game_state once the HUD exists, below)
+achievements = AchievementEngine(MILESTONES, AchievementStore(), PLAYER)
+
+# Loading images and sounds side by side while the splash is up
+media = load_parallel({
+    "bg": lambda: load_scaled("media/bg.png", (w_width, w_height)),
+    "spaceship": lambda: pygame.image.load("media/spaceship.png"),
+    "asteroid": lambda: pygame.image.load("media/alien1.png"),
+    "key": lambda: pygame.image.load("media/alien_bullet.png"),
+    "portal": lambda: pygame.image.load("media/alien3.png"),
+    "barrier": lambda: pygame.image.load("media/alien4.png"),
+    "collect": lambda: pygame.mixer.Sound("media/laser.wav"),
+    "complete": lambda: pygame.mixer.Sound("media/explosion2.wav"),
+    "error": lambda: pygame.mixer.Sound("media/explosion.wav"),
+})
+startup.mark("assets")
 
-# Loading images
-bg = pygame.image.load("media/bg.png")
-bg = pygame.transform.scale(bg, (w_width, w_height))
-spaceship_img = pygame.image.load("media/spaceship.png")
-asteroid_img = pygame.image.load("media/alien1.png")
-key_img = pygame.image.load("media/alien_bullet.png")
-portal_img = pygame.image.load("media/alien3.png")
-barrier_img = pygame.image.load("media/alien4.png")
+# Images are converted once to the display's pixel format
+sprites = SpriteCache()
+bg = sprites.register("bg", media["bg"], alpha=False)
+spaceship_img = sprites.register("spaceship", media["spaceship"])
+asteroid_img = sprites.register("asteroid", media["asteroid"])
+key_img = sprites.register("key", media["key"])
+portal_img = sprites.register("portal", media["portal"])
+barrier_img = sprites.register("barrier", media["barrier"])
 
-# Import sounds
-collect_sound = pygame.mixer.Sound("media/laser.wav")
-complete_sound = pygame.mixer.Sound("media/explosion2.wav")
-error_sound = pygame.mixer.Sound("media/explosion.wav")
+# Teleporters are a white disc tinted per pair
+teleporter_img = pygame.Surface((64, 64), pygame.SRCALPHA)
+pygame.draw.circle(teleporter_img, (255, 255, 255), (32, 32), 25)
+teleporter_img = sprites.register("teleporter", teleporter_img)
+
+collect_sound = media["collect"]
+complete_sound = media["complete"]
+error_sound = media["error"]
 
 # Game variables
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("helvetica", 30, 1, 1)
-game_objects = []
-grid_objects = defaultdict(list)
+# One wait per frame; moves are queued as they are read and applied on fixed logic steps
+scheduler = FrameScheduler(fps=60, tick_rate=60)
+move_queue = InputQueue()
+input_latency = InputLatency()
+cpu_meter = CpuMeter()  # CPU use while playing, waiting for input, paused and on game over
+MOVE_KEYS = {pygame.K_UP: UP, pygame.K_DOWN: DOWN, pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+font = load_font("helvetica", 30, 1, 1)
+entities = EntityRegistry()
+hud_fields = [
+    TextField(font, "Level: {}", (10, 10)),
+    TextField(font, "Total Keys: {}", (10, 50)),
+    TextField(font, "Score: {}", (10, 90)),
+    TextField(font, "High Score: {}", (10, 130)),
+]
+# F3 shows per-phase frame timings, F4 writes them to CSV
+profile_panel = TextPanel(load_font("monospace", 14), (w_width - 10, 10), anchor="topright")
+PROFILE_REFRESH_FRAMES = 30
+hint_outline = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
+pygame.draw.rect(hint_outline, (255, 220, 0), hint_outline.get_rect(), 3)
+hint_marker = Sprite(hint_outline, (0, 0))
+hint_cell = None  # Cell the current hint says to move into
+# One line along the bottom for short messages
+notice = TextField(load_font("monospace", 14), "{}", (10, w_height - 18))
+cell_scratch = pygame.Rect(0, 0, GRID_SIZE, GRID_SIZE)
+pause_layer = OverlayLayer(alpha=128)
+game_over_layer = OverlayLayer(alpha=192)
+startup.mark("fonts")
 
 # Classes
-class Spaceship():
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = 75
-        self.height = 75
-        self.vel = 8
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.grid_x = 0
-        self.grid_y = 0
-        
-    def draw(self, window):
-        window.blit(spaceship_img, (self.x, self.y))
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+class GridSprite:
+    """Something drawn in a grid cell, placed on screen through the camera
+
+    Slotted, and re-initialised through reset() so MemoryManager can hand the
+    same objects out again on later levels. The rect is moved in place."""
+    __slots__ = ("grid_x", "grid_y", "x", "y", "rect")
+    width = 64
+    height = 64
+    inset = 0  # Offset of the image within its cell
+    
+    def __init__(self, grid_x, grid_y, *args):
+        self.rect = pygame.Rect(0, 0, self.width, self.height)
+        self.reset(grid_x, grid_y, *args)
         
-    def move_to_grid(self, grid_x, grid_y):
-        # Convert grid position to pixel coordinates
+    def reset(self, grid_x, grid_y):
         self.grid_x = grid_x
         self.grid_y = grid_y
-        self.x = 100 + (grid_x * 80)
-        self.y = 100 + (grid_y * 80)
+        self.place()
         
-class Asteroid():
-    def __init__(self, grid_x, grid_y):
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        self.x = 100 + (grid_x * 80)
-        self.y = 100 + (grid_y * 80)
-        self.width = 64
-        self.height = 64
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+    def place(self):
+        # Convert grid position to pixel coordinates for the current camera
+        x, y = camera.to_screen(self.grid_x, self.grid_y)
+        self.x = x + self.inset
+        self.y = y + self.inset
+        self.rect.x = self.x
+        self.rect.y = self.y
         
     def draw(self, window):
-        window.blit(asteroid_img, (self.x, self.y))
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        surface = self.image()
+        if surface is not None:
+            window.blit(surface, self.rect)
+
+class Spaceship(GridSprite):
+    __slots__ = ("vel",)
+    width = 75
+    height = 75
+    
+    def reset(self, grid_x, grid_y):
+        super().reset(grid_x, grid_y)
+        self.vel = 8
         
-class Key():
-    def __init__(self, grid_x, grid_y, color=(255, 255, 255)):
+    def image(self):
+        return spaceship_img
+        
+    def move_to_grid(self, grid_x, grid_y):
         self.grid_x = grid_x
         self.grid_y = grid_y
-        self.x = GRID_OFFSET_X + (grid_x * GRID_SIZE) + 20
-        self.y = GRID_OFFSET_Y + (grid_y * GRID_SIZE) + 20
-        self.width = 30
-        self.height = 30
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        self.place()
+        
+class Asteroid(GridSprite):
+    __slots__ = ()
+    
+    def image(self):
+        return asteroid_img
+        
+class Key(GridSprite):
+    __slots__ = ("collected", "color")
+    width = 30
+    height = 30
+    inset = 20
+    
+    def reset(self, grid_x, grid_y, color=(255, 255, 255)):
+        super().reset(grid_x, grid_y)
         self.collected = False
         self.color = color
         
-    def draw(self, window):
-        if not self.collected:
-            key_surface = key_img.copy()
-            key_surface.fill(self.color, special_flags=pygame.BLEND_RGB_MULT)
-            window.blit(key_surface, (self.x, self.y))
-            self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+    def image(self):
+        if self.collected:
+            return None
+        return sprites.get("key", self.color)
             
-class Portal():
-    def __init__(self, grid_x, grid_y):
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        self.x = 100 + (grid_x * 80)
-        self.y = 100 + (grid_y * 80)
-        self.width = 64
-        self.height = 64
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+class Portal(GridSprite):
+    __slots__ = ("active",)
+    
+    def reset(self, grid_x, grid_y):
+        super().reset(grid_x, grid_y)
         self.active = False
         
-    def draw(self, window):
+    def image(self):
         if self.active:
-            window.blit(portal_img, (self.x, self.y))
-        else:
-            # Draw inactive portal (dimmed)
-            dimmed = portal_img.copy()
-            dimmed.fill((100, 100, 100), special_flags=pygame.BLEND_RGB_MULT)
-            window.blit(dimmed, (self.x, self.y))
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+            return portal_img
+        # Draw inactive portal (dimmed)
+        return sprites.get("portal", (100, 100, 100))
         
-class Barrier():
-    def __init__(self, grid_x, grid_y, color=(255, 255, 255)):
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        self.x = GRID_OFFSET_X + (grid_x * GRID_SIZE)
-        self.y = GRID_OFFSET_Y + (grid_y * GRID_SIZE)
-        self.width = 64
-        self.height = 64
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+class Barrier(GridSprite):
+    __slots__ = ("color",)
+    
+    def reset(self, grid_x, grid_y, color=(255, 255, 255)):
+        super().reset(grid_x, grid_y)
         self.color = color
         
-    def draw(self, window):
-        barrier_surface = barrier_img.copy()
-        barrier_surface.fill(self.color, special_flags=pygame.BLEND_RGB_MULT)
-        window.blit(barrier_surface, (self.x, self.y))
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+    def image(self):
+        return sprites.get("barrier", self.color)
 
-class Teleporter():
-    def __init__(self, grid_x, grid_y, pair_id):
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        self.x = GRID_OFFSET_X + (grid_x * GRID_SIZE)
-        self.y = GRID_OFFSET_Y + (grid_y * GRID_SIZE)
-        self.width = 64
-        self.height = 64
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+class Teleporter(GridSprite):
+    __slots__ = ("pair_id", "color")
+    
+    def reset(self, grid_x, grid_y, pair_id):
+        super().reset(grid_x, grid_y)
         self.pair_id = pair_id
         self.color = (0, 255, 255) if pair_id == 1 else (255, 0, 255)
         
-    def draw(self, window):
-        pygame.draw.circle(window, self.color, (self.x + 32, self.y + 32), 25)
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+    def image(self):
+        return sprites.get("teleporter", self.color)
 
 # Game functions
-def update_grid_objects():
-    """Update the grid-based object lookup dictionary"""
-    global grid_objects
-    grid_objects.clear()
-    for obj in game_objects:
-        if hasattr(obj, 'grid_x') and hasattr(obj, 'grid_y'):
-            grid_objects[(obj.grid_x, obj.grid_y)].append(obj)
-
-def get_objects_at(x, y):
-    """Get all objects at a grid position"""
-    return grid_objects.get((x, y), [])
+def load_level(level):
+    """Hand a pre-generated level to the engine and create its sprites"""
+    engine.load(level.layout)
+    layout = level.layout
+    # The last level's entities go back to the pools to be reused below
+    entities.clear()
+    memory_manager.clear_active_objects()
+    acquire = memory_manager.acquire
+    geometry = layout.geometry
+    camera.reset((geometry.width, geometry.height), engine.grid_position)
+    spaceship.move_to_grid(*engine.grid_position)
+    entities.add(acquire(PORTALS, Portal, *geometry.position(layout.portal)), PORTALS)
+    for cell, color in layout.key_colors.items():
+        entities.add(acquire(KEYS, Key, *geometry.position(cell), color), KEYS)
+    for cell, color in layout.barrier_colors.items():
+        entities.add(acquire(BARRIERS, Barrier, *geometry.position(cell), color), BARRIERS)
+    for pair_id, (first_cell, second_cell) in enumerate(layout.teleporter_pairs()):
+        first = acquire(TELEPORTERS, Teleporter, *geometry.position(first_cell), pair_id)
+        second = acquire(TELEPORTERS, Teleporter, *geometry.position(second_cell), pair_id)
+        entities.add(first, TELEPORTERS)
+        entities.add(second, TELEPORTERS)
+    for cell in iter_bits(layout.asteroids):
+        entities.add(acquire(ASTEROIDS, Asteroid, *geometry.position(cell)), ASTEROIDS)
+    
+    hints.set_level(layout, game_state.total_keys)
+    request_hint()
+    renderer.invalidate()
+    return level.config.num_keys
 
 def generate_level(level_num):
-    max_attempts = 50  # Maximum attempts to generate a valid level
-    
-    for attempt in range(max_attempts):
-        game_objects.clear()
-        grid_objects.clear()
-        
-        # Get level configuration
-        config = game_state.get_level_config()
-        
-        # Create grid-based puzzle
-        grid = [[0 for x in range(GRID_COLS)] for y in range(GRID_ROWS)]
-        
-        # Place the spaceship at starting position
-        spaceship.move_to_grid(0, 2)
-        grid[2][0] = 1
-        
-        # Place portal at the opposite side
-        portal = Portal(5, 2)
-        game_objects.append(portal)
-        grid[2][5] = 2
-        
-        # Available colors for keys and barriers
-        colors = [
-            (255, 0, 0),    # Red
-            (0, 255, 0),    # Green
-            (0, 0, 255),    # Blue
-            (255, 255, 0),  # Yellow
-            (255, 0, 255),  # Magenta
-            (0, 255, 255),  # Cyan
-            (255, 128, 0),  # Orange
-            (128, 0, 255),  # Purple
-        ]
-        
-        # Track key and teleporter positions for validation
-        key_positions = []
-        teleporter_pairs = {}
-        
-        # Place colored keys and matching barriers
-        for i in range(config.num_keys):
-            color = colors[i % len(colors)]
-            # Place key
-            for _ in range(20):  # Try 20 times to place each key
-                x = random.randint(1, 4)
-                y = random.randint(0, 4)
-                if grid[y][x] == 0:
-                    grid[y][x] = 3
-                    key = Key(x, y, color)
-                    game_objects.append(key)
-                    key_positions.append((x, y))
-                    break
-            
-            # Place matching colored barrier
-            for _ in range(20):  # Try 20 times to place each barrier
-                x = random.randint(1, 4)
-                y = random.randint(0, 4)
-                if grid[y][x] == 0:
-                    grid[y][x] = 5
-                    game_objects.append(Barrier(x, y, color))
-                    break
-        
-        # Place teleporter pairs
-        if config.num_teleporters > 0:
-            for pair_id in range(config.num_teleporters):
-                # Place first teleporter
-                x1, y1 = None, None
-                for _ in range(20):
-                    x = random.randint(1, 4)
-                    y = random.randint(0, 4)
-                    if grid[y][x] == 0:
-                        grid[y][x] = 6
-                        game_objects.append(Teleporter(x, y, pair_id))
-                        x1, y1 = x, y
-                        break
-                
-                # Place second teleporter
-                if x1 is not None:
-                    for _ in range(20):
-                        x = random.randint(1, 4)
-                        y = random.randint(0, 4)
-                        if grid[y][x] == 0:
-                            grid[y][x] = 6
-                            game_objects.append(Teleporter(x, y, pair_id))
-                            teleporter_pairs[(x1, y1)] = (x, y)
-                            teleporter_pairs[(x, y)] = (x1, y1)
-                            break
-        
-        # Place asteroids (obstacles)
-        for i in range(config.num_asteroids):
-            for _ in range(20):  # Try 20 times to place each asteroid
-                x = random.randint(1, 4)
-                y = random.randint(0, 4)
-                if grid[y][x] == 0:
-                    grid[y][x] = 4
-                    game_objects.append(Asteroid(x, y))
-                    break
-        
-        # Validate level solvability
-        if game_state.path_validator.validate_level(
-            grid=grid,
-            keys=key_positions,
-            portal=(5, 2),
-            teleporters=teleporter_pairs,
-            grid_size=(GRID_COLS, GRID_ROWS)
-        ):
-            update_grid_objects()
-            return config.num_keys
-    
-    # If we couldn't generate a valid level, try with fewer objects
-    config.num_asteroids = max(1, config.num_asteroids - 2)
-    config.num_teleporters = max(0, config.num_teleporters - 1)
-    return generate_level(level_num)  # Recursive call with simpler configuration
+    # Levels are built ahead of time on the pipeline's worker thread
+    with profiler.section("generation"):
+        return load_level(level_pipeline.get(level_num))
 
 def display_status():
-    level_text = font.render(f"Level: {game_state.level}", 1, "white")
-    keys_text = font.render(f"Total Keys: {game_state.total_keys}", 1, "white")
-    score_text = font.render(f"Score: {game_state.score}", 1, "white")
-    high_score_text = font.render(f"High Score: {game_state.high_score}", 1, "white")
-    
-    window.blit(level_text, [10, 10])
-    window.blit(keys_text, [10, 50])
-    window.blit(score_text, [10, 90])
-    window.blit(high_score_text, [10, 130])
-
-def draw_grid():
-    for x in range(6):
-        for y in range(5):
-            rect = pygame.Rect(100 + (x * 80), 100 + (y * 80), 80, 80)
-            pygame.draw.rect(window, (50, 50, 70), rect, 1)
-
-def check_move(new_x, new_y):
-    # Check if move is valid (within grid)
-    if new_x < 0 or new_x > 5 or new_y < 0 or new_y > 4:
-        return False
+    values = (game_state.level, game_state.total_keys, game_state.score, game_state.high_score)
+    for field, value in zip(hud_fields, values):
+        for rect in field.update(value):
+            renderer.mark(rect)
+
+def draw_grid(surface):
+    # The camera scrolls in whole cells, so the lines of the visible cells never move
+    for x in range(camera.cols):
+        for y in range(camera.rows):
+            rect = pygame.Rect(GRID_OFFSET_X + (x * GRID_SIZE), GRID_OFFSET_Y + (y * GRID_SIZE),
+                               GRID_SIZE, GRID_SIZE)
+            pygame.draw.rect(surface, (50, 50, 70), rect, 1)
+
+def cell_rect(grid_x, grid_y):
+    # One rect moved in place; renderer.mark() keeps its own copy
+    cell_scratch.topleft = camera.to_screen(grid_x, grid_y)
+    return cell_scratch
+
+def visible_entities():
+    """Entities in the cells the camera shows, looked up cell by cell so the
+    cost follows the viewport rather than the grid"""
+    cells = entities.cells
+    for cell in camera.cells():
+        found = cells.get(cell)
+        if found:
+            yield from found.values()
+
+def drawables():
+    """Everything on screen during play, bottom layer first"""
+    yield from hud_fields
+    if notice.value:
+        yield notice
+    yield from visible_entities()
+    if hint_cell is not None:
+        yield hint_marker
+    yield spaceship
+    yield profile_panel
+
+def handle_move(dx, dy):
+    """Apply a move through the engine and bring sprites and sounds in line"""
+    old_x, old_y = spaceship.grid_x, spaceship.grid_y
+    replay.record(ACTIONS[(dx, dy)])
+    events = engine.step(dx, dy)
+    x, y = engine.grid_position
     
-    # Get all objects at the target position
-    objects_at_pos = get_objects_at(new_x, new_y)
+    if events & BARRIER_OPENED:
+        entities.remove(entities.get(x, y, BARRIERS), BARRIERS)
+        collect_sound.play()
+    if events & TELEPORTED:
+        collect_sound.play()
+    if events & KEY_COLLECTED:
+        entities.get(x, y, KEYS).collected = True
+        collect_sound.play()
+    if events & GAME_OVER:
+        error_sound.play()
+        save_replay()
     
-    # Check for asteroid (blocking)
-    if any(isinstance(obj, Asteroid) for obj in objects_at_pos):
-        return False
-            
-    # Check for barrier
-    for obj in objects_at_pos:
-        if isinstance(obj, Barrier):
-            if game_state.use_key():  # Use a key from total keys
-                game_objects.remove(obj)
-                collect_sound.play()
-                update_grid_objects()
-                return True
-            else:
-                error_sound.play()
-                return False
+    request_hint()
+    if camera.follow(x, y):
+        # Scrolled: everything in view moves, so repaint it all
+        for entity in visible_entities():
+            entity.place()
+        renderer.invalidate()
+    spaceship.move_to_grid(x, y)
+    update_portal_status()
     
-    # Check for teleporter
-    for obj in objects_at_pos:
-        if isinstance(obj, Teleporter):
-            # Find paired teleporter
-            paired_teleporter = next((t for t in game_objects 
-                                    if isinstance(t, Teleporter) 
-                                    and t.pair_id == obj.pair_id 
-                                    and t != obj), None)
-            if paired_teleporter:
-                spaceship.move_to_grid(paired_teleporter.grid_x, paired_teleporter.grid_y)
-                collect_sound.play()
-                return False
+    # Keys and barriers only change under the old or new position
+    renderer.mark(cell_rect(old_x, old_y))
+    renderer.mark(cell_rect(x, y))
     
-    return True
+    if events & LEVEL_COMPLETE:
+        complete_sound.play()
+        if submissions:
+            submissions.submit_score(PLAYER, game_state.score, game_state.level - 1)
+        generate_level(game_state.level)
 
-def check_key_collection():
-    objects_at_pos = get_objects_at(spaceship.grid_x, spaceship.grid_y)
-    
-    for obj in objects_at_pos:
-        if isinstance(obj, Key) and not obj.collected:
-            obj.collected = True
-            game_state.collect_key()
-            collect_sound.play()
-            update_grid_objects()
-
-def check_portal():
-    objects_at_pos = get_objects_at(spaceship.grid_x, spaceship.grid_y)
-    
-    for obj in objects_at_pos:
-        if isinstance(obj, Portal) and obj.active:
-            complete_sound.play()
-            game_state.complete_level()
-            return True
-    return False
+def request_hint():
+    """Hide the shown hint and ask for one from the current position"""
+    global hint_cell
+    if hint_cell is not None:
+        renderer.mark(hint_marker.rect)
+        hint_cell = None
+    if show_hints and not game_state.game_over:
+        layout = engine.layout
+        hints.request(engine.position, layout.keys, layout.barriers)
+
+def update_hint():
+    # Answers arrive from the worker thread; never wait for one
+    global hint_cell
+    hint = hints.poll()
+    if hint is None or hint.action is None or not show_hints:
+        return
+    x, y = engine.grid_position
+    dx, dy = DIRECTIONS[hint.action]
+    hint_cell = (x + dx, y + dy)
+    hint_marker.rect.topleft = camera.to_screen(*hint_cell)
+    renderer.mark(hint_marker.rect)
+
+def show_notice(text):
+    for rect in notice.update(text):
+        renderer.mark(rect)
+
+def announce_achievement(achievement):
+    """Send an unlock to the score server when there is one, otherwise show it"""
+    if submissions:
+        # Achievement ids are positions in MILESTONES
+        submissions.submit_achievement(PLAYER, MILESTONES.index(achievement))
+    else:
+        show_notice(f"Achievement unlocked: {achievement.name}")
+
+def toggle_hints():
+    global show_hints
+    if not hints_available:
+        show_notice(f"No hints on grids over {HINT_MAX_CELLS} cells")
+        return
+    show_hints = not show_hints
+    if not show_hints:
+        hints.cancel()
+    request_hint()
 
 def update_portal_status():
     # Activate portal if all keys are collected
-    portals = [obj for obj in game_objects if isinstance(obj, Portal)]
-    keys = [obj for obj in game_objects if isinstance(obj, Key)]
-    
-    all_keys_collected = all(key.collected for key in keys)
-    for portal in portals:
-        portal.active = all_keys_collected
+    all_keys_collected = engine.portal_active
+    for portal in entities.of_kind(PORTALS):
+        if portal.active != all_keys_collected:
+            portal.active = all_keys_collected
+            renderer.mark(portal.rect)
             
+def update_profile_panel():
+    # Percentiles are re-sorted every few frames rather than on every frame
+    if profiler.enabled and profiler.frames % PROFILE_REFRESH_FRAMES == 0:
+        lines = profiler.report_lines()
+        lines.append(f"pool  {memory_manager.created} built, {memory_manager.reused} reused")
+        lines.append(input_latency.report())
+        lines.append(cpu_meter.report())
+        for rect in profile_panel.update(lines):
+            renderer.mark(rect)
+
+def toggle_profiler():
+    if not profiler.toggle():
+        for rect in profile_panel.update([]):
+            renderer.mark(rect)
+
+def export_profile():
+    path = time.strftime("profile-%Y%m%d-%H%M%S.csv")
+    rows = profiler.export_csv(path)
+    log.info("Wrote %d frames to %s", rows, path)
+    show_notice(f"Wrote {rows} frames to {path}")
+
+def update_logic():
+    """One fixed logic step: apply every move read since the last one"""
+    while move_queue:
+        move, received = move_queue.pop()
+        if game_state.game_over:
+            move_queue.clear()  # Moves after the fatal one never happen
+            break
+        handle_move(*move)
+        input_latency.applied(received)
+
+def frame_state(paused):
+    """What the next frame is for, and whether it can wait idle for input
+
+    Nothing moves on its own, so the loop only needs to run at full rate while
+    there are moves to apply or something left to draw."""
+    if game_state.game_over:
+        return "game over", game_over_layer.visible
+    if paused:
+        return "paused", pause_layer.visible
+    busy = bool(move_queue) or renderer.pending or profiler.enabled
+    return ("playing", False) if busy else ("waiting", True)
+
 def DrawInGameLoop():
-    clock.tick(60)
-    window.blit(bg, (0, 0))
-    draw_grid()
-    display_status()
-    spaceship.draw(window)
-    for obj in game_objects:
-        obj.draw(window)
-    pygame.display.flip()
+    with profiler.section("draw"):
+        if pause_layer.visible or game_over_layer.visible:
+            pause_layer.hide()
+            game_over_layer.hide()
+            renderer.invalidate()
+        display_status()
+        update_hint()
+        update_profile_panel()
+        if renderer.render(drawables()):
+            input_latency.presented()
 
 def draw_pause_menu():
-    # Draw semi-transparent overlay
-    overlay = pygame.Surface((w_width, w_height))
-    overlay.fill((0, 0, 0))
-    overlay.set_alpha(128)
-    window.blit(overlay, (0, 0))
-    
-    # Draw menu text
-    pause_text = font.render("GAME PAUSED", 1, "white")
-    continue_text = font.render("Press P to Continue", 1, "white")
-    restart_text = font.render("Press R to Restart", 1, "white")
-    quit_text = font.render("Press ESC to Quit", 1, "white")
-    
-    window.blit(pause_text, [w_width//2 - pause_text.get_width()//2, 200])
-    window.blit(continue_text, [w_width//2 - continue_text.get_width()//2, 250])
-    window.blit(restart_text, [w_width//2 - restart_text.get_width()//2, 300])
-    window.blit(quit_text, [w_width//2 - quit_text.get_width()//2, 350])
-    
-    pygame.display.flip()
+    # Built once per pause, then left on screen
+    pause_layer.show(window, None, lambda: [
+        (font.render("GAME PAUSED", 1, "white"), 200),
+        (font.render("Press P to Continue", 1, "white"), 250),
+        (font.render("Press R to Restart", 1, "white"), 300),
+        (font.render("Press ESC to Quit", 1, "white"), 350),
+    ])
+
+def save_replay():
+    if replay_dir is None or not replay.moves:
+        return
+    replay.score = game_state.score
+    replay.level = game_state.level
+    os.makedirs(replay_dir, exist_ok=True)
+    # Pack games reuse seeds, so the name also needs the time and, within the
+    # same second, a counter
+    stem = os.path.join(replay_dir, f"{replay.seed:016x}-{time.strftime('%Y%m%d-%H%M%S')}")
+    path, copy = f"{stem}.sprp", 1
+    while os.path.exists(path):
+        copy += 1
+        path = f"{stem}-{copy}.sprp"
+    replay.save(path)
 
 def reset_game():
+    global replay
+    save_replay()
+    replay = Replay(seed=level_pipeline.new_seed(), grid_size=(GRID_COLS, GRID_ROWS))
     game_state.reset_game()
-    memory_manager.clear_active_objects()
-    spaceship.move_to_grid(0, 2)
+    level_pipeline.reset(game_state.level, replay.seed)
+    move_queue.clear()
     return generate_level(game_state.level)
 
 def draw_game_over():
-    # Draw semi-transparent overlay
-    overlay = pygame.Surface((w_width, w_height))
-    overlay.fill((0, 0, 0))
-    overlay.set_alpha(192)
-    window.blit(overlay, (0, 0))
-    
-    # Draw game over message
-    game_over_text = font.render("GAME OVER - No Keys Left!", 1, "white")
-    score_text = font.render(f"Final Score: {game_state.score}", 1, "white")
-    level_text = font.render(f"Levels Completed: {game_state.level - 1}", 1, "white")
-    restart_text = font.render("Press R to Play Again", 1, "white")
-    quit_text = font.render("Press ESC to Quit", 1, "white")
-    
-    window.blit(game_over_text, [w_width//2 - game_over_text.get_width()//2, 180])
-    window.blit(score_text, [w_width//2 - score_text.get_width()//2, 230])
-    window.blit(level_text, [w_width//2 - level_text.get_width()//2, 280])
-    window.blit(restart_text, [w_width//2 - restart_text.get_width()//2, 330])
-    window.blit(quit_text, [w_width//2 - quit_text.get_width()//2, 380])
-    
-    pygame.display.flip()
+    # Built once per game over, then left on screen
+    return game_over_layer.show(window, (game_state.score, game_state.level), lambda: [
+        (font.render("GAME OVER - No Keys Left!", 1, "white"), 180),
+        (font.render(f"Final Score: {game_state.score}", 1, "white"), 230),
+        (font.render(f"Levels Completed: {game_state.level - 1}", 1, "white"), 280),
+        (font.render("Press R to Play Again", 1, "white"), 330),
+        (font.render("Press ESC to Quit", 1, "white"), 380),
+    ])
 
 # Initialize game
-spaceship = Spaceship(100, 260)
-total_keys_needed = generate_level(game_state.level)
-
-# Game loop
-run = True
-paused = False
+# Static background with the grid drawn in, restored under anything that changes
+camera = Camera((GRID_OFFSET_X, GRID_OFFSET_Y), GRID_SIZE, (VIEW_COLS, VIEW_ROWS))
+camera.reset((GRID_COLS, GRID_ROWS), (0, GRID_ROWS // 2))
+static_layer = bg.copy()
+draw_grid(static_layer)
+renderer = DirtyRenderer(window, static_layer, profiler)
+spaceship = Spaceship(0, GRID_ROWS // 2)
+achievements.on_unlock = announce_achievement
+achievements.attach(game_state)
 
-while run:
-    clock.tick(60)
+def main():
+    level_pipeline.start(game_state.level)
+    hints.start()
+    if submissions:
+        submissions.start()
+    generate_level(game_state.level)
+    startup.mark("level")
     
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            run = False
-            
-        if event.type == pygame.KEYDOWN:
-            if game_state.game_over:
-                if event.key == pygame.K_r:  # Restart game
-                    total_keys_needed = reset_game()
-                elif event.key == pygame.K_ESCAPE:
-                    run = False
-            else:
-                if event.key == pygame.K_p:  # Toggle pause
-                    paused = not paused
-                elif event.key == pygame.K_r:  # Restart game
-                    total_keys_needed = reset_game()
-                    paused = False
-                elif event.key == pygame.K_ESCAPE:
-                    if paused:
+    # Game loop
+    run = True
+    paused = False
+    
+    while run:
+        state, idle = frame_state(paused)
+        cpu_meter.enter(state)
+        profiler.begin_frame()
+        with profiler.section("wait"):
+            woke = scheduler.wait(idle)
+        
+        with profiler.section("events"):
+            events = pygame.event.get()
+        if woke is not None:
+            events.insert(0, woke)
+        received = time.perf_counter()
+        for event in events:
+            if event.type == pygame.QUIT:
+                run = False
+                
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:  # Toggle the frame profiler
+                    toggle_profiler()
+                elif event.key == pygame.K_F4:  # Export frame timings
+                    export_profile()
+                elif event.key == pygame.K_h:  # Toggle move hints
+                    toggle_hints()
+                elif game_state.game_over:
+                    if event.key == pygame.K_r:  # Restart game
+                        reset_game()
+                    elif event.key == pygame.K_ESCAPE:
                         run = False
-                elif not paused:  # Handle movement only when not paused
-                    new_x, new_y = spaceship.grid_x, spaceship.grid_y
-                    
-                    if event.key == pygame.K_LEFT:
-                        new_x -= 1
-                    elif event.key == pygame.K_RIGHT:
-                        new_x += 1
-                    elif event.key == pygame.K_UP:
-                        new_y -= 1
-                    elif event.key == pygame.K_DOWN:
-                        new_y += 1
-                        
-                    if check_move(new_x, new_y):
-                        spaceship.move_to_grid(new_x, new_y)
-                        check_key_collection()
-                        update_portal_status()
-                        if check_portal():
-                            total_keys_needed = generate_level(game_state.level)
+                else:
+                    if event.key == pygame.K_p:  # Toggle pause
+                        paused = not paused
+                    elif event.key == pygame.K_r:  # Restart game
+                        reset_game()
+                        paused = False
+                    elif event.key == pygame.K_ESCAPE:
+                        if paused:
+                            run = False
+                    elif not paused and event.key in MOVE_KEYS:  # Handle movement only when not paused
+                        move_queue.push(MOVE_KEYS[event.key], received)
+        
+        with profiler.section("logic"):
+            for _ in range(scheduler.steps_due()):
+                update_logic()
+        
+        if game_state.game_over:
+            with profiler.section("draw"):
+                if draw_game_over():
+                    input_latency.presented()
+        elif paused:
+            with profiler.section("draw"):
+                draw_pause_menu()
+        else:
+            DrawInGameLoop()
+            if startup.frame_presented():
+                log.info(startup.report())
+        profiler.end_frame()
     
-    if game_state.game_over:
-        draw_game_over()
-    elif paused:
-        draw_pause_menu()
-    else:
-        DrawInGameLoop()
+    save_replay()
+    level_pipeline.stop()
+    if level_pack is not None:
+        log.info("%d levels loaded from %s", level_pipeline.metrics.pack_loads, PACK_PATH)
+        level_pack.close()
+    hints.stop()
+    if hints.metrics.requests:
+        log.info(hints.metrics.report())
+    cpu_meter.enter("exit")
+    log.info(cpu_meter.report())
+    if submissions:
+        submissions.stop()
+    pygame.quit()
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
@@ -1,7 +1,14 @@
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Set
+from dataclasses import dataclass, replace
+from typing import Callable, List, Tuple, Dict, Set, Iterator, Optional
 from collections import deque
+import json
 import math
+import os
+
+DEFAULT_GRID = (6, 5)
+
+# Per-level configs precomputed by calibrate.py
+LEVEL_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "level_table.json")
 
 @dataclass
 class LevelConfig:
@@ -10,8 +17,401 @@ class LevelConfig:
     num_teleporters: int
     grid_size: Tuple[int, int]
     difficulty_multiplier: float
+    engine: str = "sampler"  # "sampler" (rejection sampling) or "constructive"
+
+@dataclass
+class SolveResult:
+    solvable: bool
+    moves: int  # Optimal number of moves, -1 when unsolvable
+    states_explored: int
+
+Color = Tuple[int, int, int]
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield the index of every set bit, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def mask_of(cells: List[int]) -> int:
+    """A bitboard with the given cells set, built in one pass for large grids"""
+    if len(cells) < 64:
+        mask = 0
+        for cell in cells:
+            mask |= 1 << cell
+        return mask
+    buffer = bytearray(max(cells) // 8 + 1)
+    for cell in cells:
+        buffer[cell >> 3] |= 1 << (cell & 7)
+    return int.from_bytes(buffer, "little")
+
+class BitGrid:
+    """Shared geometry for bitboards of one grid size, one bit per cell"""
+    __slots__ = ("width", "height", "cells", "full", "not_first_col", "not_last_col")
+    _sizes: Dict[Tuple[int, int], "BitGrid"] = {}
+    
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.full = (1 << self.cells) - 1
+        first_col = sum(1 << (y * width) for y in range(height))
+        self.not_first_col = self.full & ~first_col
+        self.not_last_col = self.full & ~(first_col << (width - 1))
+    
+    @classmethod
+    def of(cls, width: int, height: int) -> "BitGrid":
+        """Get the cached geometry for a grid size"""
+        key = (width, height)
+        if key not in cls._sizes:
+            cls._sizes[key] = cls(width, height)
+        return cls._sizes[key]
+    
+    def index(self, x: int, y: int) -> int:
+        return y * self.width + x
+    
+    def position(self, cell: int) -> Tuple[int, int]:
+        return cell % self.width, cell // self.width
+    
+    def contains(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+    
+    def adjacent(self, cell: int) -> List[int]:
+        """Cells one orthogonal step from cell, lowest index first"""
+        width = self.width
+        x = cell % width
+        cells = []
+        if cell >= width:
+            cells.append(cell - width)
+        if x > 0:
+            cells.append(cell - 1)
+        if x < width - 1:
+            cells.append(cell + 1)
+        if cell + width < self.cells:
+            cells.append(cell + width)
+        return cells
+    
+    def spread(self, mask: int) -> int:
+        """Every cell one orthogonal step away from a cell in mask"""
+        return (((mask << 1) & self.not_first_col)
+                | ((mask >> 1) & self.not_last_col)
+                | (mask << self.width)
+                | (mask >> self.width)) & self.full
+
+# Cell codes of the List[List[int]] grids, also used by the NumPy batch tools
+# and the level pack's grid plane
+EMPTY = 0
+START = 1
+PORTAL = 2
+KEY = 3
+ASTEROID = 4
+BARRIER = 5
+TELEPORTER = 6
+
+class CompactLevel:
+    """A level as one bitboard per cell type plus teleporter pairs and colors"""
+    __slots__ = ("geometry", "start", "portal", "asteroids", "barriers", "keys",
+                 "teleporters", "pairs", "key_colors", "barrier_colors")
+    
+    def __init__(self, width: int, height: int,
+                 start: Tuple[int, int] = (0, 2), portal: Tuple[int, int] = (5, 2)):
+        self.geometry = BitGrid.of(width, height)
+        self.start = self.geometry.index(*start)
+        self.portal = self.geometry.index(*portal)
+        self.asteroids = 0
+        self.barriers = 0
+        self.keys = 0
+        self.teleporters = 0
+        self.pairs: Dict[int, int] = {}
+        self.key_colors: Dict[int, Color] = {}
+        self.barrier_colors: Dict[int, Color] = {}
+    
+    @classmethod
+    def from_grid(cls, grid: List[List[int]],
+                  keys: List[Tuple[int, int]],
+                  portal: Tuple[int, int],
+                  teleporters: Dict[Tuple[int, int], Tuple[int, int]],
+                  start: Tuple[int, int] = (0, 2)) -> "CompactLevel":
+        """Build from the List[List[int]] cell codes used by older callers"""
+        level = cls(len(grid[0]), len(grid), start, portal)
+        geometry = level.geometry
+        for y, row in enumerate(grid):
+            for x, code in enumerate(row):
+                if code == ASTEROID:
+                    level.asteroids |= 1 << geometry.index(x, y)
+                elif code == BARRIER:
+                    level.barriers |= 1 << geometry.index(x, y)
+        for x, y in keys:
+            level.keys |= 1 << geometry.index(x, y)
+        for (x1, y1), (x2, y2) in teleporters.items():
+            level.link_teleporters(geometry.index(x1, y1), geometry.index(x2, y2))
+        return level
+    
+    def copy(self) -> "CompactLevel":
+        level = CompactLevel.__new__(CompactLevel)
+        for name in CompactLevel.__slots__:
+            setattr(level, name, getattr(self, name))
+        level.pairs = dict(self.pairs)
+        level.key_colors = dict(self.key_colors)
+        level.barrier_colors = dict(self.barrier_colors)
+        return level
+    
+    @property
+    def occupied(self) -> int:
+        return (self.asteroids | self.barriers | self.keys | self.teleporters
+                | (1 << self.start) | (1 << self.portal))
+    
+    def is_free(self, cell: int) -> bool:
+        return not self.occupied >> cell & 1
+    
+    def add_key(self, cell: int, color: Color):
+        self.keys |= 1 << cell
+        self.key_colors[cell] = color
+    
+    def add_barrier(self, cell: int, color: Color):
+        self.barriers |= 1 << cell
+        self.barrier_colors[cell] = color
+    
+    def add_asteroid(self, cell: int):
+        self.asteroids |= 1 << cell
+    
+    def link_teleporters(self, first: int, second: int):
+        self.teleporters |= (1 << first) | (1 << second)
+        self.pairs[first] = second
+        self.pairs[second] = first
+    
+    def teleporter_pairs(self) -> List[Tuple[int, int]]:
+        """Each linked pair once, lowest cell first"""
+        return [(a, b) for a, b in sorted(self.pairs.items()) if a < b]
+    
+    def passable(self) -> int:
+        """Cells that can be entered once every barrier is gone"""
+        return self.geometry.full & ~self.asteroids
+    
+    def reachable(self, seed: int, passable: int) -> int:
+        """Flood fill from the seed mask through passable cells and teleporters"""
+        reached = seed
+        while True:
+            entered = self.geometry.spread(reached) & passable
+            landed = entered & ~self.teleporters
+            for cell in iter_bits(entered & self.teleporters):
+                landed |= 1 << self.pairs[cell]
+            grown = reached | landed
+            if grown == reached:
+                return reached
+            reached = grown
+    
+    def targets_from(self, cell: int) -> List[int]:
+        """Cells a move from cell can end on, with asteroids dropped and teleporters resolved"""
+        asteroids = self.asteroids
+        pairs = self.pairs
+        return [pairs.get(target, target) for target in self.geometry.adjacent(cell)
+                if not asteroids >> target & 1]
+    
+    def move_targets(self) -> List[List[int]]:
+        """targets_from() for every cell"""
+        return [self.targets_from(cell) for cell in range(self.geometry.cells)]
+
+class _LazyTargets(dict):
+    """Move targets computed on first visit, so large grids pay only for cells searched"""
+    
+    def __init__(self, level: CompactLevel):
+        super().__init__()
+        self.level = level
+    
+    def __missing__(self, cell: int) -> List[int]:
+        targets = self[cell] = self.level.targets_from(cell)
+        return targets
+
+class _RelaxedDistances(dict):
+    """Lower bound on moves from any cell to target with asteroids ignored:
+    walking distance, or walking into a teleporter and on from its partner"""
+    
+    def __init__(self, level: CompactLevel, target: int):
+        super().__init__()
+        width = level.geometry.width
+        self.width = width
+        self.tx, self.ty = target % width, target // width
+        # Best cost to target after stepping into each teleporter, relaxed over chains of jumps
+        self.entries = [(cell % width, cell // width) for cell in level.pairs]
+        exits = [(cell % width, cell // width) for cell in level.pairs.values()]
+        after = [abs(x - self.tx) + abs(y - self.ty) for x, y in exits]
+        for _ in range(len(after)):
+            for i, (ex, ey) in enumerate(exits):
+                for j, (nx, ny) in enumerate(self.entries):
+                    via = abs(ex - nx) + abs(ey - ny) + after[j]
+                    if via < after[i]:
+                        after[i] = via
+        self.after = after
+    
+    def __missing__(self, cell: int) -> int:
+        x, y = cell % self.width, cell // self.width
+        best = abs(x - self.tx) + abs(y - self.ty)
+        for (nx, ny), rest in zip(self.entries, self.after):
+            via = abs(x - nx) + abs(y - ny) + rest
+            if via < best:
+                best = via
+        self[cell] = best
+        return best
+
+class StateSearch:
+    """A* over the states of one level: position, keys collected, barriers opened
+
+    A state packs into one int, the position in the low bits, then a bit per
+    key collected and a bit per barrier opened. The key balance is start_keys
+    + collected - opened, so it needs no bits of its own. The heuristic is the
+    best route to each missing key and on to the portal with barriers treated
+    as open, from the public tables to_portal and to_keys.
+
+    PathValidator.solve_level runs one search from the start. hints.HintSearch
+    keeps one per level, searches from wherever the player stands and
+    overrides estimate() with what earlier searches proved."""
+    
+    def __init__(self, level: CompactLevel, start_keys: int = 0):
+        self.level = level
+        self.start_keys = start_keys  # Keys carried into the level
+        cells = level.geometry.cells
+        # Bit index for every key and barrier so a state packs into one int
+        self.keys = list(iter_bits(level.keys))
+        self.barriers = list(iter_bits(level.barriers))
+        self.key_bits = {cell: 1 << i for i, cell in enumerate(self.keys)}
+        self.barrier_bits = {cell: 1 << i for i, cell in enumerate(self.barriers)}
+        self.key_shift = (cells - 1).bit_length()
+        self.barrier_shift = self.key_shift + len(self.keys)
+        self.pos_mask = (1 << self.key_shift) - 1
+        self.key_mask = ((1 << len(self.keys)) - 1) << self.key_shift
+        self.goal = level.portal | self.key_mask
+        self.unreachable = cells + 1
+        
+        if cells <= PathValidator.BFS_HEURISTIC_CELLS:
+            self.moves = level.move_targets()
+            self.to_portal = PathValidator._distances_to(level.portal, self.moves)
+            self.to_keys = [PathValidator._distances_to(cell, self.moves) for cell in self.keys]
+        else:
+            self.moves = _LazyTargets(level)
+            self.to_portal = _RelaxedDistances(level, level.portal)
+            self.to_keys = [_RelaxedDistances(level, cell) for cell in self.keys]
+        self.key_tails = [self.to_portal[cell] for cell in self.keys]
+        
+        # Left by the last search: fewest moves to every state it reached, the
+        # state each was reached from (when tracked) and how many it expanded
+        self.reached: Dict[int, int] = {}
+        self.parents: Dict[int, int] = {}
+        self.expanded = 0
+    
+    def pack(self, position: int, keys_left: int, barriers_left: int) -> int:
+        """The state for a position and the keys and barriers still on the board"""
+        state = position
+        for cell, bit in self.key_bits.items():
+            if not keys_left >> cell & 1:
+                state |= bit << self.key_shift
+        for cell, bit in self.barrier_bits.items():
+            if not barriers_left >> cell & 1:
+                state |= bit << self.barrier_shift
+        return state
+    
+    def balance(self, state: int) -> int:
+        """Keys in hand: carried in, plus collected, minus spent on barriers"""
+        collected = bin(state & self.key_mask).count("1")
+        opened = bin(state >> self.barrier_shift).count("1")
+        return self.start_keys + collected - opened
+    
+    def heuristic(self, state: int) -> int:
+        """Lower bound on moves left from state; unreachable or more if none"""
+        pos = state & self.pos_mask
+        best = self.to_portal[pos]
+        missing = ~state >> self.key_shift
+        for i, tail in enumerate(self.key_tails):
+            if missing >> i & 1:
+                remaining = self.to_keys[i][pos] + tail
+                if remaining > best:
+                    best = remaining
+        return best
+    
+    estimate = heuristic
+    
+    def search(self, origin: int, until=(), cancelled: Optional[Callable[[], bool]] = None,
+               max_expansions: int = 0, check_every: int = 256,
+               track: bool = False) -> Optional[Tuple[Optional[int], int]]:
+        """(state ended on, moves to it) for the fewest moves from origin to the
+        portal with every key, or to any state in until; (None, -1) if there is
+        no route, None if cancelled() turned true or max_expansions ran out.
+        track keeps the state each state was reached from in parents."""
+        pos_mask, key_mask, goal = self.pos_mask, self.key_mask, self.goal
+        key_shift, barrier_shift = self.key_shift, self.barrier_shift
+        key_bits, barrier_bits = self.key_bits, self.barrier_bits
+        moves, estimate, unreachable = self.moves, self.estimate, self.unreachable
+        self.expanded = 0
+        # Transposition table of packed states with the fewest moves seen
+        self.reached = best_moves = {origin: 0}
+        self.parents = parents = {}
+        first = estimate(origin)
+        if first >= unreachable:
+            return None, -1
+        
+        buckets = [[] for _ in range(first + 1)]
+        buckets[first].append((origin, 0, self.balance(origin)))
+        expanded = 0
+        bound = first
+        
+        while bound < len(buckets):
+            bucket = buckets[bound]
+            while bucket:
+                state, moved, balance = bucket.pop()
+                if best_moves[state] < moved:
+                    continue  # Reached again by a shorter route
+                expanded += 1
+                if state & (pos_mask | key_mask) == goal or state in until:
+                    self.expanded = expanded
+                    return state, moved
+                if expanded % check_every == 0:
+                    if (cancelled is not None and cancelled()) or (max_expansions and expanded >= max_expansions):
+                        self.expanded = expanded
+                        return None
+                
+                opened = state >> barrier_shift
+                moved += 1
+                for target in moves[state & pos_mask]:
+                    new_state = (state & ~pos_mask) | target
+                    new_balance = balance
+                    barrier = barrier_bits.get(target, 0)
+                    if barrier and not opened & barrier:
+                        if balance == 0:
+                            continue  # Running into a barrier without keys ends the game
+                        new_state |= barrier << barrier_shift
+                        new_balance -= 1
+                    key = key_bits.get(target, 0) << key_shift
+                    if key and not state & key:
+                        new_state |= key
+                        new_balance += 1
+                    
+                    if best_moves.get(new_state, unreachable) <= moved:
+                        continue
+                    remaining = estimate(new_state)
+                    if remaining >= unreachable:
+                        continue
+                    best_moves[new_state] = moved
+                    if track:
+                        parents[new_state] = state
+                    priority = moved + remaining
+                    if priority < bound:
+                        # An overridden estimate may be inconsistent and fall
+                        # below the bucket being worked; keep it there instead
+                        priority = bound
+                    while priority >= len(buckets):
+                        buckets.append([])
+                    buckets[priority].append((new_state, moved, new_balance))
+            bound += 1
+        
+        self.expanded = expanded
+        return None, -1
 
 class PathValidator:
+    # Above this many cells the heuristic uses walking distances instead of
+    # breadth-first tables, so solving costs scale with the objects placed
+    BFS_HEURISTIC_CELLS = 1024
+    
     @staticmethod
     def is_valid_move(x: int, y: int, grid: List[List[int]], grid_size: Tuple[int, int]) -> bool:
         """Check if a position is valid and not blocked"""
@@ -21,52 +421,51 @@ class PathValidator:
                 grid[y][x] != 4)  # 4 is asteroid
     
     @staticmethod
-    def get_neighbors(x: int, y: int, grid: List[List[int]], 
-                     grid_size: Tuple[int, int], 
-                     teleporters: Dict[Tuple[int, int], Tuple[int, int]]) -> List[Tuple[int, int]]:
-        """Get all possible moves from current position"""
-        moves = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # Up, Right, Down, Left
-        neighbors = []
-        
-        # Normal moves
-        for dx, dy in moves:
-            new_x, new_y = x + dx, y + dy
-            if PathValidator.is_valid_move(new_x, new_y, grid, grid_size):
-                neighbors.append((new_x, new_y))
-        
-        # Teleporter moves
-        if (x, y) in teleporters:
-            neighbors.append(teleporters[(x, y)])
+    def solve(grid: List[List[int]],
+              keys: List[Tuple[int, int]],
+              portal: Tuple[int, int],
+              teleporters: Dict[Tuple[int, int], Tuple[int, int]],
+              grid_size: Tuple[int, int],
+              start: Tuple[int, int] = (0, 2),
+              start_keys: int = 0) -> SolveResult:
+        """Solve a level given as cell codes"""
+        level = CompactLevel.from_grid(grid, keys, portal, teleporters, start)
+        return PathValidator.solve_level(level, start_keys)
+    
+    @staticmethod
+    def solve_level(level: CompactLevel, start_keys: int = 0) -> SolveResult:
+        """A* search over (position, keys, barriers, key balance) for the fewest moves"""
+        # Cheap bitwise rejection: every key and the portal must be reachable
+        # even with all barriers open
+        reached = level.reachable(1 << level.start, level.passable())
+        if (level.keys | (1 << level.portal)) & ~reached:
+            return SolveResult(False, -1, 0)
         
-        return neighbors
+        search = StateSearch(level, start_keys)
+        end, moves = search.search(level.start)
+        if end is None:
+            return SolveResult(False, -1, search.expanded)
+        return SolveResult(True, moves, search.expanded)
     
     @staticmethod
-    def find_path_to_keys(start: Tuple[int, int], 
-                         keys: List[Tuple[int, int]], 
-                         grid: List[List[int]],
-                         grid_size: Tuple[int, int],
-                         teleporters: Dict[Tuple[int, int], Tuple[int, int]]) -> bool:
-        """Check if all keys are reachable"""
-        keys_set = set(keys)
-        visited = set()
-        queue = deque([(start, set())])
+    def _distances_to(target: int, moves: List[List[int]]) -> List[int]:
+        """Fewest moves from every cell to target, ignoring barriers and key costs"""
+        unreachable = len(moves) + 1
+        incoming = [[] for _ in moves]
+        for cell, targets in enumerate(moves):
+            for next_cell in targets:
+                incoming[next_cell].append(cell)
         
+        distances = [unreachable] * len(moves)
+        distances[target] = 0
+        queue = deque([target])
         while queue:
-            pos, collected = queue.popleft()
-            if pos in visited:
-                continue
-                
-            visited.add(pos)
-            if pos in keys_set:
-                collected = collected | {pos}
-                if len(collected) == len(keys_set):
-                    return True
-            
-            for next_pos in PathValidator.get_neighbors(*pos, grid, grid_size, teleporters):
-                if next_pos not in visited:
-                    queue.append((next_pos, collected))
-        
-        return False
+            cell = queue.popleft()
+            for prev in incoming[cell]:
+                if distances[prev] == unreachable:
+                    distances[prev] = distances[cell] + 1
+                    queue.append(prev)
+        return distances
     
     @staticmethod
     def validate_level(grid: List[List[int]], 
@@ -75,28 +474,34 @@ class PathValidator:
                       teleporters: Dict[Tuple[int, int], Tuple[int, int]],
                       grid_size: Tuple[int, int]) -> bool:
         """Validate that the level is solvable"""
-        start = (0, 2)  # Starting position
-        
-        # Check if all keys are reachable
-        if not PathValidator.find_path_to_keys(start, keys, grid, grid_size, teleporters):
-            return False
-        
-        # Check if portal is reachable after collecting all keys
-        # For this check, remove barriers since all keys are collected
-        portal_grid = [row[:] for row in grid]
-        for y in range(len(portal_grid)):
-            for x in range(len(portal_grid[y])):
-                if portal_grid[y][x] == 5:  # 5 is barrier
-                    portal_grid[y][x] = 0
-        
-        # Check path to portal from any position (since we might collect last key anywhere)
-        for y in range(grid_size[1]):
-            for x in range(grid_size[0]):
-                if PathValidator.is_valid_move(x, y, portal_grid, grid_size):
-                    if PathValidator.find_path_to_keys((x, y), [portal], portal_grid, grid_size, teleporters):
-                        return True
-        
-        return False
+        return PathValidator.solve(grid, keys, portal, teleporters, grid_size).solvable
+
+def load_level_table(path: str = LEVEL_TABLE_PATH) -> Dict[int, LevelConfig]:
+    """Level configs by level number, empty when there is no table"""
+    try:
+        with open(path) as f:
+            rows = json.load(f)["levels"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    return {
+        row["level"]: LevelConfig(
+            num_keys=row["num_keys"],
+            num_asteroids=row["num_asteroids"],
+            num_teleporters=row["num_teleporters"],
+            grid_size=tuple(row["grid_size"]),
+            difficulty_multiplier=row["difficulty_multiplier"],
+            engine=row.get("engine", "sampler"),
+        )
+        for row in rows
+    }
+
+_level_table: Optional[Dict[int, LevelConfig]] = None
+
+def level_table() -> Dict[int, LevelConfig]:
+    global _level_table
+    if _level_table is None:
+        _level_table = load_level_table()
+    return _level_table
 
 class GameState:
     def __init__(self):
@@ -107,12 +512,53 @@ class GameState:
         self.total_keys = 0  # Total keys across all levels
         self.game_over = False
         self.path_validator = PathValidator()
+        # Called as on_change(field, old, new) when a key or level changes a field
+        self.on_change: Optional[Callable[[str, int, int], None]] = None
         self._calculate_difficulty()
     
     def _calculate_difficulty(self) -> LevelConfig:
         """Calculate level difficulty based on current level"""
+        return GameState.config_for_level(self.level)
+    
+    @staticmethod
+    def config_for_level(level: int, grid_size: Optional[Tuple[int, int]] = None) -> LevelConfig:
+        """The difficulty of any level without touching game state, from the
+        calibrated table where there is one"""
+        if grid_size is not None and tuple(grid_size) != DEFAULT_GRID:
+            return GameState.large_grid_config(level, tuple(grid_size))
+        table = level_table()
+        if not table:
+            return GameState.curve_config(level)
+        if level in table:
+            return table[level]
+        # Past the table the object counts stay at the last calibrated tier
+        last = table[max(table)]
+        return replace(last, difficulty_multiplier=GameState.curve_config(level).difficulty_multiplier)
+    
+    @staticmethod
+    def large_grid_config(level: int, grid_size: Tuple[int, int]) -> LevelConfig:
+        """The standard difficulty spread over a bigger grid
+
+        Asteroids keep the same density and teleporters and keys grow with the
+        grid's side. These levels are built by the constructive engine, since
+        sampling and solving them would cost time in proportion to their area."""
+        config = GameState.config_for_level(level)
+        area = grid_size[0] * grid_size[1] / (DEFAULT_GRID[0] * DEFAULT_GRID[1])
+        side = math.sqrt(area)
+        return replace(
+            config,
+            grid_size=grid_size,
+            num_keys=config.num_keys * max(1, round(side / 4)),
+            num_asteroids=round(config.num_asteroids * area / 2),
+            num_teleporters=config.num_teleporters * max(1, round(side / 2)),
+            engine="constructive",
+        )
+    
+    @staticmethod
+    def curve_config(level: int) -> LevelConfig:
+        """Difficulty from the logarithmic curve the level table is calibrated against"""
         # Base difficulty increases with level
-        base_difficulty = math.log(self.level + 1, 2)
+        base_difficulty = math.log(level + 1, 2)
         
         # Calculate number of objects based on level progression
         num_keys = min(round(2 + base_difficulty), 8)  # Max 8 keys
@@ -126,7 +572,7 @@ class GameState:
             num_keys=num_keys,
             num_asteroids=num_asteroids,
             num_teleporters=num_teleporters,
-            grid_size=(6, 5),  # Current grid size
+            grid_size=DEFAULT_GRID,
             difficulty_multiplier=difficulty_multiplier
         )
     
@@ -137,6 +583,7 @@ class GameState:
     def complete_level(self) -> int:
         """Complete current level and calculate score"""
         config = self._calculate_difficulty()
+        before = (self.level, self.score, self.total_keys, self.keys_collected)
         level_score = round(100 * self.level * config.difficulty_multiplier)
         self.score += level_score
         self.level += 1
@@ -148,6 +595,11 @@ class GameState:
         if self.score > self.high_score:
             self.high_score = self.score
         
+        if self.on_change:
+            after = (self.level, self.score, self.total_keys, self.keys_collected)
+            for field, old, new in zip(("level", "score", "total_keys", "keys_collected"), before, after):
+                if old != new:
+                    self.on_change(field, old, new)
         return level_score
     
     def reset_game(self):
@@ -163,11 +615,16 @@ class GameState:
         """Handle key collection"""
         self.keys_collected += 1
         self.total_keys += 1
+        if self.on_change:
+            self.on_change("keys_collected", self.keys_collected - 1, self.keys_collected)
+            self.on_change("total_keys", self.total_keys - 1, self.total_keys)
     
     def use_key(self):
         """Handle key usage"""
         if self.total_keys > 0:
             self.total_keys -= 1
+            if self.on_change:
+                self.on_change("total_keys", self.total_keys + 1, self.total_keys)
             return True
         self.game_over = True
         return False
@@ -177,21 +634,43 @@ class GameState:
         return self.total_keys
 
 class MemoryManager:
+    """Pools of entity objects reused from one level to the next
+
+    acquire() hands out a pooled object re-initialised through its reset()
+    method, or builds one when the pool is empty. Everything handed out goes
+    back to its pool on clear_active_objects(), so after the first few levels
+    loading a level creates no new entities."""
+    
     def __init__(self):
         self.object_pool = {
+            'portals': [],
             'keys': [],
             'barriers': [],
             'asteroids': [],
             'teleporters': []
         }
         self.active_objects = []
+        self.created = 0  # Objects built because their pool was empty
+        self.reused = 0  # Objects handed out again from a pool
     
     def get_object(self, obj_type: str):
-        """Get an object from the pool or create new if pool is empty"""
+        """Get an object from the pool, or None if the pool is empty"""
         if self.object_pool[obj_type]:
             return self.object_pool[obj_type].pop()
         return None
     
+    def acquire(self, obj_type: str, factory, *args):
+        """A pooled object reset with args, or factory(*args) if the pool is empty"""
+        obj = self.get_object(obj_type)
+        if obj is None:
+            obj = factory(*args)
+            self.created += 1
+        else:
+            obj.reset(*args)
+            self.reused += 1
+        self.active_objects.append(obj)
+        return obj
+    
     def return_object(self, obj, obj_type: str):
         """Return an object to the pool"""
         self.object_pool[obj_type].append(obj)
@@ -209,4 +688,8 @@ class MemoryManager:
     
     def get_active_objects(self):
         """Get all active objects"""
-        return self.active_objects 
\ No newline at end of file
+        return self.active_objects
+    
+    def pooled(self) -> int:
+        """Objects waiting in the pools"""
+        return sum(len(pool) for pool in self.object_pool.values())
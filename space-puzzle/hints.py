@@ -0,0 +1,240 @@
+"""Optimal next-move hints, searched on a worker thread while the game keeps drawing"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional, Set, Tuple
+
+from engine import DIRECTIONS
+from game_state import CompactLevel, StateSearch
+
+CHECK_EVERY = 256  # Expansions between checks for a newer request
+# Largest grid hints are offered on. Beyond it a search from the start of a
+# level runs to millions of states (about 2M on 64x64), past any budget that
+# answers while the player waits, so large-grid mode has no hints
+MAX_CELLS = 1024
+
+@dataclass
+class Hint:
+    request: int
+    action: Optional[int]  # Index into engine.DIRECTIONS, None if the level cannot be finished
+    moves: int  # Moves left on the best route, -1 if there is none
+    latency: float = 0.0  # Seconds from request to answer
+    cached: bool = False  # Answered from routes already proven, with no search
+
+@dataclass
+class HintMetrics:
+    requests: int = 0
+    answered: int = 0
+    cancelled: int = 0  # Superseded by a newer request before finishing
+    cached: int = 0
+    exhausted: int = 0  # Gave up at the expansion budget
+    expanded: int = 0  # States expanded by searches that finished
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Seconds from request to answer"""
+        # Imported here so hints stay usable without the profiler loaded
+        from profiler import percentile
+        return {f"p{pct}": percentile(self.latencies, pct) for pct in (50, 95, 99)}
+
+    def report(self) -> str:
+        stats = self.latency_percentiles()
+        return (f"Hints: {self.answered}/{self.requests} answered, {self.cached} from cache, "
+                f"{self.cancelled} cancelled, {self.exhausted} over budget, {self.expanded} states expanded; latency ms "
+                + " ".join(f"{name} {value * 1000:.2f}" for name, value in stats.items()))
+
+class HintSearch(StateSearch):
+    """StateSearch from any state reached during play, keeping what it proves
+
+    Bits mark keys collected and barriers opened, so the same state keeps its
+    value between requests. Two tables survive from one request to the next:
+
+    * ``exact`` holds the moves left and the best move for every state on a
+      route already proven optimal, so following a hint needs no search.
+    * ``learned`` raises the heuristic of every state a search reached to
+      (moves found - moves to reach it). The route found is optimal, so
+      nothing reached on the way can finish sooner and the bound stays
+      admissible; the next search after a detour skips what it ruled out."""
+
+    def __init__(self, level: CompactLevel, start_keys: int = 0):
+        super().__init__(level, start_keys)
+        self.exact: Dict[int, Tuple[int, Optional[int]]] = {}
+        self.learned: Dict[int, int] = {}
+        self.dead: Set[int] = set()  # States the level cannot be finished from
+
+    def action(self, cell: int, target: int) -> int:
+        """The index into DIRECTIONS of the move from cell that lands on target"""
+        level = self.level
+        geometry = level.geometry
+        x, y = geometry.position(cell)
+        for action, (dx, dy) in enumerate(DIRECTIONS):
+            if geometry.contains(x + dx, y + dy):
+                step = geometry.index(x + dx, y + dy)
+                if level.pairs.get(step, step) == target:
+                    return action
+        raise ValueError(f"no move from cell {cell} lands on {target}")
+
+    def estimate(self, state: int) -> int:
+        known = self.exact.get(state)
+        if known is not None:
+            return known[0]
+        if state in self.dead:
+            return self.unreachable
+        best = self.heuristic(state)
+        learned = self.learned.get(state, 0)
+        return learned if learned > best else best
+
+    def best_move(self, state: int, cancelled: Callable[[], bool] = lambda: False,
+                  max_expansions: int = 0) -> Optional[Tuple[Optional[int], int, int]]:
+        """(action, moves left, states expanded) from state, or None if
+        cancelled() turned true or the expansion budget ran out first"""
+        exact = self.exact
+        known = exact.get(state)
+        if known is not None:
+            return known[1], known[0], 0
+        if state in self.dead:
+            return None, -1, 0
+
+        found = self.search(state, exact, cancelled, max_expansions, CHECK_EVERY, track=True)
+        best_moves, parents = self.reached, self.parents
+        # Only needed until the tables below are updated
+        self.reached, self.parents = {}, {}
+        if found is None:
+            return None
+        end, moved = found
+        if end is None:
+            # No route from here; remember it so asking again is free
+            self.dead.add(state)
+            return None, -1, self.expanded
+
+        total = moved + exact.get(end, (0, None))[0]
+        if end not in exact:
+            exact[end] = (0, None)
+        # Every state on the route is now solved exactly
+        pos_mask = self.pos_mask
+        current = end
+        while current != state:
+            previous = parents[current]
+            exact[previous] = (total - best_moves[previous], self.action(previous & pos_mask, current & pos_mask))
+            current = previous
+        # Adaptive A*: a state reached in g moves has at least total - g left
+        learned = self.learned
+        for reached, moved in best_moves.items():
+            bound = total - moved
+            if bound > learned.get(reached, 0):
+                learned[reached] = bound
+        return exact[state][1], total, self.expanded
+
+class HintService:
+    """Answers hint requests on a worker thread; only the newest request matters
+
+    The game calls set_level() when a level starts and request() after each
+    move, then poll()s once a frame. A request made while an older one is
+    still searching cancels it, and the search tables for the level are kept
+    so the next request starts from what the last one learned."""
+
+    def __init__(self, max_expansions: int = 200_000):
+        self.max_expansions = max_expansions  # Give up on a hint after this many states
+        self.metrics = HintMetrics()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._level: Optional[Tuple[CompactLevel, int]] = None
+        self._level_epoch = 0  # Bumped on set_level so the worker rebuilds its search
+        self._latest = 0  # Newest request id
+        # (request id, level epoch, position, keys left, barriers left, time requested)
+        self._pending: Optional[Tuple[int, int, int, int, int, float]] = None
+        self._result: Optional[Hint] = None
+        self._stop = False
+        self._thread = None
+        # Called on the worker thread after each answer, e.g. to wake an idle loop
+        self.on_answer: Optional[Callable[[], None]] = None
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                self._stop = False
+            self._thread = threading.Thread(target=self._run, name="hints", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def set_level(self, layout: CompactLevel, start_keys: int):
+        """Start hinting a new level; layout is the level as generated, before any moves"""
+        with self._lock:
+            self._level = (layout, start_keys)
+            self._level_epoch += 1
+            self._latest += 1
+            self._pending = None
+            self._result = None
+
+    def request(self, position: int, keys_left: int, barriers_left: int) -> int:
+        """Ask for the best move from a position with the given keys and barriers
+        still on the board; returns the request id"""
+        with self._lock:
+            self._latest += 1
+            self._pending = (self._latest, self._level_epoch, position, keys_left, barriers_left,
+                             time.perf_counter())
+            self._result = None
+            self.metrics.requests += 1
+            self._wake.notify()
+            return self._latest
+
+    def cancel(self):
+        """Drop any outstanding request and unread answer"""
+        with self._lock:
+            self._latest += 1
+            self._pending = None
+            self._result = None
+
+    def poll(self) -> Optional[Hint]:
+        """The answer to the newest request if it has arrived, without waiting"""
+        if self._result is None:
+            return None
+        with self._lock:
+            result, self._result = self._result, None
+            return result
+
+    def _run(self):
+        search: Optional[HintSearch] = None
+        search_epoch = 0
+        while True:
+            with self._lock:
+                while self._pending is None and not self._stop:
+                    self._wake.wait()
+                if self._stop:
+                    return
+                request, epoch, position, keys_left, barriers_left, requested = self._pending
+                self._pending = None
+                level = self._level
+            if epoch != search_epoch:
+                search = HintSearch(*level)
+                search_epoch = epoch
+
+            state = search.pack(position, keys_left, barriers_left)
+            cached = state in search.exact
+            answer = search.best_move(state, lambda: self._latest != request or self._stop,
+                                      self.max_expansions)
+            with self._lock:
+                if answer is not None:
+                    self.metrics.expanded += answer[2]
+                if request != self._latest:
+                    self.metrics.cancelled += 1
+                    continue
+                latency = time.perf_counter() - requested
+                if answer is None:
+                    # Over the expansion budget; no hint for this position
+                    self.metrics.exhausted += 1
+                    answer = (None, -1, 0)
+                self._result = Hint(request, answer[0], answer[1], latency, cached)
+                self.metrics.answered += 1
+                self.metrics.cached += cached
+                self.metrics.latencies.append(latency)
+            if self.on_answer is not None:
+                self.on_answer()
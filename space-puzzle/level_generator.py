@@ -0,0 +1,305 @@
+from dataclasses import dataclass, replace
+from typing import List, Tuple, Optional, Iterable, Set
+import random
+import time
+
+from game_state import GameState, LevelConfig, PathValidator, CompactLevel, mask_of
+
+# Available colors for keys and barriers
+COLORS = [
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (0, 0, 255),    # Blue
+    (255, 255, 0),  # Yellow
+    (255, 0, 255),  # Magenta
+    (0, 255, 255),  # Cyan
+    (255, 128, 0),  # Orange
+    (128, 0, 255),  # Purple
+]
+
+# Levels bigger than this are left unsolved after construction; their solution
+# length is unknown, but the construction already guarantees one exists
+SOLVE_CELL_LIMIT = 256
+
+def endpoints(grid_size: Tuple[int, int]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Start and portal cells: the middle of the first and last columns"""
+    width, height = grid_size
+    return (0, height // 2), (width - 1, height // 2)
+
+@dataclass
+class LevelData:
+    """A validated level as plain data, safe to build off the main thread"""
+    level: int
+    config: LevelConfig
+    layout: CompactLevel
+    solution_length: int = -1
+    attempts: int = 0
+    fallbacks: int = 0  # Times sample_level_data recursed into a simpler config
+    shortfall: int = 0  # Objects the config asked for that did not fit on the grid
+
+def count_shortfall(config: LevelConfig, layout: CompactLevel) -> int:
+    """How many keys, barriers, teleporter pairs and asteroids are missing from
+    layout compared with config"""
+    wanted = (2 * config.num_keys, config.num_teleporters, config.num_asteroids)
+    placed = (len(layout.key_colors) + len(layout.barrier_colors),
+              len(layout.pairs) // 2, bin(layout.asteroids).count("1"))
+    return sum(max(0, w - p) for w, p in zip(wanted, placed))
+
+def _place(layout: CompactLevel, rng: random.Random) -> Optional[int]:
+    """Try 20 times to find a free cell between the start and portal columns"""
+    geometry = layout.geometry
+    for _ in range(20):
+        x = rng.randint(1, geometry.width - 2)
+        y = rng.randint(0, geometry.height - 1)
+        cell = geometry.index(x, y)
+        if layout.is_free(cell):
+            return cell
+    return None
+
+def build_candidate(config: LevelConfig, rng: random.Random) -> CompactLevel:
+    """Randomly lay out one candidate level for the given configuration"""
+    width, height = config.grid_size
+    layout = CompactLevel(width, height, *endpoints(config.grid_size))
+
+    # Place colored keys and matching barriers
+    for i in range(config.num_keys):
+        color = COLORS[i % len(COLORS)]
+        cell = _place(layout, rng)
+        if cell is not None:
+            layout.add_key(cell, color)
+        cell = _place(layout, rng)
+        if cell is not None:
+            layout.add_barrier(cell, color)
+
+    # Place teleporter pairs
+    for pair_id in range(config.num_teleporters):
+        first = _place(layout, rng)
+        if first is None:
+            continue
+        layout.teleporters |= 1 << first  # Hold the cell while its partner is placed
+        second = _place(layout, rng)
+        layout.teleporters &= ~(1 << first)
+        if second is not None:
+            layout.link_teleporters(first, second)
+
+    # Place asteroids (obstacles)
+    for i in range(config.num_asteroids):
+        cell = _place(layout, rng)
+        if cell is not None:
+            layout.add_asteroid(cell)
+
+    return layout
+
+def _route_between(a: Tuple[int, int], b: Tuple[int, int], rng: random.Random) -> List[Tuple[int, int]]:
+    """A random shortest walk from a to b, excluding a"""
+    x, y = a
+    steps_x = [(1 if b[0] > x else -1, 0)] * abs(b[0] - x)
+    steps_y = [(0, 1 if b[1] > y else -1)] * abs(b[1] - y)
+    steps = steps_x + steps_y
+    rng.shuffle(steps)
+    route = []
+    for dx, dy in steps:
+        x, y = x + dx, y + dy
+        route.append((x, y))
+    return route
+
+def _free_cells(geometry, taken: Set[int], count: int, rng: random.Random) -> List[int]:
+    """Up to count distinct cells between the start and portal columns that are
+    not in taken, drawn by rejection so the cost follows count, not grid area"""
+    width, height = geometry.width, geometry.height
+    picked = []
+    misses = 0
+    while len(picked) < count and misses < 4 * count + 16:
+        cell = geometry.index(rng.randint(1, width - 2), rng.randrange(height))
+        if cell in taken:
+            misses += 1
+            continue
+        taken.add(cell)
+        picked.append(cell)
+    if len(picked) < count:
+        # A crowded grid: list whatever is left instead
+        rest = [geometry.index(x, y) for y in range(height) for x in range(1, width - 1)]
+        rest = [cell for cell in rest if cell not in taken]
+        rng.shuffle(rest)
+        picked.extend(rest[:count - len(picked)])
+        taken.update(picked)
+    return picked
+
+def construct_level_data(level_num: int, config: LevelConfig, rng: random.Random) -> LevelData:
+    """Build a level around a guaranteed solution route, so it never needs a retry"""
+    width, height = config.grid_size
+    start, portal = endpoints(config.grid_size)
+    layout = CompactLevel(width, height, start, portal)
+    geometry = layout.geometry
+    taken = {layout.start, layout.portal}
+
+    # Keys first, visited nearest-first from the start
+    key_cells = [geometry.position(cell) for cell in _free_cells(geometry, taken, config.num_keys, rng)]
+    waypoints = [start]
+    while key_cells:
+        here = waypoints[-1]
+        nearest = min(key_cells, key=lambda c: abs(c[0] - here[0]) + abs(c[1] - here[1]))
+        key_cells.remove(nearest)
+        waypoints.append(nearest)
+    waypoints.append(portal)
+
+    route = [start]
+    for a, b in zip(waypoints, waypoints[1:]):
+        route.extend(_route_between(a, b, rng))
+
+    for i, (x, y) in enumerate(waypoints[1:-1]):
+        layout.add_key(geometry.index(x, y), COLORS[i % len(COLORS)])
+
+    # Barriers on the route only where the walk already holds a spare key
+    colors = [COLORS[i % len(COLORS)] for i in range(config.num_keys)]
+    balance = 0
+    visited = set()
+    for x, y in route:
+        cell = geometry.index(x, y)
+        if cell in visited:
+            continue
+        visited.add(cell)
+        if cell in layout.key_colors:
+            balance += 1
+        elif (cell not in taken and 0 < x < width - 1 and balance > 0
+              and colors and rng.random() < 0.5):
+            layout.add_barrier(cell, colors.pop(0))
+            taken.add(cell)
+            balance -= 1
+
+    # Everything else goes off the route, where it cannot break the solution
+    taken |= visited
+    wanted = len(colors) + 2 * config.num_teleporters + config.num_asteroids
+    free = _free_cells(geometry, taken, wanted, rng)
+    while colors and free:
+        layout.add_barrier(free.pop(), colors.pop(0))
+    for pair_id in range(config.num_teleporters):
+        if len(free) < 2:
+            break
+        layout.link_teleporters(free.pop(), free.pop())
+    layout.asteroids |= mask_of(free[:config.num_asteroids])
+
+    if geometry.cells > SOLVE_CELL_LIMIT:
+        return LevelData(level=level_num, config=config, layout=layout, attempts=1,
+                         shortfall=count_shortfall(config, layout))
+    # Teleporters and barriers can still shorten the route, so solve for the optimum
+    result = PathValidator.solve_level(layout)
+    if count_shortfall(config, layout):
+        layout, result = _fill_route(layout, config, route, colors, result, rng)
+    return LevelData(level=level_num, config=config, layout=layout,
+                     solution_length=result.moves, attempts=1,
+                     shortfall=count_shortfall(config, layout))
+
+def _fill_route(layout: CompactLevel, config: LevelConfig, route: List[Tuple[int, int]],
+                colors: List, result, rng: random.Random):
+    """Place what did not fit off the route on route cells, keeping each object
+    only if the level stays solvable; small grids run out of room otherwise"""
+    geometry = layout.geometry
+    width = geometry.width
+    spare = [geometry.index(x, y) for x, y in dict.fromkeys(route) if 0 < x < width - 1]
+    spare = [cell for cell in spare if layout.is_free(cell)]
+    rng.shuffle(spare)
+    pairs = config.num_teleporters - len(layout.pairs) // 2
+    asteroids = config.num_asteroids - bin(layout.asteroids).count("1")
+    while spare and (colors or pairs > 0 or asteroids > 0):
+        trial = layout.copy()
+        cell = spare.pop()
+        if colors:
+            trial.add_barrier(cell, colors[0])
+        elif pairs > 0:
+            if not spare:
+                break
+            trial.link_teleporters(cell, spare.pop())
+        else:
+            trial.add_asteroid(cell)
+        solved = PathValidator.solve_level(trial)
+        if not solved.solvable:
+            continue
+        layout, result = trial, solved
+        if colors:
+            colors.pop(0)
+        elif pairs > 0:
+            pairs -= 1
+        else:
+            asteroids -= 1
+    return layout, result
+
+def level_rng(seed: int, level_num: int) -> random.Random:
+    """The random stream for one level of the game started from seed"""
+    # String seeds are hashed with SHA-512, so streams match across processes
+    return random.Random(f"{seed}:{level_num}")
+
+def generate_level_data(level_num: int,
+                        config: Optional[LevelConfig] = None,
+                        rng: Optional[random.Random] = None,
+                        grid_size: Optional[Tuple[int, int]] = None) -> LevelData:
+    """Generate a solvable level with the engine selected by the level config"""
+    if config is None:
+        config = GameState.config_for_level(level_num, grid_size)
+    if rng is None:
+        rng = random.Random()
+    if config.engine == "constructive":
+        return construct_level_data(level_num, config, rng)
+    return sample_level_data(level_num, config, rng)
+
+def sample_level_data(level_num: int, config: LevelConfig, rng: random.Random) -> LevelData:
+    """Generate a solvable level by rejection sampling"""
+    max_attempts = 50  # Maximum attempts to generate a valid level
+
+    for attempt in range(max_attempts):
+        layout = build_candidate(config, rng)
+
+        # Validate level solvability
+        result = PathValidator.solve_level(layout)
+        if result.solvable:
+            return LevelData(level=level_num, config=config, layout=layout,
+                             solution_length=result.moves, attempts=attempt + 1,
+                             shortfall=count_shortfall(config, layout))
+
+    # If we couldn't generate a valid level, try with fewer objects
+    simpler = replace(
+        config,
+        num_asteroids=max(1, config.num_asteroids - 2),
+        num_teleporters=max(0, config.num_teleporters - 1)
+    )
+    level = sample_level_data(level_num, simpler, rng)  # Recursive call with simpler configuration
+    level.attempts += max_attempts
+    level.fallbacks += 1
+    return level
+
+@dataclass
+class GenerationStats:
+    engine: str
+    levels: int = 0
+    attempts: int = 0
+    elapsed: float = 0.0
+
+    def attempts_per_level(self) -> float:
+        return self.attempts / self.levels if self.levels else 0.0
+
+    def levels_per_second(self) -> float:
+        return self.levels / self.elapsed if self.elapsed else 0.0
+
+def measure_engine(engine: str, level_nums: Iterable[int], repeats: int = 20,
+                   seed: int = 0) -> GenerationStats:
+    """Generate every level in level_nums repeats times with one engine"""
+    rng = random.Random(seed)
+    stats = GenerationStats(engine=engine)
+    for level_num in level_nums:
+        config = replace(GameState.config_for_level(level_num), engine=engine)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            level = generate_level_data(level_num, config, rng)
+            stats.elapsed += time.perf_counter() - started
+            stats.attempts += level.attempts
+            stats.levels += 1
+    return stats
+
+if __name__ == "__main__":
+    # Compare both engines per difficulty band
+    for band in [(1, 5), (6, 20), (21, 50)]:
+        for engine in ["sampler", "constructive"]:
+            stats = measure_engine(engine, range(band[0], band[1] + 1))
+            print(f"levels {band[0]:>2}-{band[1]:<2} {engine:<12} "
+                  f"{stats.attempts_per_level():6.2f} attempts/level "
+                  f"{stats.levels_per_second():8.1f} levels/s")
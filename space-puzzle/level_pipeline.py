@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from collections import deque
+from typing import Deque, Optional, Tuple
+import queue
+import random
+import threading
+import time
+
+from level_generator import LevelData, generate_level_data, level_rng
+from levelpack import LevelPack
+
+@dataclass
+class PipelineMetrics:
+    levels_generated: int = 0
+    hits: int = 0
+    cache_misses: int = 0  # Player reached a level before the worker produced it
+    pack_loads: int = 0  # Levels read from the level pack instead of generated
+    max_fallbacks: int = 0  # Deepest recursion of the generator's simpler-config fallback
+    generation_times: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
+    queue_depth: int = 0
+
+    def mean_generation_time(self) -> float:
+        """Average seconds spent generating one level over the recent window"""
+        if not self.generation_times:
+            return 0.0
+        return sum(self.generation_times) / len(self.generation_times)
+
+class LevelPipeline:
+    """Builds upcoming levels on a worker thread and hands them out in order
+
+    Both threads update metrics, so every change to them holds the lock.
+
+    Every level comes from its own stream derived from the game's seed, so the
+    same seed gives the same levels whether or not the worker got there first.
+    Levels found in the level pack, if one is given, are loaded from it
+    rather than generated."""
+
+    def __init__(self, depth: int = 3, seed: Optional[int] = None,
+                 grid_size: Optional[Tuple[int, int]] = None, pack: Optional[LevelPack] = None):
+        self.depth = depth
+        self.grid_size = grid_size  # None for the standard grid
+        self.pack = pack
+        self.seed = self.new_seed() if seed is None else seed
+        self.metrics = PipelineMetrics()
+        self._queue = queue.Queue(maxsize=depth)
+        self._lock = threading.Lock()
+        self._next_level = 1
+        self._epoch = 0  # Bumped on reset so stale levels get dropped
+        self._stop = threading.Event()
+        self._thread = None
+
+    def new_seed(self) -> int:
+        """A seed for a new game; one the pack has levels for, if there is a pack"""
+        if self.pack is not None:
+            seeds = self.pack.seeds()
+            if seeds:
+                return random.choice(seeds)
+        return random.randrange(2 ** 63)
+
+    def start(self, first_level: int = 1, seed: Optional[int] = None):
+        """Start producing levels from first_level onwards"""
+        self.reset(first_level, seed)
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="level-pipeline", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def reset(self, first_level: int = 1, seed: Optional[int] = None):
+        """Discard queued levels and restart production at first_level,
+        switching to a new game's seed if one is given"""
+        with self._lock:
+            self._epoch += 1
+            self._next_level = first_level
+            if seed is not None:
+                self.seed = seed
+        self._drain()
+
+    def get(self, level_num: int) -> LevelData:
+        """Return the level for level_num, generating it inline on a cache miss"""
+        with self._lock:
+            epoch = self._epoch
+        while True:
+            try:
+                item_epoch, level = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item_epoch == epoch and level.level == level_num:
+                with self._lock:
+                    self.metrics.hits += 1
+                    self.metrics.queue_depth = self._queue.qsize()
+                return level
+
+        # The player got ahead of the generator
+        with self._lock:
+            self.metrics.cache_misses += 1
+            if self._next_level <= level_num:
+                self._next_level = level_num + 1
+            seed = self.seed
+        level = self._generate(level_num, seed)
+        with self._lock:
+            self.metrics.queue_depth = self._queue.qsize()
+        return level
+
+    def _generate(self, level_num: int, seed: int) -> LevelData:
+        started = time.perf_counter()
+        level = self.pack.get(level_num, seed) if self.pack is not None else None
+        from_pack = level is not None
+        if not from_pack:
+            level = generate_level_data(level_num, rng=level_rng(seed, level_num), grid_size=self.grid_size)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            metrics = self.metrics
+            if from_pack:
+                metrics.pack_loads += 1
+            else:
+                metrics.max_fallbacks = max(metrics.max_fallbacks, level.fallbacks)
+            metrics.generation_times.append(elapsed)
+            metrics.levels_generated += 1
+        return level
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                epoch = self._epoch
+                level_num = self._next_level
+                self._next_level += 1
+                seed = self.seed
+            level = self._generate(level_num, seed)
+
+            # Wait for room in the queue unless a reset made this level stale
+            while not self._stop.is_set():
+                with self._lock:
+                    if epoch != self._epoch:
+                        break
+                try:
+                    self._queue.put((epoch, level), timeout=0.05)
+                except queue.Full:
+                    continue
+                with self._lock:
+                    self.metrics.queue_depth = self._queue.qsize()
+                break
@@ -0,0 +1,364 @@
+"""Pre-validated levels stored in a memory-mapped pack file
+
+    python levelpack.py build levels.splp --seeds 100 --levels 1-30
+    python levelpack.py append levels.splp --seeds 100 --first-seed 100 --levels 1-30
+    python levelpack.py verify levels.splp --solve --regenerate
+
+A pack holds levels for one grid size as fixed-size records. Each record is
+keyed by its level number and the game seed it was generated from, as
+level_rng(seed, level) would generate it, and also by a hash of its content.
+Loading a level reads its bitboards straight out of the mapped file, with no
+generation or solving.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from game_state import GameState, LevelConfig, PathValidator, CompactLevel, BitGrid, DEFAULT_GRID, iter_bits
+from game_state import START, PORTAL, KEY as KEY_CELL, ASTEROID, BARRIER, TELEPORTER
+from level_generator import COLORS, SOLVE_CELL_LIMIT, LevelData, generate_level_data, level_rng
+
+MAGIC = b"SPLP"
+VERSION = 1
+# magic, version, grid width, grid height, teleporter pair slots per record, record count
+HEADER = struct.Struct("<4sBHHHI")
+# level, seed, content hash, solution length, keys, asteroids, teleporters,
+# difficulty multiplier, engine, start cell, portal cell
+RECORD = struct.Struct("<IQ16siHHHdBII")
+KEY = struct.Struct("<IQ")  # The leading (level, seed) of a record
+DIGEST_AT = KEY.size
+DIGEST_SIZE = 16
+ENGINES = ("sampler", "constructive")
+NO_CELL = 0xFFFFFFFF  # Unused teleporter pair slot
+
+# The grid plane holds game_state's cell codes; keys and barriers carry
+# their COLORS index in the high nibble
+
+class RecordLayout:
+    """Byte offsets of one record for a grid size and number of pair slots
+
+    After the RECORD fields come the asteroid, barrier, key and teleporter
+    bitboards, then one code byte per cell, then the teleporter pairs."""
+
+    def __init__(self, grid_size: Tuple[int, int], pair_slots: int):
+        self.geometry = BitGrid.of(*grid_size)
+        self.pair_slots = pair_slots
+        self.board = (self.geometry.cells + 7) // 8
+        self.boards = RECORD.size
+        self.codes = self.boards + 4 * self.board
+        self.pairs = self.codes + self.geometry.cells
+        self.pair_struct = struct.Struct(f"<{2 * pair_slots}I")
+        self.size = self.pairs + self.pair_struct.size
+
+    def encode(self, seed: int, level: LevelData) -> bytes:
+        layout, config = level.layout, level.config
+        geometry = self.geometry
+        if (layout.geometry.width, layout.geometry.height) != (geometry.width, geometry.height):
+            raise ValueError("Level is %dx%d, the pack is %dx%d" % (
+                layout.geometry.width, layout.geometry.height, geometry.width, geometry.height))
+        linked = layout.teleporter_pairs()
+        if len(linked) > self.pair_slots:
+            raise ValueError("Level has %d teleporter pairs, the pack has room for %d"
+                             % (len(linked), self.pair_slots))
+
+        record = bytearray(self.size)
+        for i, board in enumerate((layout.asteroids, layout.barriers, layout.keys, layout.teleporters)):
+            start = self.boards + i * self.board
+            record[start:start + self.board] = board.to_bytes(self.board, "little")
+        codes = self.codes
+        for board, code in ((layout.asteroids, ASTEROID), (layout.teleporters, TELEPORTER)):
+            for cell in iter_bits(board):
+                record[codes + cell] = code
+        for colors, code in ((layout.key_colors, KEY_CELL), (layout.barrier_colors, BARRIER)):
+            for cell, color in colors.items():
+                record[codes + cell] = code | COLORS.index(color) << 4
+        record[codes + layout.start] = START
+        record[codes + layout.portal] = PORTAL
+        slots = [cell for pair in linked for cell in pair]
+        self.pair_struct.pack_into(record, self.pairs, *slots, *[NO_CELL] * (2 * self.pair_slots - len(slots)))
+
+        RECORD.pack_into(record, 0, level.level, seed, bytes(DIGEST_SIZE), level.solution_length,
+                         config.num_keys, config.num_asteroids, config.num_teleporters,
+                         config.difficulty_multiplier, ENGINES.index(config.engine),
+                         layout.start, layout.portal)
+        record[DIGEST_AT:DIGEST_AT + DIGEST_SIZE] = self.digest(record)
+        return bytes(record)
+
+    @staticmethod
+    def digest(record) -> bytes:
+        """Hash of everything in a record after the digest itself"""
+        return hashlib.blake2b(record[DIGEST_AT + DIGEST_SIZE:], digest_size=DIGEST_SIZE).digest()
+
+    def decode(self, record: memoryview) -> Tuple[int, LevelData]:
+        """(seed, level) from one record; the bitboards are read in place"""
+        (level_num, seed, _, solution_length, num_keys, num_asteroids, num_teleporters,
+         difficulty, engine, start, portal) = RECORD.unpack_from(record)
+        geometry = self.geometry
+        layout = CompactLevel.__new__(CompactLevel)
+        layout.geometry = geometry
+        layout.start = start
+        layout.portal = portal
+        board, at = self.board, self.boards
+        layout.asteroids = int.from_bytes(record[at:at + board], "little")
+        layout.barriers = int.from_bytes(record[at + board:at + 2 * board], "little")
+        layout.keys = int.from_bytes(record[at + 2 * board:at + 3 * board], "little")
+        layout.teleporters = int.from_bytes(record[at + 3 * board:at + 4 * board], "little")
+        codes = self.codes
+        layout.key_colors = {cell: COLORS[record[codes + cell] >> 4] for cell in iter_bits(layout.keys)}
+        layout.barrier_colors = {cell: COLORS[record[codes + cell] >> 4]
+                                 for cell in iter_bits(layout.barriers)}
+        pairs = {}
+        slots = self.pair_struct.unpack_from(record, self.pairs)
+        for first, second in zip(slots[::2], slots[1::2]):
+            if first == NO_CELL:
+                break
+            pairs[first] = second
+            pairs[second] = first
+        layout.pairs = pairs
+
+        config = LevelConfig(num_keys=num_keys, num_asteroids=num_asteroids,
+                             num_teleporters=num_teleporters,
+                             grid_size=(geometry.width, geometry.height),
+                             difficulty_multiplier=difficulty, engine=ENGINES[engine])
+        return seed, LevelData(level=level_num, config=config, layout=layout,
+                               solution_length=solution_length)
+
+    def check_codes(self, record: memoryview) -> bool:
+        """Whether the cell code plane agrees with the bitboards and endpoints"""
+        _, level = self.decode(record)
+        layout = level.layout
+        expected = bytes(self.encode(0, level)[self.codes:self.pairs])
+        return bytes(record[self.codes:self.pairs]) == expected and not (
+            (layout.asteroids | layout.barriers | layout.keys | layout.teleporters)
+            & ((1 << layout.start) | (1 << layout.portal)))
+
+class LevelPack:
+    """Read-only view of a pack file, indexed by (level, seed) and by content hash
+
+    Records are read from the mapped file as they are asked for; opening a
+    pack only reads the keys and hashes to build the indexes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, width, height, pair_slots, count = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a version %d level pack: %s" % (VERSION, path))
+        self.grid_size = (width, height)
+        self.layout = RecordLayout(self.grid_size, pair_slots)
+        self.count = count
+        if len(self._map) < HEADER.size + count * self.layout.size:
+            self.close()
+            raise ValueError("Level pack is truncated: %s" % path)
+
+        self.index: Dict[Tuple[int, int], int] = {}
+        self.hashes: Dict[bytes, int] = {}
+        size = self.layout.size
+        for i in range(count):
+            at = HEADER.size + i * size
+            self.index.setdefault(KEY.unpack_from(self._view, at), i)
+            self.hashes.setdefault(bytes(self._view[at + DIGEST_AT:at + DIGEST_AT + DIGEST_SIZE]), i)
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self) -> "LevelPack":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self.index
+
+    def record(self, i: int) -> memoryview:
+        """Record i in place; release the view (or use it in a with block)
+        before closing the pack"""
+        at = HEADER.size + i * self.layout.size
+        return self._view[at:at + self.layout.size]
+
+    def _decode(self, i: int) -> Tuple[int, LevelData]:
+        with self.record(i) as record:
+            return self.layout.decode(record)
+
+    def get(self, level_num: int, seed: int) -> Optional[LevelData]:
+        """The level generated for level_num from seed, or None if not in the pack"""
+        i = self.index.get((level_num, seed))
+        if i is None:
+            return None
+        return self._decode(i)[1]
+
+    def by_hash(self, digest: bytes) -> Optional[Tuple[int, LevelData]]:
+        """(seed, level) for a content hash, or None if not in the pack"""
+        i = self.hashes.get(digest)
+        return None if i is None else self._decode(i)
+
+    def seeds(self) -> List[int]:
+        """Seeds with at least level 1 in the pack, for starting games from it"""
+        return sorted(seed for level_num, seed in self.index if level_num == 1)
+
+    def __iter__(self) -> Iterator[Tuple[int, LevelData]]:
+        for i in range(self.count):
+            yield self._decode(i)
+
+def write_pack(path: str, levels: Iterable[Tuple[int, LevelData]],
+               grid_size: Tuple[int, int] = DEFAULT_GRID, pair_slots: int = 3) -> int:
+    """Write a new pack of (seed, level) entries, replacing any file at path;
+    returns the number written"""
+    layout = RecordLayout(grid_size, pair_slots)
+    count = 0
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, *grid_size, pair_slots, 0))
+        for seed, level in levels:
+            f.write(layout.encode(seed, level))
+            count += 1
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, *grid_size, pair_slots, count))
+    os.replace(temp, path)
+    return count
+
+def append_pack(path: str, levels: Iterable[Tuple[int, LevelData]]) -> int:
+    """Add (seed, level) entries whose key is not in the pack yet; returns the number added"""
+    with LevelPack(path) as pack:
+        existing = set(pack.index)
+        grid_size, layout, count = pack.grid_size, pack.layout, pack.count
+    added = 0
+    with open(path, "r+b") as f:
+        f.seek(HEADER.size + count * layout.size)
+        for seed, level in levels:
+            if (level.level, seed) in existing:
+                continue
+            existing.add((level.level, seed))
+            f.write(layout.encode(seed, level))
+            added += 1
+        f.truncate()
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, *grid_size, layout.pair_slots, count + added))
+    return added
+
+def pair_slots_for(level_nums: Sequence[int], grid_size: Tuple[int, int]) -> int:
+    """Teleporter pair slots enough for any level in level_nums"""
+    return max(GameState.config_for_level(level_num, grid_size).num_teleporters
+               for level_num in level_nums)
+
+def _generate(task: Tuple[int, int, Tuple[int, int]]) -> Tuple[int, LevelData]:
+    seed, level_num, grid_size = task
+    return seed, generate_level_data(level_num, rng=level_rng(seed, level_num), grid_size=grid_size)
+
+def generate(keys: Iterable[Tuple[int, int]], grid_size: Tuple[int, int],
+             workers: int = 1) -> Iterator[Tuple[int, LevelData]]:
+    """The level the game would play for each (level, seed), over worker
+    processes when workers > 1"""
+    tasks = [(seed, level_num, grid_size) for level_num, seed in keys]
+    if workers <= 1:
+        yield from map(_generate, tasks)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_generate, tasks, chunksize=16)
+
+def verify(path: str, solve: bool = False, regenerate: bool = False) -> List[str]:
+    """Problems found in a pack: corrupt records, code planes that disagree
+    with the bitboards, and optionally solution lengths or layouts that no
+    longer match solving or regenerating the level"""
+    problems = []
+    with LevelPack(path) as pack:
+        layout = pack.layout
+        for i in range(pack.count):
+            with pack.record(i) as record:
+                level_num, seed = KEY.unpack_from(record)
+                where = f"record {i} (level {level_num}, seed {seed})"
+                if layout.digest(record) != bytes(record[DIGEST_AT:DIGEST_AT + DIGEST_SIZE]):
+                    problems.append(f"{where}: content hash mismatch")
+                    continue
+                if not layout.check_codes(record):
+                    problems.append(f"{where}: cell codes disagree with the bitboards")
+                    continue
+                _, level = layout.decode(record)
+                stored = bytes(record)
+            if solve and layout.geometry.cells <= SOLVE_CELL_LIMIT:
+                result = PathValidator.solve_level(level.layout)
+                if not result.solvable:
+                    problems.append(f"{where}: unsolvable")
+                elif level.solution_length not in (-1, result.moves):
+                    problems.append(f"{where}: solution length {level.solution_length}, "
+                                    f"solver says {result.moves}")
+            if regenerate:
+                _, fresh = _generate((seed, level_num, pack.grid_size))
+                if layout.encode(seed, fresh) != stored:
+                    problems.append(f"{where}: differs from a fresh generation")
+    return problems
+
+def load_time(path: str, repeats: int = 3) -> float:
+    """Mean seconds to load one level by (level, seed), best of repeats"""
+    with LevelPack(path) as pack:
+        keys = list(pack.index)
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for level_num, seed in keys:
+                pack.get(level_num, seed)
+            best = min(best, time.perf_counter() - started)
+    return best / len(keys) if keys else 0.0
+
+def _level_range(text: str) -> List[int]:
+    first, _, last = text.partition("-")
+    return list(range(int(first), int(last or first) + 1))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["build", "append", "verify"])
+    parser.add_argument("path", help="pack file")
+    parser.add_argument("--seeds", type=int, default=100, help="games to generate levels for")
+    parser.add_argument("--first-seed", type=int, default=0, help="seeds run from here upwards")
+    parser.add_argument("--levels", default="1-20", help="level range, e.g. 1-30")
+    parser.add_argument("--grid", default="6x5", help="grid size, e.g. 64x64 (build only)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes to generate with")
+    parser.add_argument("--solve", action="store_true", help="verify: re-solve every level")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="verify: check every level against a fresh generation")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "verify":
+        problems = verify(args.path, args.solve, args.regenerate)
+        for problem in problems:
+            print(problem)
+        with LevelPack(args.path) as pack:
+            count = len(pack)
+        print(f"{count - len(problems)}/{count} levels verified in "
+              f"{time.perf_counter() - started:.2f}s, "
+              f"{load_time(args.path) * 1e6:.1f} us per level loaded")
+        return 1 if problems else 0
+
+    level_nums = _level_range(args.levels)
+    keys = [(level_num, seed) for seed in range(args.first_seed, args.first_seed + args.seeds)
+            for level_num in level_nums]
+    if args.command == "build":
+        grid_size = tuple(int(n) for n in args.grid.split("x"))
+        pair_slots = pair_slots_for(level_nums, grid_size)
+        count = write_pack(args.path, generate(keys, grid_size, args.workers), grid_size, pair_slots)
+    else:
+        with LevelPack(args.path) as pack:
+            grid_size = pack.grid_size
+            keys = [key for key in keys if key not in pack]
+        count = append_pack(args.path, generate(keys, grid_size, args.workers))
+    print(f"wrote {count} levels to {args.path} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
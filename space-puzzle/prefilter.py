@@ -0,0 +1,233 @@
+"""Reject unsolvable candidate levels in bulk before any exact solve
+
+Candidates are stacked into one (N, rows, cols) array of cell codes and
+flood-filled together: the grids are packed into 64-bit words and a step of
+the fill is a handful of shifts over the whole batch, so screening thousands
+of layouts costs a few dozen array operations rather than a loop per cell.
+A candidate is rejected only if it certainly cannot be finished; the
+survivors still need PathValidator.solve_level.
+
+NumPy is optional for the game itself and only needed here."""
+import time
+from itertools import chain
+from typing import Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("prefilter needs NumPy, which the game itself does not: "
+                      "pip install -r requirements-optional.txt") from error
+
+from game_state import CompactLevel, START, PORTAL, KEY, ASTEROID, BARRIER, TELEPORTER
+
+def _plane(masks: Sequence[int], shape: Tuple[int, int, int]) -> np.ndarray:
+    """Bitboards (bit i = cell i) unpacked into an (N, rows, cols) bool array"""
+    count, rows, cols = shape
+    width = (rows * cols + 7) // 8
+    packed = np.frombuffer(b"".join(mask.to_bytes(width, "little") for mask in masks), np.uint8)
+    bits = np.unpackbits(packed.reshape(count, width), axis=1, bitorder="little")
+    return bits[:, :rows * cols].reshape(shape).view(bool)
+
+def encode(layouts: Sequence[CompactLevel]) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell codes of same-sized layouts as an (N, rows, cols) uint8 array, plus
+    teleporter pairs as an (N, pairs, 2) array of flat cell indexes padded with -1"""
+    geometry = layouts[0].geometry
+    shape = (len(layouts), geometry.height, geometry.width)
+    grids = np.zeros(shape, np.uint8)
+    grids[_plane([layout.asteroids for layout in layouts], shape)] = ASTEROID
+    grids[_plane([layout.barriers for layout in layouts], shape)] = BARRIER
+    grids[_plane([layout.keys for layout in layouts], shape)] = KEY
+    grids[_plane([layout.teleporters for layout in layouts], shape)] = TELEPORTER
+    flat = grids.reshape(len(layouts), -1)
+    flat[np.arange(len(layouts)), [layout.start for layout in layouts]] = START
+    flat[np.arange(len(layouts)), [layout.portal for layout in layouts]] = PORTAL
+
+    most = max(len(layout.pairs) // 2 for layout in layouts)
+    pairs = np.full((len(layouts), most, 2), -1, np.int32)
+    for i, layout in enumerate(layouts):
+        linked = layout.teleporter_pairs()
+        if linked:
+            pairs[i, :len(linked)] = linked
+    return grids, pairs
+
+class _Packing:
+    """How a batch of boolean grids is packed into uint64 words
+
+    Grids of up to 64 cells take one word per candidate, laid out like
+    CompactLevel's bitboards. Larger grids take a word per 64 columns of each
+    row. Either way a step of the flood fill is a few shifts over the batch."""
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.flat = rows * cols <= 64
+        self.words = (cols + 63) // 64
+        self.axes = () if self.flat else (1, 2)  # Axes to reduce for a per-candidate answer
+        if self.flat:
+            cells = rows * cols
+            left = sum(1 << (y * cols) for y in range(rows))
+            self.full = np.uint64((1 << cells) - 1)
+            self.not_first = np.uint64(((1 << cells) - 1) & ~left)  # Cells with x > 0
+            self.not_last = np.uint64(((1 << cells) - 1) & ~(left << (cols - 1)))
+
+    def pack(self, plane: np.ndarray) -> np.ndarray:
+        count = plane.shape[0]
+        if self.flat:
+            padded = np.zeros((count, 64), bool)
+            padded[:, :self.rows * self.cols] = plane.reshape(count, -1)
+            return np.packbits(padded, axis=1, bitorder="little").view("<u8")[:, 0]
+        padded = np.zeros((count, self.rows, self.words * 64), bool)
+        padded[:, :, :self.cols] = plane
+        return np.packbits(padded, axis=2, bitorder="little").view("<u8")
+
+    def from_masks(self, masks: Sequence[int]) -> np.ndarray:
+        """Pack CompactLevel bitboards, which already match the one-word layout"""
+        if self.flat:
+            return np.fromiter(masks, np.uint64, len(masks))
+        return self.pack(_plane(masks, (len(masks), self.rows, self.cols)))
+
+    def jumper(self, jumps: np.ndarray):
+        """A function from entered cells to the exit cells of every teleporter
+        entered; jumps is (N, slots, 2) flat (entry, exit) cell indexes in both
+        directions, -1 for unused slots"""
+        one = np.uint64(1)
+        live = jumps[:, :, 0] >= 0
+        entry = np.where(live, jumps[:, :, 0], 0)
+        exit_ = np.where(live, jumps[:, :, 1], 0)
+        if self.flat:
+            entry_bit = entry.astype(np.uint64)
+            exit_mask = np.where(live, one << exit_.astype(np.uint64), np.uint64(0))
+
+            def jump(entered):
+                fired = (entered[:, None] >> entry_bit) & one
+                return np.bitwise_or.reduce(exit_mask * fired, axis=1)
+            return jump
+
+        candidate = np.broadcast_to(np.arange(len(jumps))[:, None], entry.shape)
+        entry_row, entry_col = np.divmod(entry, self.cols)
+        entry_word, entry_bit = entry_col // 64, (entry_col % 64).astype(np.uint64)
+        exit_row, exit_col = np.divmod(exit_, self.cols)
+        exit_word, exit_mask = exit_col // 64, one << (exit_col % 64).astype(np.uint64)
+
+        def jump(entered):
+            words = entered[candidate, entry_row, entry_word]
+            fired = live & ((words >> entry_bit) & one).astype(bool)
+            landed = np.zeros_like(entered)
+            np.bitwise_or.at(landed, (candidate[fired], exit_row[fired], exit_word[fired]),
+                             exit_mask[fired])
+            return landed
+        return jump
+
+    def cells(self, cells: np.ndarray) -> np.ndarray:
+        """Every listed cell set, from (N, slots) flat indexes with -1 for none"""
+        one = np.uint64(1)
+        live = cells >= 0
+        safe = np.where(live, cells, 0)
+        if self.flat:
+            return np.bitwise_or.reduce(np.where(live, one << safe.astype(np.uint64), np.uint64(0)),
+                                        axis=1)
+        packed = np.zeros((len(cells), self.rows, self.words), np.uint64)
+        candidate = np.broadcast_to(np.arange(len(cells))[:, None], cells.shape)[live]
+        row, col = np.divmod(safe[live], self.cols)
+        np.bitwise_or.at(packed, (candidate, row, col // 64), one << (col % 64).astype(np.uint64))
+        return packed
+
+    def spread(self, reached: np.ndarray) -> np.ndarray:
+        """reached plus every cell next to it"""
+        one = np.uint64(1)
+        if self.flat:
+            cols = np.uint64(self.cols)
+            return (reached | ((reached << one) & self.not_first) | ((reached >> one) & self.not_last)
+                    | (reached << cols) | (reached >> cols)) & self.full
+        spread = reached.copy()
+        spread[:, 1:] |= reached[:, :-1]
+        spread[:, :-1] |= reached[:, 1:]
+        spread |= reached << one
+        spread |= reached >> one
+        if self.words > 1:
+            # Carry bits across word boundaries within a row
+            top = np.uint64(63)
+            spread[:, :, 1:] |= reached[:, :, :-1] >> top
+            spread[:, :, :-1] |= reached[:, :, 1:] << top
+        return spread
+
+    def any(self, packed: np.ndarray) -> np.ndarray:
+        """Per candidate, whether any cell is set"""
+        return packed.any(axis=self.axes) if self.axes else packed != 0
+
+def _jumps(pairs: np.ndarray) -> np.ndarray:
+    """Teleporter pairs (N, pairs, 2) as jumps both ways, (N, 2 * pairs, 2)"""
+    return np.concatenate([pairs, pairs[:, :, ::-1]], axis=1)
+
+def flood(packing: _Packing, seed: np.ndarray, passable: np.ndarray, jumps: np.ndarray) -> np.ndarray:
+    """Cells each candidate can stand on, spreading from seed through passable
+    cells; stepping into a teleporter lands on its partner instead"""
+    # Teleporter cells can be entered but not stood on
+    landing = passable & ~packing.cells(jumps[:, :, 0])
+    jump = packing.jumper(jumps) if jumps.shape[1] else None
+
+    reached = seed & passable
+    while True:
+        entered = packing.spread(reached) & passable
+        grown = entered & landing
+        if jump is not None:
+            grown |= jump(entered)
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+def _screen(packing: _Packing, passable: np.ndarray, barriers: np.ndarray, start: np.ndarray,
+            keys: np.ndarray, portal: np.ndarray, jumps: np.ndarray, start_keys: int) -> np.ndarray:
+    reached = flood(packing, start, passable, jumps)
+    plausible = ~packing.any(keys & ~reached) & packing.any(portal & reached)
+    if start_keys:
+        return plausible
+
+    closed = flood(packing, start, passable & ~barriers, jumps)
+    has_keys = packing.any(keys)
+    first = np.where(has_keys, packing.any(keys & closed), packing.any(portal & closed))
+    return plausible & first
+
+def screen(grids: np.ndarray, pairs: np.ndarray, start_keys: int = 0) -> np.ndarray:
+    """Bool per candidate: False if it certainly cannot be finished
+
+    With barriers open, every key and the portal must be reachable. With
+    barriers closed and no keys carried in, something must still be reachable
+    before the first barrier: a key, or the portal if there are no keys."""
+    packing = _Packing(grids.shape[1], grids.shape[2])
+    return _screen(packing, packing.pack(grids != ASTEROID), packing.pack(grids == BARRIER),
+                   packing.pack(grids == START), packing.pack(grids == KEY),
+                   packing.pack(grids == PORTAL), _jumps(pairs), start_keys)
+
+def screen_layouts(layouts: Sequence[CompactLevel], start_keys: int = 0) -> np.ndarray:
+    """screen() for same-sized CompactLevels, packed straight from their bitboards"""
+    geometry = layouts[0].geometry
+    packing = _Packing(geometry.height, geometry.width)
+    full = geometry.full
+    # Each pairs dict already maps both ways; spread its items over padded slots
+    counts = np.fromiter((len(layout.pairs) for layout in layouts), np.int64, len(layouts))
+    total = int(counts.sum())
+    jumps = np.full((len(layouts), int(counts.max()), 2), -1, np.int64)
+    if total:
+        owner = np.repeat(np.arange(len(layouts)), counts)
+        slot = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        jumps[owner, slot, 0] = np.fromiter(chain.from_iterable(layout.pairs for layout in layouts),
+                                            np.int64, total)
+        jumps[owner, slot, 1] = np.fromiter(
+            chain.from_iterable(layout.pairs.values() for layout in layouts), np.int64, total)
+    return _screen(packing,
+                   packing.from_masks([full & ~layout.asteroids for layout in layouts]),
+                   packing.from_masks([layout.barriers for layout in layouts]),
+                   packing.from_masks([1 << layout.start for layout in layouts]),
+                   packing.from_masks([layout.keys for layout in layouts]),
+                   packing.from_masks([1 << layout.portal for layout in layouts]),
+                   jumps, start_keys)
+
+def throughput(layouts: Sequence[CompactLevel], repeats: int = 3) -> Tuple[float, float]:
+    """(candidates screened per second including encoding, share rejected)"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        plausible = screen_layouts(layouts)
+        best = min(best, time.perf_counter() - started)
+    return len(layouts) / best, 1 - plausible.mean()
@@ -0,0 +1,153 @@
+import csv
+import gc
+import sys
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Deque, Dict, Iterable, List
+
+# Phases of a frame in the order they run
+PHASES = ("wait", "events", "logic", "generation", "draw", "present")
+
+_DISABLED = nullcontext()
+
+def percentile(samples: Iterable[float], pct: float) -> float:
+    """Nearest-rank percentile of samples; 0.0 when there are none"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class _Section:
+    """Times one phase; reused for every frame so timing allocates nothing"""
+
+    __slots__ = ("profiler", "phase", "started", "nested")
+
+    def __init__(self, profiler, phase):
+        self.profiler = profiler
+        self.phase = phase
+        self.started = 0.0
+        self.nested = 0.0  # Time spent in sections opened inside this one
+
+    def __enter__(self):
+        self.nested = 0.0
+        self.profiler.stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stack = self.profiler.stack
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        # Phases are exclusive, so a level generated during a move is not counted as logic
+        self.profiler.current[self.phase] += elapsed - self.nested
+        return False
+
+class FrameProfiler:
+    """Per-phase frame timings kept over a rolling window of frames
+
+    Wrap each phase in ``with profiler.section(name)`` and bracket the frame
+    with begin_frame()/end_frame(). While disabled, section() hands back a
+    shared no-op context and nothing is recorded.
+
+    Each frame also records the change in live memory blocks, and garbage
+    collections are counted per generation while enabled. In steady-state
+    play both should stay at zero."""
+
+    def __init__(self, window: int = 600, enabled: bool = False):
+        self.enabled = enabled
+        self.window = window
+        self.sections = {phase: _Section(self, phase) for phase in PHASES}
+        self.stack: List[_Section] = []
+        self.current: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.history: Dict[str, Deque[float]] = {phase: deque(maxlen=window) for phase in PHASES}
+        self.frame_times: Deque[float] = deque(maxlen=window)
+        self.frame_numbers: Deque[int] = deque(maxlen=window)
+        self.frames = 0
+        self.frame_started = 0.0
+        self.blocks_started = 0
+        self.allocations: Deque[int] = deque(maxlen=window)  # Net blocks allocated per frame
+        self.collections = [0, 0, 0]  # Garbage collections by generation
+        if enabled:
+            gc.callbacks.append(self._count_collection)
+
+    def toggle(self) -> bool:
+        self.enabled = not self.enabled
+        self.stack.clear()
+        self.frame_started = 0.0
+        if self.enabled:
+            gc.callbacks.append(self._count_collection)
+        else:
+            gc.callbacks.remove(self._count_collection)
+        return self.enabled
+
+    def _count_collection(self, phase: str, info: Dict[str, int]):
+        if phase == "stop":
+            self.collections[info["generation"]] += 1
+
+    def section(self, phase: str):
+        if not self.enabled:
+            return _DISABLED
+        return self.sections[phase]
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        self.blocks_started = sys.getallocatedblocks()
+        self.frame_started = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or not self.frame_started:
+            return
+        self.frames += 1
+        self.frame_numbers.append(self.frames)
+        self.frame_times.append(time.perf_counter() - self.frame_started)
+        for phase in PHASES:
+            self.history[phase].append(self.current[phase])
+        self.allocations.append(sys.getallocatedblocks() - self.blocks_started)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 in milliseconds per phase and for whole frames"""
+        series = dict(self.history)
+        series["frame"] = self.frame_times
+        return {
+            name: {f"p{pct}": percentile(samples, pct) * 1000 for pct in (50, 95, 99)}
+            for name, samples in series.items()
+        }
+
+    def allocation_summary(self) -> Dict[str, float]:
+        """Net blocks allocated per frame over the window, and collections so far"""
+        allocations = self.allocations
+        return {
+            "blocks_per_frame": sum(allocations) / len(allocations) if allocations else 0.0,
+            "allocating_frames": sum(1 for blocks in allocations if blocks > 0),
+            "gen0": self.collections[0],
+            "gen1": self.collections[1],
+            "gen2": self.collections[2],
+        }
+
+    def report_lines(self) -> List[str]:
+        lines = ["phase        p50    p95    p99 ms"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<10} {stats['p50']:6.2f} {stats['p95']:6.2f} {stats['p99']:6.2f}")
+        alloc = self.allocation_summary()
+        lines.append(f"alloc {alloc['blocks_per_frame']:+.1f} blocks/frame, "
+                     f"{alloc['allocating_frames']} frames")
+        lines.append(f"gc    {alloc['gen0']}/{alloc['gen1']}/{alloc['gen2']} collections")
+        return lines
+
+    def export_csv(self, path: str) -> int:
+        """Write the frames in the window, one row each in milliseconds; returns rows written"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", *PHASES, "total", "blocks"])
+            columns = [self.history[phase] for phase in PHASES]
+            for i, frame in enumerate(self.frame_numbers):
+                writer.writerow([frame, *(f"{column[i] * 1000:.4f}" for column in columns),
+                                 f"{self.frame_times[i] * 1000:.4f}", self.allocations[i]])
+        return len(self.frame_numbers)
@@ -0,0 +1,254 @@
+import pygame
+from contextlib import nullcontext
+from typing import Iterable, List, Sequence
+
+_UNCHANGED: Sequence[pygame.Rect] = ()  # Shared, so unchanged text allocates nothing
+
+class Sprite:
+    """A surface at a fixed position, for things that are not game entities"""
+
+    def __init__(self, surface, pos):
+        self.surface = surface
+        self.rect = surface.get_rect(topleft=pos)
+
+    def image(self):
+        return self.surface
+
+class TextField:
+    """A line of HUD text, re-rendered only when the value it shows changes"""
+
+    def __init__(self, font, template: str, pos, color="white"):
+        self.font = font
+        self.template = template
+        self.pos = pos
+        self.color = color
+        self.value = None
+        self.surface = None
+        self.rect = pygame.Rect(pos, (0, 0))
+
+    def update(self, value) -> Sequence[pygame.Rect]:
+        """Show value, returning the regions that need repainting"""
+        if self.surface is not None and value == self.value:
+            return _UNCHANGED
+        old_rect = self.rect
+        self.value = value
+        self.surface = self.font.render(self.template.format(value), 1, self.color)
+        self.rect = self.surface.get_rect(topleft=self.pos)
+        return [old_rect, self.rect]
+
+    def image(self):
+        return self.surface
+
+class TextPanel:
+    """A block of monospaced lines on a translucent backing, drawn by DirtyRenderer"""
+
+    def __init__(self, font, pos, color="white", alpha=160, anchor="topleft"):
+        self.font = font
+        self.pos = pos
+        self.anchor = anchor  # Which corner of the panel sits at pos
+        self.color = color
+        self.alpha = alpha
+        self.lines: Sequence[str] = ()
+        self.surface = None
+        self.rect = pygame.Rect(pos, (0, 0))
+
+    def update(self, lines: Sequence[str]) -> Sequence[pygame.Rect]:
+        """Show lines, returning the regions that need repainting"""
+        lines = list(lines)
+        if lines == self.lines:
+            return _UNCHANGED
+        old_rect = self.rect
+        self.lines = lines
+        if not lines:
+            self.surface = None
+            self.rect = pygame.Rect(self.pos, (0, 0))
+            return [old_rect]
+        rendered = [self.font.render(line, 1, self.color) for line in lines]
+        height = self.font.get_linesize()
+        width = max(text.get_width() for text in rendered)
+        self.surface = pygame.Surface((width + 8, height * len(rendered) + 8), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, self.alpha))
+        self.surface.blits([(text, (4, 4 + i * height)) for i, text in enumerate(rendered)],
+                           doreturn=False)
+        self.rect = self.surface.get_rect(**{self.anchor: self.pos})
+        return [old_rect, self.rect]
+
+    def image(self):
+        return self.surface
+
+class OverlayLayer:
+    """A full-window screen composited once over a snapshot of the frame beneath"""
+
+    def __init__(self, alpha: int):
+        self.alpha = alpha
+        self.key = None
+        self.base = None
+        self.surface = None
+
+    @property
+    def visible(self) -> bool:
+        return self.surface is not None
+
+    def show(self, window, key, lines) -> bool:
+        """Present the layer, rebuilding it only when key changes; lines is a
+        callable returning (text surface, y) pairs centered horizontally"""
+        if self.surface is not None and key == self.key:
+            return False
+        if self.base is None:
+            self.base = window.copy()
+        self.key = key
+
+        self.surface = self.base.copy()
+        overlay = pygame.Surface(self.surface.get_size())
+        overlay.fill((0, 0, 0))
+        overlay.set_alpha(self.alpha)
+        self.surface.blit(overlay, (0, 0))
+        width = self.surface.get_width()
+        self.surface.blits([(text, (width // 2 - text.get_width() // 2, y)) for text, y in lines()],
+                           doreturn=False)
+
+        window.blit(self.surface, (0, 0))
+        pygame.display.flip()
+        return True
+
+    def hide(self):
+        self.key = None
+        self.base = None
+        self.surface = None
+
+class Camera:
+    """The part of the grid on screen, scrolled in whole cells to keep a cell in view"""
+
+    def __init__(self, origin, cell_size: int, view, margin: int = 1):
+        self.origin = origin  # Screen position of the top-left visible cell
+        self.cell_size = cell_size
+        self.view = view  # Most columns and rows shown at once
+        self.margin = margin  # Cells kept between the followed cell and the edge
+        self.grid = view
+        self.cols, self.rows = view
+        self.x = 0
+        self.y = 0
+
+    def reset(self, grid, focus):
+        """Show a new grid, scrolled to focus"""
+        self.grid = grid
+        self.cols = min(self.view[0], grid[0])
+        self.rows = min(self.view[1], grid[1])
+        self.x = self.y = 0
+        self.follow(*focus)
+
+    def _scroll(self, start: int, target: int, shown: int, total: int) -> int:
+        margin = min(self.margin, (shown - 1) // 2)
+        start = min(start, target - margin)
+        start = max(start, target + margin - shown + 1)
+        return max(0, min(start, total - shown))
+
+    def follow(self, grid_x: int, grid_y: int) -> bool:
+        """Scroll just enough to keep the cell in view; returns whether the view moved"""
+        x = self._scroll(self.x, grid_x, self.cols, self.grid[0])
+        y = self._scroll(self.y, grid_y, self.rows, self.grid[1])
+        moved = (x, y) != (self.x, self.y)
+        self.x, self.y = x, y
+        return moved
+
+    def to_screen(self, grid_x: int, grid_y: int):
+        return (self.origin[0] + (grid_x - self.x) * self.cell_size,
+                self.origin[1] + (grid_y - self.y) * self.cell_size)
+
+    def cells(self):
+        """Every visible cell, row by row"""
+        for y in range(self.y, self.y + self.rows):
+            for x in range(self.x, self.x + self.cols):
+                yield x, y
+
+class DirtyRenderer:
+    """Retained-mode renderer that only repaints and presents changed regions
+
+    Anything drawn must expose a ``rect`` and an ``image()`` method returning
+    the surface to blit there (or None to draw nothing)."""
+
+    def __init__(self, window, background, profiler=None):
+        self.window = window
+        self.profiler = profiler  # Times display.update as the "present" phase
+        self.background = background  # Static layer the dirty regions are restored from
+        self.screen_rect = window.get_rect()
+        self.dirty: List[pygame.Rect] = []
+        self._scratch = pygame.Rect(0, 0, 0, 0)
+        self.full_redraw = True
+
+        # Pixels presented, to compare against full-window flips
+        self.frames = 0
+        self.frames_presented = 0
+        self.last_frame_pixels = 0
+        self.total_pixels = 0
+
+    @property
+    def pending(self) -> bool:
+        """Whether the next render() has anything to repaint"""
+        return self.full_redraw or bool(self.dirty)
+
+    def invalidate(self):
+        """Repaint the whole window on the next frame"""
+        self.full_redraw = True
+
+    def mark(self, rect):
+        """Repaint rect on the next frame"""
+        # Tested in a scratch rect, so only regions actually kept allocate;
+        # pygame has no in-place clip, so one that overhangs the window is
+        # clipped into its copy
+        scratch = self._scratch
+        scratch.update(rect)
+        screen = self.screen_rect
+        if not scratch.colliderect(screen):
+            return  # Empty or wholly off screen
+        self.dirty.append(scratch.copy() if screen.contains(scratch) else scratch.clip(screen))
+
+    def _merged_dirty(self) -> List[pygame.Rect]:
+        if self.full_redraw:
+            return [self.screen_rect.copy()]
+        merged: List[pygame.Rect] = []
+        for rect in self.dirty:
+            # Fold overlapping regions together so nothing is painted twice
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def render(self, drawables: Iterable) -> int:
+        """Repaint dirty regions with drawables in z-order, returns pixels presented"""
+        self.frames += 1
+        if not self.full_redraw and not self.dirty:
+            self.last_frame_pixels = 0
+            return 0
+
+        regions = self._merged_dirty()
+        batch = [(self.background, region, region) for region in regions]
+        for drawable in drawables:
+            rect = drawable.rect
+            overlaps = rect.collidelistall(regions)
+            if not overlaps:
+                continue
+            surface = drawable.image()
+            if surface is None:
+                continue
+            for index in overlaps:
+                # Only the part inside the region, so sprites above it stay intact
+                clip = rect.clip(regions[index])
+                area = clip.move(-rect.x, -rect.y)
+                batch.append((surface, clip, area))
+        self.window.blits(batch, doreturn=False)
+        with self.profiler.section("present") if self.profiler else nullcontext():
+            pygame.display.update(regions)
+
+        pixels = sum(region.width * region.height for region in regions)
+        self.last_frame_pixels = pixels
+        self.total_pixels += pixels
+        self.frames_presented += 1
+        self.dirty.clear()
+        self.full_redraw = False
+        return pixels
+
+    def average_pixels_per_frame(self) -> float:
+        return self.total_pixels / self.frames if self.frames else 0.0
@@ -0,0 +1,119 @@
+"""Record games as seeds plus moves, and re-run them headless to check the score
+
+    python replay.py replays/*.sprp              # verify recorded games
+    python replay.py --workers 8 replays/*.sprp
+"""
+import argparse
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Tuple
+
+from engine import GameEngine, DIRECTIONS, LEVEL_COMPLETE, GAME_OVER
+from game_state import GameState, DEFAULT_GRID
+from level_generator import generate_level_data, level_rng
+
+MAGIC = b"SPRP"
+VERSION = 2
+# magic, version, seed, final score, final level, move count, grid width, grid height
+HEADER = struct.Struct("<4sBQIHIHH")
+
+@dataclass
+class Replay:
+    """One game: the seed its levels came from and every move made
+
+    Moves are indexes into engine.DIRECTIONS and are stored four to a byte."""
+    seed: int
+    moves: bytearray = field(default_factory=bytearray)
+    score: int = 0  # Final score as reported by the game that recorded it
+    level: int = 1
+    grid_size: Tuple[int, int] = DEFAULT_GRID
+
+    def record(self, action: int):
+        self.moves.append(action)
+
+    def to_bytes(self) -> bytes:
+        packed = bytearray((len(self.moves) + 3) // 4)
+        for i, action in enumerate(self.moves):
+            packed[i >> 2] |= action << ((i & 3) * 2)
+        return HEADER.pack(MAGIC, VERSION, self.seed, self.score, self.level, len(self.moves),
+                           *self.grid_size) + packed
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Replay":
+        if len(data) < HEADER.size:
+            raise ValueError("Replay is truncated")
+        magic, version, seed, score, level, count, width, height = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version %d replay" % VERSION)
+        grid_size, packed = (width, height), data[HEADER.size:]
+        if len(packed) != (count + 3) // 4:
+            raise ValueError("Replay is truncated")
+        moves = bytearray((packed[i >> 2] >> ((i & 3) * 2)) & 3 for i in range(count))
+        return cls(seed=seed, moves=moves, score=score, level=level, grid_size=grid_size)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def play_back(replay: Replay) -> GameState:
+    """Re-run a replay's moves with no display or frame pacing, returning the final state"""
+    engine = GameEngine()
+    state = engine.state
+
+    def level_layout():
+        rng = level_rng(replay.seed, state.level)
+        return generate_level_data(state.level, rng=rng, grid_size=replay.grid_size).layout
+
+    engine.load(level_layout())
+    for action in replay.moves:
+        events = engine.act(action)
+        if events & GAME_OVER:
+            break
+        if events & LEVEL_COMPLETE:
+            engine.load(level_layout())
+    return state
+
+def verify(replay: Replay) -> bool:
+    """Whether replaying the moves reproduces the reported score and level"""
+    state = play_back(replay)
+    return state.score == replay.score and state.level == replay.level
+
+def _verify_file(path: str) -> Tuple[str, bool, int]:
+    replay = Replay.load(path)
+    return path, verify(replay), replay.score
+
+def verify_files(paths: Iterable[str], workers: int = 1) -> List[Tuple[str, bool, int]]:
+    """Verify replay files, spread over worker processes when workers > 1"""
+    if workers <= 1:
+        return [_verify_file(path) for path in paths]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_verify_file, paths, chunksize=16))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="replay files")
+    parser.add_argument("--workers", type=int, default=1, help="processes to verify with")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = verify_files(args.paths, args.workers)
+    elapsed = time.perf_counter() - started
+    rejected = 0
+    for path, ok, score in results:
+        if not ok:
+            rejected += 1
+            print(f"MISMATCH {path} (reported score {score})")
+    print(f"{len(results) - rejected}/{len(results)} replays verified in {elapsed:.2f}s "
+          f"({len(results) / elapsed * 60:.0f} per minute)")
+    return 1 if rejected else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import pygame
+
+from profiler import percentile
+
+# Slack when counting due logic steps, so a frame that wakes a hair early
+# still runs its step instead of leaving it for the next frame
+STEP_TOLERANCE = 0.0005
+
+class FrameScheduler:
+    """Paces frames to a target rate and counts the fixed logic steps due
+
+    Each frame waits once, for the next deadline on a fixed grid of frame
+    times, so one slow frame does not push every later frame back. Logic
+    advances in steps of exactly 1/tick_rate seconds however long frames
+    take; at most max_steps run per frame and anything beyond is dropped,
+    so a stall is not replayed in a burst.
+
+    When the caller has nothing to animate it waits idle instead: blocked in
+    pygame.event.wait until input arrives or idle_timeout passes. Logic time
+    stands still while idle, and the frame that wakes gets a step at once."""
+
+    def __init__(self, fps: int = 60, tick_rate: int = 60, max_steps: int = 5,
+                 idle_timeout: float = 0.5):
+        self.frame_period = 1 / fps
+        self.idle_timeout = idle_timeout
+        self.step = 1 / tick_rate
+        self.max_steps = max_steps
+        self.next_frame = 0.0
+        self.last_step_check: Optional[float] = None
+        self.accumulator = 0.0
+        self.steps = 0  # Logic steps run so far
+        self.dropped = 0  # Steps skipped after stalls
+        self.idle_waits = 0
+
+    def wait(self, idle: bool = False) -> Optional[pygame.event.Event]:
+        """Sleep until the next frame is due, or if idle until an event arrives;
+        returns the event that ended an idle wait, which is taken off the queue"""
+        if idle:
+            self.idle_waits += 1
+            event = pygame.event.wait(int(self.idle_timeout * 1000))
+            now = time.perf_counter()
+            self.next_frame = now + self.frame_period
+            self.last_step_check = now
+            self.accumulator = self.step
+            return None if event.type == pygame.NOEVENT else event
+
+        now = time.perf_counter()
+        if self.next_frame > now:
+            time.sleep(self.next_frame - now)
+            now = time.perf_counter()
+        self.next_frame += self.frame_period
+        if self.next_frame < now:
+            # Missed the deadline outright; restart the grid from here
+            self.next_frame = now + self.frame_period
+        return None
+
+    def steps_due(self) -> int:
+        """Logic steps to run this frame; the first frame always gets one"""
+        now = time.perf_counter()
+        if self.last_step_check is None:
+            self.last_step_check = now
+            self.steps += 1
+            return 1
+        self.accumulator += now - self.last_step_check
+        self.last_step_check = now
+        due = int((self.accumulator + STEP_TOLERANCE) / self.step)
+        if due > self.max_steps:
+            self.dropped += due - self.max_steps
+            self.accumulator = 0.0
+            due = self.max_steps
+        else:
+            self.accumulator -= due * self.step
+        self.steps += due
+        return due
+
+class InputQueue:
+    """Moves waiting for the next logic step, each stamped with when it was read"""
+
+    def __init__(self, maxlen: int = 32):
+        self.pending: Deque[Tuple[object, float]] = deque(maxlen=maxlen)
+
+    def push(self, move, received: float):
+        self.pending.append((move, received))
+
+    def pop(self) -> Tuple[object, float]:
+        return self.pending.popleft()
+
+    def clear(self):
+        self.pending.clear()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+class InputLatency:
+    """Time from reading an input to presenting the first frame that shows it"""
+
+    def __init__(self, window: int = 500):
+        self.unpresented: Deque[float] = deque()  # Read times of inputs applied but not yet shown
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def applied(self, received: float):
+        self.unpresented.append(received)
+
+    def presented(self):
+        """Call once a frame has reached the display"""
+        if not self.unpresented:
+            return
+        now = time.perf_counter()
+        while self.unpresented:
+            self.samples.append(now - self.unpresented.popleft())
+
+    def percentiles(self) -> Dict[str, float]:
+        """Milliseconds from input to present"""
+        return {f"p{pct}": percentile(self.samples, pct) * 1000 for pct in (50, 95, 99)}
+
+    def report(self) -> str:
+        stats = self.percentiles()
+        return "input  " + " ".join(f"{name} {value:.1f}" for name, value in stats.items()) + " ms"
+
+class CpuMeter:
+    """Share of one core the process uses in each state, from CPU time over wall time
+
+    Call enter() once a frame with the state that frame is in; the time until
+    the next call is charged to it."""
+
+    def __init__(self):
+        self.wall: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self.state: Optional[str] = None
+        self.wall_mark = 0.0
+        self.cpu_mark = 0.0
+
+    def enter(self, state: str):
+        now, cpu = time.perf_counter(), time.process_time()
+        previous = self.state
+        if previous is not None:
+            self.wall[previous] = self.wall.get(previous, 0.0) + now - self.wall_mark
+            self.cpu[previous] = self.cpu.get(previous, 0.0) + cpu - self.cpu_mark
+        self.state = state
+        self.wall_mark = now
+        self.cpu_mark = cpu
+
+    def usage(self) -> Dict[str, float]:
+        """Fraction of a core used in each state seen so far"""
+        return {state: self.cpu[state] / wall for state, wall in self.wall.items() if wall > 0}
+
+    def report(self) -> str:
+        return "cpu    " + " ".join(f"{state} {share:.1%}" for state, share in self.usage().items())
@@ -0,0 +1,235 @@
+"""Play the game headless for a long run and fail if memory keeps growing
+
+    python soak.py --levels 2000
+    python soak.py --minutes 60 --random-moves 0.2
+
+A scripted player follows optimal moves, with a share of random ones that
+waste keys and end games, so levels are loaded, finished and restarted
+through reset_game over and over. Every frame is drawn under the SDL dummy
+drivers. After a warm-up, memory is sampled every few levels and compared
+with the first sample.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from engine import DIRECTIONS
+from hints import HintSearch
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@dataclass
+class SoakSample:
+    levels: int  # Levels finished so far
+    games: int
+    moves: int
+    elapsed: float
+    traced_kb: float  # Python allocations still alive, after a full collection
+    blocks: int  # sys.getallocatedblocks()
+    objects: int  # Objects tracked by the garbage collector
+    surfaces: int
+    collections: int  # Garbage collections so far, all generations
+    pooled: int  # Entities waiting in the MemoryManager pools
+    fallbacks: int  # Deepest generator fallback recursion so far
+
+def live_surfaces() -> int:
+    """Surfaces referenced from Python objects; the garbage collector does
+    not track Surfaces themselves, only what holds them"""
+    seen = set()
+    for obj in gc.get_objects():
+        for ref in gc.get_referents(obj):
+            if isinstance(ref, pygame.Surface):
+                seen.add(id(ref))
+    return len(seen)
+
+def collections() -> int:
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+class SoakPlayer:
+    """Optimal moves from a fresh search per level, replaced by a random move
+    at the given rate and whenever the level cannot be finished any more"""
+
+    def __init__(self, game, rng: random.Random, random_moves: float):
+        self.game = game
+        self.rng = rng
+        self.random_moves = random_moves
+        self.layout = None  # The engine's copy of the level being searched
+        self.search: Optional[HintSearch] = None
+
+    def next_move(self) -> Tuple[int, int]:
+        if self.rng.random() < self.random_moves:
+            return self.rng.choice(DIRECTIONS)
+        engine = self.game.engine
+        layout = engine.layout
+        if layout is not self.layout:
+            # Searched from the level as it stands now, with the keys now in hand
+            self.layout = layout
+            self.search = HintSearch(layout.copy(), engine.state.total_keys)
+        search = self.search
+        state = search.pack(engine.position, layout.keys, layout.barriers)
+        found = search.best_move(state, max_expansions=200_000)
+        if found is None or found[0] is None:
+            return self.rng.choice(DIRECTIONS)
+        return DIRECTIONS[found[0]]
+
+def snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+def sample(game, started: float, levels: int, games: int, moves: int) -> SoakSample:
+    counted = collections()
+    gc.collect()
+    return SoakSample(
+        levels=levels, games=games, moves=moves, elapsed=time.perf_counter() - started,
+        traced_kb=tracemalloc.get_traced_memory()[0] / 1024,
+        blocks=sys.getallocatedblocks(),
+        objects=len(gc.get_objects()),
+        surfaces=live_surfaces(),
+        collections=counted,
+        pooled=game.memory_manager.pooled(),
+        fallbacks=game.level_pipeline.metrics.max_fallbacks,
+    )
+
+def run(levels: Optional[int], minutes: Optional[float], random_moves: float = 0.1,
+        restart_every: int = 25, sample_every: int = 50, warmup: int = 100,
+        level_moves: int = 2000, seed: int = 0):
+    """Play until levels are finished or minutes pass, whichever comes first;
+    returns the samples and tracemalloc snapshots at the first and last"""
+    os.chdir(HERE)
+    tracemalloc.start()
+    import game
+
+    game.replay_dir = None
+    game.achievements.store = None  # Keep runs out of the player's unlocks
+    game.show_hints = True
+    game.hints.start()
+    game.level_pipeline.start(1)
+    game.generate_level(1)
+    player = SoakPlayer(game, random.Random(seed), random_moves)
+    state = game.game_state
+
+    deadline = None if minutes is None else time.perf_counter() + minutes * 60
+    started = time.perf_counter()
+    samples: List[SoakSample] = []
+    baseline = None
+    finished = games = moves = 0
+    game_levels = moves_this_level = 0
+    next_sample = warmup
+    try:
+        while (levels is None or finished < levels) and (deadline is None or time.perf_counter() < deadline):
+            level = state.level
+            game.handle_move(*player.next_move())
+            game.DrawInGameLoop()
+            pygame.event.get()  # Hint answers post events, which the game loop would read
+            moves += 1
+            moves_this_level += 1
+            if state.level != level:
+                finished += 1
+                game_levels += 1
+                moves_this_level = 0
+            if state.game_over or game_levels >= restart_every or moves_this_level >= level_moves:
+                if state.game_over:
+                    game.draw_game_over()
+                game.reset_game()
+                games += 1
+                game_levels = moves_this_level = 0
+            if finished >= next_sample:
+                if baseline is None:
+                    # Taken first, so every sample counts the baseline snapshot alike
+                    baseline = snapshot()
+                samples.append(sample(game, started, finished, games, moves))
+                next_sample += sample_every
+        if not samples or samples[-1].moves != moves:
+            samples.append(sample(game, started, finished, games, moves))
+        if baseline is None:
+            baseline = snapshot()
+        last = snapshot()
+    finally:
+        game.level_pipeline.stop()
+        game.hints.stop()
+        tracemalloc.stop()
+    return samples, baseline, last
+
+def floor_growth(samples: List[SoakSample], metric: str) -> float:
+    """Rise of the lowest value from the first half of the samples to the second
+
+    A sample can land while the level pipeline or hint worker is mid-search,
+    so single samples swing by hundreds of KB; a leak lifts the floor too."""
+    values = [getattr(s, metric) for s in samples]
+    half = (len(values) + 1) // 2
+    return min(values[half:] or values) - min(values[:half])
+
+def check(samples: List[SoakSample], max_growth_kb: float, max_object_growth: int,
+          max_surface_growth: int, max_fallbacks: int) -> List[str]:
+    """Every threshold the run went past"""
+    last = samples[-1]
+    failures = []
+    growth = floor_growth(samples, "traced_kb")
+    if growth > max_growth_kb:
+        failures.append(f"traced memory grew {growth:.0f} KB (limit {max_growth_kb:.0f})")
+    growth = floor_growth(samples, "objects")
+    if growth > max_object_growth:
+        failures.append(f"tracked objects grew by {growth} (limit {max_object_growth})")
+    growth = floor_growth(samples, "surfaces")
+    if growth > max_surface_growth:
+        failures.append(f"live surfaces grew by {growth} (limit {max_surface_growth})")
+    if last.fallbacks > max_fallbacks:
+        failures.append(f"generator fallback recursed {last.fallbacks} deep (limit {max_fallbacks})")
+    return failures
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, help="stop after finishing this many levels")
+    parser.add_argument("--minutes", type=float, help="stop after this long")
+    parser.add_argument("--random-moves", type=float, default=0.1,
+                        help="share of moves made at random instead of optimally")
+    parser.add_argument("--restart-every", type=int, default=25,
+                        help="start a new game after this many levels")
+    parser.add_argument("--sample-every", type=int, default=50, help="levels between samples")
+    parser.add_argument("--warmup", type=int, default=100, help="levels before the first sample")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the player's random moves")
+    parser.add_argument("--max-growth-kb", type=float, default=256)
+    parser.add_argument("--max-object-growth", type=int, default=2000)
+    parser.add_argument("--max-surface-growth", type=int, default=4)
+    parser.add_argument("--max-fallbacks", type=int, default=3,
+                        help="deepest allowed recursion of the generator's fallback")
+    args = parser.parse_args(argv)
+    if args.levels is None and args.minutes is None:
+        args.levels = 1000
+
+    samples, baseline, last = run(args.levels, args.minutes, args.random_moves, args.restart_every,
+                                  args.sample_every, args.warmup, seed=args.seed)
+    print(f"{'levels':>7} {'games':>6} {'moves':>8} {'secs':>7} {'traced KB':>10} {'blocks':>8} "
+          f"{'objects':>8} {'surfaces':>8} {'gcs':>6} {'pooled':>6} {'depth':>5}")
+    for s in samples:
+        print(f"{s.levels:7d} {s.games:6d} {s.moves:8d} {s.elapsed:7.1f} {s.traced_kb:10.1f} {s.blocks:8d} "
+              f"{s.objects:8d} {s.surfaces:8d} {s.collections:6d} {s.pooled:6d} {s.fallbacks:5d}")
+    first, final = samples[0], samples[-1]
+    if final.moves > first.moves:
+        print(f"{(final.collections - first.collections) * 1000 / (final.moves - first.moves):.2f} "
+              f"garbage collections per 1000 moves after warm-up")
+
+    failures = check(samples, args.max_growth_kb, args.max_object_growth, args.max_surface_growth,
+                     args.max_fallbacks)
+    if not failures:
+        print("no growth beyond the thresholds")
+        return 0
+    for failure in failures:
+        print("FAIL " + failure)
+    print("Largest growth since the first sample:")
+    for stat in last.compare_to(baseline, "lineno")[:10]:
+        print(f"  {stat}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pygame
+
+# Results kept between runs: resolved font files and pre-scaled images
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+FONT_CACHE = os.path.join(CACHE_DIR, "fonts.json")
+
+class StartupTimer:
+    """Time from launch to the first frame, split into named steps"""
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks: List[Tuple[str, float]] = []
+        self.first_frame: Optional[float] = None
+
+    def mark(self, step: str):
+        """Record that step just finished"""
+        self.marks.append((step, time.perf_counter()))
+
+    def frame_presented(self) -> bool:
+        """Note the first frame; returns True only the first time"""
+        if self.first_frame is not None:
+            return False
+        self.first_frame = time.perf_counter()
+        return True
+
+    def report(self) -> str:
+        steps = []
+        previous = self.started
+        for step, at in self.marks:
+            steps.append(f"{step} {(at - previous) * 1000:.0f}")
+            previous = at
+        total = ((self.first_frame or time.perf_counter()) - self.started) * 1000
+        return f"First frame after {total:.0f} ms ({', '.join(steps)})"
+
+def init_subsystems():
+    """Start only display, font and audio rather than everything pygame.init() starts"""
+    pygame.display.init()
+    pygame.font.init()
+    try:
+        pygame.mixer.init()
+    except pygame.error:
+        pass  # No audio device; pygame.init() would have skipped it too
+
+def show_splash(window, text: str = "Loading..."):
+    """Present a frame straight away using the built-in font, which needs no lookup"""
+    window.fill((0, 0, 0))
+    label = pygame.font.Font(None, 36).render(text, True, (200, 200, 200))
+    window.blit(label, label.get_rect(center=window.get_rect().center))
+    pygame.display.flip()
+
+def load_parallel(loaders: Dict[str, Callable[[], object]], workers: int = 4) -> Dict[str, object]:
+    """Run independent loaders on a thread pool; pygame decodes images and
+    sounds with the GIL released"""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets") as pool:
+        futures = {name: pool.submit(loader) for name, loader in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def _read_font_cache() -> Dict[str, list]:
+    try:
+        with open(FONT_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_font(name: str, size: int, bold: bool = False, italic: bool = False) -> pygame.font.Font:
+    """pygame.font.SysFont, with the resolved file remembered between runs so
+    the system font scan only happens once"""
+    key = f"{name}:{int(bool(bold))}:{int(bool(italic))}"
+    cache = _read_font_cache()
+    entry = cache.get(key)
+    if entry is None or (entry[0] is not None and not os.path.exists(entry[0])):
+        resolved = []
+
+        def capture(path, size, set_bold, set_italic):
+            resolved.extend([path, set_bold, set_italic])
+            return None
+
+        pygame.font.SysFont(name, size, bold, italic, constructor=capture)
+        entry = cache[key] = resolved
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(FONT_CACHE, "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
+    path, set_bold, set_italic = entry
+    font = pygame.font.Font(path, size)
+    # Faked styles, as SysFont does when no matching face is installed
+    font.set_bold(set_bold)
+    font.set_italic(set_italic)
+    return font
+
+def load_scaled(path: str, size: Tuple[int, int]) -> pygame.Surface:
+    """An image scaled to size, kept as an uncompressed bitmap next to the
+    other caches and rebuilt when the source file changes"""
+    base = os.path.splitext(os.path.basename(path))[0]
+    stamp = os.stat(path).st_mtime_ns
+    cached = os.path.join(CACHE_DIR, f"{base}-{size[0]}x{size[1]}-{stamp}.bmp")
+    if os.path.exists(cached):
+        try:
+            return pygame.image.load(cached)
+        except pygame.error:
+            pass
+
+    surface = pygame.transform.scale(pygame.image.load(path), size)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for stale in glob.glob(os.path.join(CACHE_DIR, f"{base}-{size[0]}x{size[1]}-*.bmp")):
+            os.remove(stale)
+        pygame.image.save(surface, cached)
+    except (OSError, pygame.error):
+        pass
+    return surface
@@ -0,0 +1,381 @@
+"""Queue score and achievement submissions without ever blocking the game loop
+
+    python submission.py --serve 8765 --fail-rate 0.2   # local stub endpoint
+    python submission.py --send 500 --url http://127.0.0.1:8765/submit
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional
+
+from profiler import percentile
+
+SCORE = "score"
+ACHIEVEMENT = "achievement"
+
+@dataclass
+class Submission:
+    """One event to send: a score (value is the score) or an achievement (value is its id)"""
+    seq: int
+    kind: str
+    player: str
+    value: int
+    level: int = 0
+    created: float = 0.0  # time.time() when submitted
+
+@dataclass
+class SubmissionMetrics:
+    submitted: int = 0
+    sent: int = 0
+    batches: int = 0
+    retries: int = 0
+    coalesced: int = 0  # Events folded into another event for the same player
+    pending: int = 0
+    queue_latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    batch_sizes: Deque[int] = field(default_factory=lambda: deque(maxlen=500))
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """Seconds from submit to acknowledgement"""
+        return {f"p{pct}": percentile(self.queue_latencies, pct) for pct in (50, 95, 99)}
+
+    def mean_batch_size(self) -> float:
+        if not self.batch_sizes:
+            return 0.0
+        return sum(self.batch_sizes) / len(self.batch_sizes)
+
+class Journal:
+    """Append-only file of submitted and acknowledged events, one JSON object per line
+
+    Events are acknowledged once the endpoint accepts them; anything left
+    unacknowledged is sent again after a restart."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Submission] = {}
+        self.last_seq = 0
+        if os.path.exists(path):
+            self._load()
+        self._compact()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A write torn by a crash
+                if record.get("op") == "ack":
+                    for seq in record["seqs"]:
+                        self._pending.pop(seq, None)
+                elif record.get("op") == "add":
+                    event = Submission(**record["event"])
+                    self._pending[event.seq] = event
+                    self.last_seq = max(self.last_seq, event.seq)
+
+    def _compact(self):
+        # Rewrite with only the pending events so the file stays small
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            for event in self._pending.values():
+                f.write(json.dumps({"op": "add", "event": asdict(event)}) + "\n")
+        os.replace(temp, self.path)
+
+    def pending(self) -> List[Submission]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def append(self, kind: str, player: str, value: int, level: int = 0) -> Submission:
+        with self._lock:
+            self.last_seq += 1
+            event = Submission(self.last_seq, kind, player, value, level, time.time())
+            self._pending[event.seq] = event
+            # Flushed to the OS but not fsynced; the worker syncs before each send
+            self._reopen()
+            self._file.write(json.dumps({"op": "add", "event": asdict(event)}) + "\n")
+            self._file.flush()
+        return event
+
+    def sync(self):
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+
+    def acknowledge(self, seqs: List[int]):
+        with self._lock:
+            for seq in seqs:
+                self._pending.pop(seq, None)
+            self._reopen()
+            self._file.write(json.dumps({"op": "ack", "seqs": seqs}) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _reopen(self):
+        # Events can still arrive after the queue stops; they are journaled
+        # for the next run. Call with the lock held.
+        if self._file.closed:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+def coalesce(events: List[Submission]) -> List[Dict]:
+    """One entry per player: their best score and the distinct achievements earned"""
+    players: Dict[str, Dict] = {}
+    for event in events:
+        entry = players.setdefault(event.player, {"player": event.player, "score": None,
+                                                  "level": 0, "achievements": []})
+        if event.kind == SCORE:
+            if entry["score"] is None or event.value > entry["score"]:
+                entry["score"] = event.value
+                entry["level"] = event.level
+        elif event.value not in entry["achievements"]:
+            entry["achievements"].append(event.value)
+    for entry in players.values():
+        entry["achievements"].sort()
+    return list(players.values())
+
+class HttpEndpoint:
+    """POSTs each batch as JSON; any non-2xx response or network error is a failure"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body: bytes):
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    async def send(self, batch: Dict):
+        body = json.dumps(batch).encode()
+        await asyncio.get_running_loop().run_in_executor(None, self._post, body)
+
+class StubEndpoint:
+    """In-process endpoint that records batches and fails a fraction of them"""
+
+    def __init__(self, fail_rate: float = 0.0, latency: float = 0.0, seed: int = 0):
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.batches: List[Dict] = []
+
+    async def send(self, batch: Dict):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rng.random() < self.fail_rate:
+            raise ConnectionError("stub endpoint failure")
+        self.batches.append(batch)
+
+class SubmissionQueue:
+    """Journals events on the caller's thread and sends them in batches from an
+    asyncio worker thread, retrying with exponential backoff
+
+    submit_score() and submit_achievement() only append to the journal and
+    hand the event to the worker, so they are safe to call every frame."""
+
+    def __init__(self, endpoint, journal_path: str = "submissions.journal",
+                 batch_size: int = 32, flush_interval: float = 1.0,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.endpoint = endpoint
+        self.journal = Journal(journal_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Longest an event waits for others to batch with
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = SubmissionMetrics(pending=len(self.journal.pending()))
+        # The worker clears _loop as it exits; hold the lock to use it from
+        # other threads so nothing is scheduled on a closed loop
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._stopping: Optional[asyncio.Event] = None  # Set to abandon retries
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._ready.clear()
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._run()),
+                                            name="submissions", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+
+    def stop(self, timeout: float = 2.0):
+        """Send what is queued, giving up after timeout; unsent events stay journaled"""
+        if self._thread is None:
+            return
+        self._call_soon(self._queue.put_nowait, None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Still retrying: stop waiting on the endpoint
+            self._call_soon(self._stopping.set)
+            self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.journal.close()
+        self._thread = None
+
+    def submit_score(self, player: str, score: int, level: int):
+        self._submit(self.journal.append(SCORE, player, score, level))
+
+    def submit_achievement(self, player: str, achievement_id: int):
+        self._submit(self.journal.append(ACHIEVEMENT, player, achievement_id))
+
+    def _submit(self, event: Submission):
+        self.metrics.submitted += 1
+        self.metrics.pending += 1
+        self._call_soon(self._queue.put_nowait, event)
+
+    def _call_soon(self, callback, *args):
+        """Run callback on the worker's loop, if the worker is still running"""
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(callback, *args)
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopping = asyncio.Event()
+        for event in self.journal.pending():  # Left over from a previous run
+            self._queue.put_nowait(event)
+        self._ready.set()
+
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                break
+            batch = [event]
+            stop = await self._fill(batch)
+            await self._send(batch)
+            if stop:
+                break
+        with self._lock:
+            self._loop = None
+
+    async def _fill(self, batch: List[Submission]) -> bool:
+        """Add events to batch until it is full or flush_interval passes;
+        returns True if a stop was requested meanwhile"""
+        deadline = self._loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event is None:
+                return True
+            batch.append(event)
+        return False
+
+    async def _send(self, batch: List[Submission]):
+        entries = coalesce(batch)
+        payload = {"sent": time.time(), "entries": entries}
+        await self._loop.run_in_executor(None, self.journal.sync)
+        attempt = 0
+        while True:
+            try:
+                await self.endpoint.send(payload)
+                break
+            except Exception:
+                if self._stopping.is_set():
+                    return
+                attempt += 1
+                self.metrics.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay * random.uniform(0.5, 1.0))
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+        self.journal.acknowledge([event.seq for event in batch])
+        now = time.time()
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.sent += len(batch)
+        metrics.pending -= len(batch)
+        metrics.coalesced += len(batch) - sum(
+            (entry["score"] is not None) + len(entry["achievements"]) for entry in entries)
+        metrics.batch_sizes.append(len(batch))
+        metrics.queue_latencies.extend(now - event.created for event in batch)
+
+class _StubHandler(BaseHTTPRequestHandler):
+    fail_rate = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if random.random() < self.fail_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        batch = json.loads(body)
+        print(f"batch of {len(batch['entries'])} players", flush=True)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def serve_stub(port: int, fail_rate: float = 0.0):
+    """Run a local HTTP endpoint that accepts batches, failing fail_rate of them with 503"""
+    _StubHandler.fail_rate = fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StubHandler)
+    print(f"stub endpoint on http://127.0.0.1:{port}/submit")
+    server.serve_forever()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", type=int, metavar="PORT", help="run the stub endpoint")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--send", type=int, metavar="N", help="submit N events and report metrics")
+    parser.add_argument("--url", help="endpoint for --send (default: in-process stub)")
+    parser.add_argument("--journal", default="submissions.journal")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve_stub(args.serve, args.fail_rate)
+        return 0
+    if not args.send:
+        parser.print_help()
+        return 1
+
+    endpoint = HttpEndpoint(args.url) if args.url else StubEndpoint(args.fail_rate)
+    submissions = SubmissionQueue(endpoint, args.journal, backoff_base=0.05, flush_interval=0.1)
+    submissions.start()
+    blocked = []
+    for i in range(args.send):
+        started = time.perf_counter()
+        if i % 10 == 9:
+            submissions.submit_achievement(f"player{i % 7}", i % 10)
+        else:
+            submissions.submit_score(f"player{i % 7}", i * 10, i // 7 + 1)
+        blocked.append(time.perf_counter() - started)
+        time.sleep(0.001)
+    while submissions.metrics.pending and submissions.metrics.retries < 1000:
+        time.sleep(0.05)
+    submissions.stop()
+
+    metrics = submissions.metrics
+    latency = metrics.latency_percentiles()
+    print(f"sent {metrics.sent}/{metrics.submitted} in {metrics.batches} batches "
+          f"(mean {metrics.mean_batch_size():.1f} events, {metrics.coalesced} coalesced, "
+          f"{metrics.retries} retries)")
+    print("queue latency p50 {p50:.3f}s p95 {p95:.3f}s p99 {p99:.3f}s".format(**latency))
+    print(f"submit call p99 {percentile(blocked, 99) * 1e6:.0f}us")
+    return 0 if not metrics.pending else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
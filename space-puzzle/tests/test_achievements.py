@@ -0,0 +1,73 @@
+import json
+import random
+
+import pytest
+
+from achievements import FIELDS, MILESTONES, Achievement, AchievementEngine, AchievementStore
+from game_state import GameState
+
+def met(achievements, state):
+    return {a.name for a in achievements if all(getattr(state, f) >= m for f, m in a.requires)}
+
+def play(state, rng, moves):
+    for _ in range(moves):
+        roll = rng.random()
+        if roll < 0.5:
+            state.collect_key()
+        elif roll < 0.8:
+            state.use_key()
+        elif roll < 0.99:
+            state.complete_level()
+        else:
+            state.reset_game()
+        yield
+
+@pytest.mark.parametrize("count", [10, 200])
+def test_unlocks_match_checking_everything(count):
+    rng = random.Random(count)
+    achievements = MILESTONES if count == 10 else [
+        Achievement(f"a{i}", "", 0, tuple((field, rng.randrange(1, 20000 if field == "score" else 40))
+                                          for field in rng.sample(FIELDS, rng.randint(1, 3))))
+        for i in range(count)]
+    state = GameState()
+    engine = AchievementEngine(achievements)
+    engine.attach(state)
+    expected = set()
+    for _ in play(state, rng, 5000):
+        expected |= met(achievements, state)
+        assert set(engine.unlocked) == expected
+
+def test_each_unlock_is_announced_once_and_stored(tmp_path):
+    path = str(tmp_path / "achievements.json")
+    state = GameState()
+    engine = AchievementEngine(MILESTONES, AchievementStore(path), "ann")
+    announced = []
+    engine.on_unlock = lambda achievement: announced.append(achievement.name)
+    engine.attach(state)
+    for _ in range(2):
+        state.collect_key()
+    state.complete_level()  # Level 2, score 120, the two keys counted again: 4
+    state.complete_level()  # Level 3, score 383: short of Starship Pilot's 400
+    assert announced == ["First Light", "Space Explorer"]
+
+    with open(path) as f:
+        assert sorted(json.load(f)["ann"]) == ["First Light", "Space Explorer"]
+    # Unlocks survive a restart and are not announced again
+    again = AchievementEngine(MILESTONES, AchievementStore(path), "ann")
+    again.on_unlock = lambda achievement: announced.append(achievement.name)
+    again.attach(state)
+    assert announced == ["First Light", "Space Explorer"]
+    assert AchievementStore(path).unlocked("bob") == {}
+
+def test_falling_values_check_nothing():
+    state = GameState()
+    engine = AchievementEngine(MILESTONES)
+    engine.attach(state)
+    checks = engine.checks
+    state.total_keys = 5
+    state.use_key()
+    assert engine.checks == checks
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError):
+        AchievementEngine([Achievement("x", "", 0, (("lives", 1),))])
@@ -0,0 +1,37 @@
+import pygame
+import pytest
+
+from assets import SpriteCache
+
+@pytest.fixture
+def cache():
+    pygame.display.init()
+    pygame.display.set_mode((64, 64))
+    cache = SpriteCache(max_variants=2)
+    image = pygame.Surface((4, 4), pygame.SRCALPHA)
+    image.fill((200, 100, 50, 255))
+    cache.register("key", image)
+    yield cache
+    pygame.display.quit()
+
+def test_tints_are_built_once_and_shared(cache):
+    red = cache.get("key", (255, 0, 0))
+    assert red.get_at((0, 0)) == (200, 0, 0, 255)  # Multiplied, alpha kept
+    assert cache.get("key", (255, 0, 0)) is red
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get("key") is cache.images["key"]  # Untinted is the base image
+
+def test_least_recently_used_tint_is_evicted(cache):
+    red = cache.get("key", (255, 0, 0))
+    cache.get("key", (0, 255, 0))
+    cache.get("key", (255, 0, 0))  # Red is now the most recent
+    cache.get("key", (0, 0, 255))
+    assert cache.evictions == 1
+    assert ("key", (0, 255, 0)) not in cache.variants
+    assert cache.get("key", (255, 0, 0)) is red
+
+def test_registered_images_use_the_display_format(cache):
+    display = pygame.display.get_surface()
+    background = cache.register("bg", pygame.Surface((8, 8), depth=24), alpha=False)
+    assert background.get_bitsize() == display.get_bitsize()
+    assert cache.images["key"].get_flags() & pygame.SRCALPHA
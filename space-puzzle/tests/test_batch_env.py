@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch_env import SHIP, BatchEnv, LevelPool
+from engine import GameEngine, GAME_OVER, LEVEL_COMPLETE
+from game_state import GameState
+from hints import HintSearch
+
+class RecordingPool(LevelPool):
+    """One layout per level, kept so GameEngine can play the same ones"""
+
+    def __init__(self, seed):
+        super().__init__(size=1, refresh_every=0, seed=seed)
+        self.layouts = {}
+
+    def _layouts(self, level_num, count):
+        layouts = self.layouts[level_num] = super()._layouts(level_num, count)
+        return layouts
+
+@pytest.mark.parametrize("start_level", [1, 4])
+def test_games_follow_the_engine(start_level):
+    num_envs, max_steps = 24, 40
+    pool = RecordingPool(seed=start_level)
+    env = BatchEnv(num_envs, seed=start_level, start_level=start_level, max_steps=max_steps, pool=pool)
+    env.reset()
+    engines, searches, steps = [], [None] * num_envs, [0] * num_envs
+
+    def load(i):
+        engine = engines[i]
+        engine.load(pool.layouts[engine.state.level][0])
+        searches[i] = HintSearch(engine.layout.copy(), engine.state.total_keys)
+        steps[i] = 0
+
+    def choose(i):
+        """Mostly the best move, so levels get finished as well as lost"""
+        engine, search = engines[i], searches[i]
+        action = search.best_move(search.pack(engine.position, engine.layout.keys, engine.layout.barriers))[0]
+        return rng.integers(0, 4) if action is None or rng.random() < 0.3 else action
+
+    for i in range(num_envs):
+        engines.append(GameEngine(GameState()))
+        engines[i].state.level = start_level
+        load(i)
+
+    rng = np.random.default_rng(start_level)
+    finished = ended = 0
+    for _ in range(300):
+        actions = np.array([choose(i) for i in range(num_envs)])
+        obs, rewards, dones = env.step(actions)
+        for i, engine in enumerate(engines):
+            state = engine.state
+            before = state.score
+            events = engine.act(int(actions[i]))
+            steps[i] += 1
+            assert rewards[i] == state.score - before
+            over = bool(events & GAME_OVER) or (steps[i] >= max_steps and not events & LEVEL_COMPLETE)
+            assert dones[i] == over
+            finished += bool(events & LEVEL_COMPLETE)
+            if over:
+                ended += 1
+                state.reset_game()
+                state.level = start_level
+                load(i)
+            elif events & LEVEL_COMPLETE:
+                load(i)
+            assert (env.level[i], env.score[i], env.keys[i], env.collected[i]) == (
+                state.level, state.score, state.total_keys, state.keys_collected)
+            codes, _ = pool.encode(engine.layout)
+            codes[engine.position] = SHIP
+            assert (obs[i].ravel() == codes).all()
+    assert finished and ended  # Both paths were exercised
+
+def test_episode_levels_end_games():
+    env = BatchEnv(8, seed=2, episode_levels=1, max_steps=1000, pool=LevelPool(size=2, seed=2))
+    env.reset()
+    rng = np.random.default_rng(2)
+    for _ in range(2000):
+        level_before = env.level.copy()
+        _, rewards, dones = env.step(rng.integers(0, 4, 8))
+        # A level finished ends the game at once, back on the start level
+        assert (env.level[rewards > 0] == 1).all() and dones[rewards > 0].all()
+        assert (level_before == 1).all()
+
+def test_pool_draws_pack_levels_without_generating(tmp_path):
+    from levelpack import LevelPack, generate, pair_slots_for, write_pack
+
+    path = str(tmp_path / "levels.splp")
+    entries = list(generate([(level_num, seed) for seed in (3, 5, 8) for level_num in (1, 2)], (6, 5)))
+    write_pack(path, entries, (6, 5), pair_slots_for(range(1, 3), (6, 5)))
+    with LevelPack(path) as pack:
+        pool = LevelPool(size=4, pack=pack)
+        assert sorted(pool.pack_seeds[2]) == [3, 5, 8]
+        layouts = pool._layouts(2, pool.size)
+        wanted = {level.layout.keys for seed, level in entries if level.level == 2}
+        assert {layout.keys for layout in layouts} == wanted
+        assert pool._layouts(3, 2) and pool.generated == 2  # Past the pack: generated
@@ -0,0 +1,35 @@
+import json
+
+from benchmark import compare, main
+
+def report(**results):
+    return {"results": results}
+
+def test_compare_needs_relative_and_absolute_change():
+    baseline = report(render={"full_frame_p50_ms": 0.2, "full_blocks_per_frame": 0.24},
+                      generation={"p50_ms": 2.0})
+    # Tripling a tiny value stays under the noise floor
+    current = report(render={"full_frame_p50_ms": 0.4, "full_blocks_per_frame": 0.8},
+                     generation={"p50_ms": 2.2})
+    assert compare(current, baseline, 0.2) == []
+
+    current = report(render={"full_frame_p50_ms": 0.2, "full_blocks_per_frame": 0.24},
+                     generation={"p50_ms": 3.0})
+    assert compare(current, baseline, 0.2) == ["generation.p50_ms: 2 -> 3 (+50% worse)"]
+
+def test_compare_reports_growth_from_a_zero_baseline():
+    baseline = report(render={"full_gc_collections": 0, "moved_gc_collections": 0})
+    current = report(render={"full_gc_collections": 1, "moved_gc_collections": 3})
+    assert compare(current, baseline, 0.2) == ["render.moved_gc_collections: 0 -> 3"]
+
+def test_compare_reads_throughput_the_other_way():
+    baseline = report(logic={"moves_per_second": 1000.0}, screening={"6x5_rejected": 10})
+    current = report(logic={"moves_per_second": 700.0}, screening={"6x5_rejected": 90})
+    assert compare(current, baseline, 0.2) == ["logic.moves_per_second: 1000 -> 700 (+30% worse)"]
+    assert compare(report(logic={"moves_per_second": 5000.0}), baseline, 0.2) == []
+
+def test_quick_runs_do_not_compare_against_full_baselines(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"meta": {"quick": False}, "results": {}}))
+    assert main(["--quick", "--only", "logic", "--compare", str(path)]) == 2
+    assert "without --quick" in capsys.readouterr().out
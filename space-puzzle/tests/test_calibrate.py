@@ -0,0 +1,39 @@
+import json
+
+from calibrate import TierStats, _run_chunk, _simpler
+from game_state import GameState, load_level_table
+
+def test_chunk_measures_attempts_through_the_generator():
+    tier = (3, 4, 0)
+    _, solvable, moves, attempts, fallbacks = _run_chunk((tier, 1, 40))
+    assert 0 < solvable <= 40 and len(moves) == solvable
+    assert attempts >= 40 and fallbacks == 0
+
+    stats = TierStats(tier, trials=40, solvable=solvable, moves=moves,
+                      levels=40, attempts=attempts, fallbacks=fallbacks)
+    assert stats.mean_attempts == attempts / 40
+    summary = stats.summary()
+    assert summary["mean_attempts"] >= 1 and summary["fallbacks"] == 0
+
+def test_simpler_tiers_bottom_out():
+    assert _simpler((5, 8, 2)) == (5, 6, 1)
+    assert _simpler((5, 1, 0)) == (5, 1, 0)
+
+def test_table_rows_keep_their_engine(tmp_path):
+    row = {"level": 1, "num_keys": 3, "num_asteroids": 4, "num_teleporters": 0,
+           "grid_size": [6, 5], "difficulty_multiplier": 1.2, "engine": "constructive"}
+    path = tmp_path / "table.json"
+    path.write_text(json.dumps({"levels": [row, dict(row, level=2, engine="sampler")]}))
+    table = load_level_table(str(path))
+    assert table[1].engine == "constructive" and table[2].engine == "sampler"
+    assert table[1].grid_size == (6, 5)
+
+def test_committed_table_matches_the_curve_it_was_calibrated_against():
+    table = load_level_table()
+    assert len(table) == 50
+    for level, config in table.items():
+        curve = GameState.curve_config(level)
+        assert config.num_keys <= curve.num_keys
+        assert config.num_asteroids <= curve.num_asteroids
+        assert config.num_teleporters <= curve.num_teleporters
+        assert config.engine == curve.engine
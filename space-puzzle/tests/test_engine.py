@@ -0,0 +1,76 @@
+import pytest
+
+from engine import (GameEngine, UP, DOWN, LEFT, RIGHT, ACTIONS, MOVED, KEY_COLLECTED, BARRIER_OPENED,
+                    TELEPORTED, LEVEL_COMPLETE, GAME_OVER, BLOCKED)
+from game_state import CompactLevel, GameState
+
+@pytest.fixture
+def level():
+    """6x5, ship at (0, 2), portal at (5, 2): a key at (1, 2), a barrier at
+    (0, 1), an asteroid at (0, 3) and teleporters (2, 0) <-> (4, 4)"""
+    level = CompactLevel(6, 5)
+    index = level.geometry.index
+    level.add_key(index(1, 2), (255, 255, 0))
+    level.add_barrier(index(0, 1), (255, 0, 0))
+    level.add_asteroid(index(0, 3))
+    level.link_teleporters(index(2, 0), index(4, 4))
+    return level
+
+@pytest.fixture
+def engine(level):
+    engine = GameEngine(GameState())
+    engine.load(level)
+    return engine
+
+def walk(engine, *moves):
+    return [engine.step(*move) for move in moves]
+
+def test_blocked_by_edge_and_asteroid(engine):
+    assert walk(engine, LEFT, DOWN) == [BLOCKED, BLOCKED]
+    assert engine.grid_position == (0, 2)
+    assert engine.moves == 0
+
+def test_key_collected(engine, level):
+    assert engine.step(*RIGHT) == MOVED | KEY_COLLECTED
+    assert engine.state.total_keys == 1 and engine.state.keys_collected == 1
+    assert engine.portal_active
+    # The engine plays its own copy of the level
+    assert level.keys and not engine.layout.keys
+
+def test_barrier_spends_a_key(engine):
+    engine.state.total_keys = 1
+    assert engine.step(*UP) == MOVED | BARRIER_OPENED
+    assert engine.state.total_keys == 0
+    assert engine.grid_position == (0, 1)
+    # Opened for good: walking back through costs nothing
+    assert walk(engine, DOWN, UP) == [MOVED, MOVED]
+
+def test_barrier_without_a_key_ends_the_game(engine):
+    assert engine.step(*UP) == GAME_OVER
+    assert engine.state.game_over
+    assert engine.grid_position == (0, 2)
+    assert engine.step(*RIGHT) == BLOCKED
+
+def test_teleported(engine):
+    assert walk(engine, RIGHT, UP, UP, RIGHT) == [MOVED | KEY_COLLECTED, MOVED, MOVED, MOVED | TELEPORTED]
+    assert engine.grid_position == (4, 4)
+    assert engine.moves == 4
+
+def test_portal_needs_every_key(level):
+    index = level.geometry.index
+    level.add_key(index(5, 0), (0, 255, 0))
+    engine = GameEngine(GameState())
+    engine.load(level)
+    assert walk(engine, RIGHT, RIGHT, RIGHT, RIGHT)[-1] == MOVED
+    assert walk(engine, RIGHT) == [MOVED]  # On the portal with a key still out
+    assert engine.state.level == 1
+    assert walk(engine, UP, UP, DOWN, DOWN) == [MOVED, MOVED | KEY_COLLECTED, MOVED, MOVED | LEVEL_COMPLETE]
+    assert engine.state.level == 2
+
+def test_level_complete_scores_and_keeps_keys(engine):
+    events = [engine.act(ACTIONS[RIGHT]) for _ in range(5)]
+    assert events[0] == MOVED | KEY_COLLECTED
+    assert events[-1] == MOVED | LEVEL_COMPLETE
+    state = engine.state
+    assert (state.level, state.keys_collected) == (2, 0)
+    assert state.score > 0 and state.total_keys >= 1
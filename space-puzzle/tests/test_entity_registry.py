@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from entity_registry import EntityRegistry, KEYS, BARRIERS, TELEPORTERS
+
+def sprite(x, y):
+    return SimpleNamespace(grid_x=x, grid_y=y)
+
+def test_lookup_by_cell_and_kind():
+    registry = EntityRegistry()
+    key, barrier, teleporter = sprite(1, 2), sprite(1, 2), sprite(3, 0)
+    registry.add(key, KEYS)
+    registry.add(barrier, BARRIERS)
+    registry.add(teleporter, TELEPORTERS)
+
+    assert registry.get(1, 2, KEYS) is key
+    assert registry.get(1, 2, BARRIERS) is barrier
+    assert registry.get(1, 2, TELEPORTERS) is None
+    assert registry.get(4, 4, KEYS) is None
+    assert list(registry.of_kind(TELEPORTERS)) == [teleporter]
+    assert list(registry) == [key, barrier, teleporter]  # Drawing order
+    assert len(registry) == 3
+
+def test_remove_keeps_the_indexes_in_step():
+    registry = EntityRegistry()
+    key, barrier = sprite(1, 2), sprite(1, 2)
+    registry.add(key, KEYS)
+    registry.add(barrier, BARRIERS)
+
+    registry.remove(barrier, BARRIERS)
+    assert registry.get(1, 2, BARRIERS) is None
+    assert registry.get(1, 2, KEYS) is key
+    registry.remove(key, KEYS)
+    assert (1, 2) not in registry.cells
+    assert len(registry) == 0 and not list(registry.of_kind(KEYS))
+
+def test_clear():
+    registry = EntityRegistry()
+    registry.add(sprite(0, 0), KEYS)
+    registry.clear()
+    assert len(registry) == 0 and not registry.cells
+    assert registry.get(0, 0, KEYS) is None
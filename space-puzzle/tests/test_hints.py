@@ -0,0 +1,77 @@
+import random
+import time
+
+import pytest
+
+from engine import GameEngine, LEVEL_COMPLETE, GAME_OVER
+from game_state import GameState, PathValidator
+from hints import HintSearch, HintService
+from level_generator import generate_level_data, level_rng
+
+def layout_for(seed, level_num):
+    return generate_level_data(level_num, rng=level_rng(seed, level_num)).layout
+
+def state_of(search, engine):
+    return search.pack(engine.position, engine.layout.keys, engine.layout.barriers)
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("level_num", [1, 6, 12])
+def test_following_hints_finishes_in_the_promised_moves(seed, level_num):
+    layout = layout_for(seed, level_num)
+    search = HintSearch(layout)
+    engine = GameEngine(GameState())
+    engine.load(layout)
+    _, promised, _ = search.best_move(state_of(search, engine))
+    assert promised == PathValidator.solve_level(layout).moves
+
+    for taken in range(1, promised + 1):
+        action, left, expanded = search.best_move(state_of(search, engine))
+        assert left == promised - taken + 1
+        assert expanded == 0  # Answered from the route already proven
+        events = engine.act(action)
+    assert events & LEVEL_COMPLETE
+
+@pytest.mark.parametrize("seed", range(4))
+def test_hints_after_detours_match_the_solver(seed):
+    rng = random.Random(seed)
+    layout = layout_for(seed, 8)
+    search = HintSearch(layout, start_keys=1)
+    engine = GameEngine(GameState())
+    engine.state.total_keys = 1
+    engine.load(layout)
+    for _ in range(25):
+        action, left, _ = search.best_move(state_of(search, engine))
+        here = engine.layout.copy()
+        here.start = engine.position
+        assert left == PathValidator.solve_level(here, engine.state.total_keys).moves
+        if engine.act(rng.randrange(4) if action is None or rng.random() < 0.5 else action) & (
+                LEVEL_COMPLETE | GAME_OVER):
+            break
+
+def test_budget_gives_up_without_remembering():
+    layout = generate_level_data(8, rng=level_rng(0, 8), grid_size=(16, 16)).layout
+    assert PathValidator.solve_level(layout).states_explored > 256  # The budget is checked this often
+    search = HintSearch(layout)
+    state = search.pack(layout.start, layout.keys, layout.barriers)
+    assert search.best_move(state, max_expansions=1) is None
+    assert state not in search.dead
+    assert search.best_move(state)[1] == PathValidator.solve_level(layout).moves
+
+def test_service_answers_the_newest_request():
+    layout = layout_for(1, 5)
+    service = HintService()
+    service.start()
+    try:
+        service.set_level(layout, 0)
+        service.request(layout.start, layout.keys, layout.barriers)
+        newest = service.request(layout.start, layout.keys, layout.barriers)
+        deadline = time.monotonic() + 5
+        hint = None
+        while hint is None and time.monotonic() < deadline:
+            hint = service.poll()
+            time.sleep(0.005)
+    finally:
+        service.stop()
+    assert hint is not None and hint.request == newest
+    assert hint.moves == PathValidator.solve_level(layout).moves
+    assert service.metrics.requests == 2
@@ -0,0 +1,66 @@
+import random
+from dataclasses import replace
+
+import pytest
+
+from game_state import GameState, PathValidator
+from level_generator import construct_level_data, count_shortfall, sample_level_data
+
+ENGINES = {"sampler": sample_level_data, "constructive": construct_level_data}
+
+def placed(layout):
+    return (len(layout.key_colors), len(layout.barrier_colors),
+            len(layout.pairs) // 2, bin(layout.asteroids).count("1"))
+
+def check_counts(level):
+    config, layout = level.config, level.layout
+    keys, barriers, pairs, asteroids = placed(layout)
+    assert keys <= config.num_keys and barriers <= config.num_keys
+    assert pairs <= config.num_teleporters and asteroids <= config.num_asteroids
+    assert level.shortfall == count_shortfall(config, layout)
+    wanted = 2 * config.num_keys + config.num_teleporters + config.num_asteroids
+    assert keys + barriers + pairs + asteroids + level.shortfall == wanted
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("level_num", [1, 5, 20, 50])
+def test_small_grid_levels_are_solvable_and_report_what_did_not_fit(engine, level_num):
+    rng = random.Random(level_num)
+    config = replace(GameState.config_for_level(level_num), engine=engine)
+    for _ in range(10):
+        level = ENGINES[engine](level_num, config, rng)
+        check_counts(level)
+        result = PathValidator.solve_level(level.layout)
+        assert result.solvable and result.moves == level.solution_length
+        if level_num == 1:
+            assert level.shortfall == 0  # Level 1 fits on 6x5
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_constructive_fills_small_grids_like_the_sampler(engine):
+    config = GameState.config_for_level(20)
+    rng = random.Random(20)
+    asteroids = sum(placed(ENGINES[engine](20, config, rng).layout)[3] for _ in range(50)) / 50
+    # 28 objects on 20 free cells: both engines top out near two asteroids
+    assert asteroids > 1.5
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("level_num", [5, 50])
+def test_16x16_levels_get_every_object(engine, level_num):
+    rng = random.Random(level_num)
+    config = replace(GameState.config_for_level(level_num, (16, 16)), engine=engine)
+    for _ in range(3):
+        level = ENGINES[engine](level_num, config, rng)
+        check_counts(level)
+        assert level.shortfall == 0
+        assert PathValidator.solve_level(level.layout).solvable
+
+def test_64x64_constructive_levels_get_every_object():
+    rng = random.Random(64)
+    config = GameState.config_for_level(50, (64, 64))
+    assert config.engine == "constructive"
+    level = construct_level_data(50, config, rng)
+    check_counts(level)
+    assert level.shortfall == 0
+    layout = level.layout
+    # Too big to solve here; every key and the portal must at least be reachable
+    reached = layout.reachable(1 << layout.start, layout.passable())
+    assert not (layout.keys | 1 << layout.portal) & ~reached
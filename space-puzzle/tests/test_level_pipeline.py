@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from game_state import PathValidator
+from level_generator import generate_level_data, level_rng
+from level_pipeline import LevelPipeline
+
+def signature(level):
+    layout = level.layout
+    return (level.level, layout.start, layout.portal, layout.asteroids, layout.barriers,
+            layout.keys, sorted(layout.pairs.items()))
+
+def wait_for_queue(pipeline, depth, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while pipeline._queue.qsize() < depth:
+        assert time.monotonic() < deadline, "worker did not fill the queue"
+        time.sleep(0.01)
+
+@pytest.fixture
+def pipeline():
+    pipeline = LevelPipeline(depth=3, seed=11)
+    yield pipeline
+    pipeline.stop()
+
+def test_same_levels_with_or_without_the_worker(pipeline):
+    inline = LevelPipeline(depth=3, seed=11)
+    expected = [signature(inline.get(n)) for n in range(1, 6)]
+    assert inline.metrics.cache_misses == 5
+
+    pipeline.start(1)
+    wait_for_queue(pipeline, 3)
+    assert [signature(pipeline.get(n)) for n in range(1, 6)] == expected
+    assert pipeline.metrics.hits >= 3
+
+def test_levels_come_from_the_seeded_stream(pipeline):
+    level = pipeline.get(4)
+    assert signature(level) == signature(generate_level_data(4, rng=level_rng(11, 4)))
+    assert PathValidator.solve_level(level.layout).solvable
+
+def test_reset_drops_levels_of_the_old_seed(pipeline):
+    pipeline.start(1)
+    wait_for_queue(pipeline, 3)
+    pipeline.reset(1, seed=12)
+    assert pipeline.seed == 12
+    assert signature(pipeline.get(1)) == signature(generate_level_data(1, rng=level_rng(12, 1)))
@@ -0,0 +1,80 @@
+import pytest
+
+from levelpack import (HEADER, DIGEST_AT, DIGEST_SIZE, LevelPack, RecordLayout, append_pack,
+                       generate, pair_slots_for, verify, write_pack)
+
+LEVELS = range(1, 7)
+
+def signature(level):
+    layout, config = level.layout, level.config
+    return (level.level, level.solution_length, config.num_keys, config.num_asteroids,
+            config.num_teleporters, config.grid_size, config.difficulty_multiplier, config.engine,
+            layout.start, layout.portal, layout.asteroids, layout.barriers, layout.keys,
+            layout.teleporters, sorted(layout.pairs.items()), sorted(layout.key_colors.items()),
+            sorted(layout.barrier_colors.items()))
+
+def build(path, seeds, grid_size=(6, 5)):
+    entries = list(generate([(level_num, seed) for seed in seeds for level_num in LEVELS], grid_size))
+    write_pack(str(path), entries, grid_size, pair_slots_for(LEVELS, grid_size))
+    return entries
+
+@pytest.mark.parametrize("grid_size", [(6, 5), (16, 16)])
+def test_levels_decode_as_generated(tmp_path, grid_size):
+    path = tmp_path / "levels.splp"
+    entries = build(path, [1, 2], grid_size)
+    with LevelPack(str(path)) as pack:
+        assert len(pack) == len(entries) and pack.grid_size == grid_size
+        for seed, level in entries:
+            assert (level.level, seed) in pack
+            assert signature(pack.get(level.level, seed)) == signature(level)
+        assert pack.get(1, 99) is None
+        assert [seed for seed, _ in pack] == [seed for seed, _ in entries]
+        assert pack.seeds() == [1, 2]
+
+def test_lookup_by_content_hash(tmp_path):
+    path = tmp_path / "levels.splp"
+    entries = build(path, [5])
+    seed, level = entries[3]
+    layout = RecordLayout((6, 5), pair_slots_for(LEVELS, (6, 5)))
+    digest = bytes(layout.encode(seed, level)[DIGEST_AT:DIGEST_AT + DIGEST_SIZE])
+    with LevelPack(str(path)) as pack:
+        found_seed, found = pack.by_hash(digest)
+        assert found_seed == seed and signature(found) == signature(level)
+        assert pack.by_hash(bytes(DIGEST_SIZE)) is None
+
+def test_append_skips_levels_already_there(tmp_path):
+    path = tmp_path / "levels.splp"
+    first = build(path, [1])
+    more = list(generate([(level_num, seed) for seed in (1, 2) for level_num in LEVELS], (6, 5)))
+    assert append_pack(str(path), more) == len(LEVELS)
+    with LevelPack(str(path)) as pack:
+        assert len(pack) == len(first) + len(LEVELS)
+        assert pack.seeds() == [1, 2]
+    assert verify(str(path)) == []
+
+def test_verify_clean_pack(tmp_path):
+    path = tmp_path / "levels.splp"
+    build(path, [3])
+    assert verify(str(path), solve=True, regenerate=True) == []
+
+def test_verify_finds_a_corrupted_record(tmp_path):
+    path = tmp_path / "levels.splp"
+    build(path, [3])
+    with LevelPack(str(path)) as pack:
+        at = HEADER.size + 2 * pack.layout.size + pack.layout.codes
+    data = bytearray(path.read_bytes())
+    data[at] ^= 0x04
+    path.write_bytes(bytes(data))
+    problems = verify(str(path))
+    assert len(problems) == 1 and "record 2" in problems[0] and "hash mismatch" in problems[0]
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "levels.splp"
+    build(path, [1])
+    data = path.read_bytes()
+    path.write_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        LevelPack(str(path))
+    path.write_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        LevelPack(str(path))
@@ -0,0 +1,43 @@
+from game_state import MemoryManager
+
+class Key:
+    __slots__ = ("grid_x", "grid_y", "color")
+
+    def __init__(self, grid_x, grid_y, color):
+        self.reset(grid_x, grid_y, color)
+
+    def reset(self, grid_x, grid_y, color):
+        self.grid_x, self.grid_y, self.color = grid_x, grid_y, color
+
+class Asteroid(Key):
+    __slots__ = ()
+
+def test_acquire_reuses_released_objects():
+    manager = MemoryManager()
+    first = [manager.acquire("keys", Key, x, 0, "red") for x in range(3)]
+    assert (manager.created, manager.reused) == (3, 0)
+    manager.clear_active_objects()
+    assert manager.pooled() == 3 and not manager.get_active_objects()
+
+    again = [manager.acquire("keys", Key, x, 4, "blue") for x in range(2)]
+    assert (manager.created, manager.reused) == (3, 2)
+    assert {id(key) for key in again} <= {id(key) for key in first}
+    assert all(key.grid_y == 4 and key.color == "blue" for key in again)  # Reset, not stale
+    assert manager.get_active_objects() == again
+
+def test_pools_are_kept_per_kind():
+    manager = MemoryManager()
+    manager.acquire("keys", Key, 0, 0, "red")
+    manager.acquire("asteroids", Asteroid, 1, 1, None)
+    manager.clear_active_objects()
+    assert isinstance(manager.acquire("asteroids", Asteroid, 2, 2, None), Asteroid)
+    assert isinstance(manager.acquire("keys", Key, 3, 3, "red"), Key)
+    assert manager.created == 2 and manager.pooled() == 0
+
+def test_steady_state_levels_create_nothing():
+    manager = MemoryManager()
+    for level in range(5):
+        manager.clear_active_objects()
+        for x in range(4 + level % 2):
+            manager.acquire("keys", Key, x, level, "red")
+    assert manager.created == 5  # Only the largest level ever built new objects
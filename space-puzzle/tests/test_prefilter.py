@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from game_state import CompactLevel, GameState, PathValidator
+from level_generator import build_candidate
+from prefilter import encode, screen, screen_layouts
+
+def candidates(grid_size, level_num, count, seed=0):
+    config = GameState.config_for_level(level_num, grid_size)
+    rng = random.Random(seed)
+    return [build_candidate(config, rng) for _ in range(count)]
+
+@pytest.mark.parametrize("grid_size, level_num", [((6, 5), 3), ((6, 5), 9), ((9, 9), 6), ((16, 16), 8)])
+@pytest.mark.parametrize("start_keys", [0, 1])
+def test_never_rejects_a_solvable_level(grid_size, level_num, start_keys):
+    layouts = candidates(grid_size, level_num, 120)
+    kept = screen_layouts(layouts, start_keys)
+    solvable = [PathValidator.solve_level(layout, start_keys).solvable for layout in layouts]
+    assert not any(s and not k for s, k in zip(solvable, kept))
+    assert kept.sum() >= sum(solvable)
+
+def test_cell_codes_screen_the_same_as_bitboards():
+    layouts = candidates((6, 5), 9, 200, seed=3)
+    grids, pairs = encode(layouts)
+    assert (screen(grids, pairs) == screen_layouts(layouts)).all()
+
+def walled(middle: str) -> CompactLevel:
+    """6x5 with column x=3 blocked by asteroids except its middle cell"""
+    level = CompactLevel(6, 5)
+    index = level.geometry.index
+    for y in (0, 1, 3, 4):
+        level.add_asteroid(index(3, y))
+    if middle == "barrier":
+        level.add_barrier(index(3, 2), (255, 0, 0))
+    elif middle == "asteroid":
+        level.add_asteroid(index(3, 2))
+    return level
+
+def test_rejects_levels_that_cannot_be_finished():
+    sealed = walled("asteroid")
+    teleport = walled("asteroid")
+    teleport.link_teleporters(teleport.geometry.index(2, 2), teleport.geometry.index(4, 2))
+    key_behind = walled("open")
+    key_behind.add_asteroid(key_behind.geometry.index(4, 0))
+    key_behind.add_asteroid(key_behind.geometry.index(5, 1))
+    key_behind.add_key(key_behind.geometry.index(5, 0), (255, 255, 0))
+    assert screen_layouts([sealed, teleport, key_behind, walled("open")]).tolist() == [False, True, False, True]
+
+def test_barriers_need_a_key_first():
+    # Nothing to collect before the barrier: only worth solving with a key in hand
+    level = walled("barrier")
+    assert screen_layouts([level]).tolist() == [False]
+    assert screen_layouts([level], start_keys=1).tolist() == [True]
+    level.add_key(level.geometry.index(0, 0), (255, 255, 0))
+    assert screen_layouts([level]).tolist() == [True]
@@ -0,0 +1,54 @@
+import csv
+import time
+
+from profiler import PHASES, FrameProfiler, percentile
+
+def test_percentile_is_nearest_rank():
+    samples = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(samples, 0) == 1.0
+    assert percentile(samples, 50) == 3.0
+    assert percentile(samples, 95) == 5.0
+    assert percentile(range(101), 99) == 99
+    assert percentile([], 50) == 0.0
+
+def test_nested_sections_are_exclusive():
+    profiler = FrameProfiler(enabled=True)
+    try:
+        profiler.begin_frame()
+        with profiler.section("logic"):
+            time.sleep(0.002)
+            with profiler.section("generation"):
+                time.sleep(0.01)
+        profiler.end_frame()
+        logic, generation = profiler.history["logic"][0], profiler.history["generation"][0]
+        assert generation >= 0.01 and 0.002 <= logic < 0.01
+        assert profiler.frame_times[0] >= logic + generation
+    finally:
+        profiler.toggle()
+
+def test_disabled_profiler_records_nothing():
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    with profiler.section("draw"):
+        pass
+    profiler.end_frame()
+    assert profiler.frames == 0 and not profiler.frame_times
+
+def test_window_rolls_and_exports(tmp_path):
+    profiler = FrameProfiler(window=3, enabled=True)
+    try:
+        for _ in range(5):
+            profiler.begin_frame()
+            with profiler.section("draw"):
+                pass
+            profiler.end_frame()
+    finally:
+        profiler.toggle()
+    assert profiler.frames == 5 and list(profiler.frame_numbers) == [3, 4, 5]
+    assert set(profiler.summary()) == set(PHASES) | {"frame"}
+
+    path = tmp_path / "profile.csv"
+    assert profiler.export_csv(str(path)) == 3
+    rows = list(csv.reader(path.read_text().splitlines()))
+    assert rows[0] == ["frame", *PHASES, "total", "blocks"]
+    assert [row[0] for row in rows[1:]] == ["3", "4", "5"]
@@ -0,0 +1,117 @@
+import pygame
+import pytest
+
+from renderer import Camera, DirtyRenderer, OverlayLayer, Sprite, TextField, TextPanel
+
+@pytest.fixture
+def window():
+    pygame.display.init()
+    yield pygame.display.set_mode((200, 100))
+    pygame.display.quit()
+
+def solid(size, color):
+    surface = pygame.Surface(size)
+    surface.fill(color)
+    return surface
+
+def test_mark_merges_overlapping_regions(window):
+    renderer = DirtyRenderer(window, solid((200, 100), (0, 0, 0)))
+    renderer.render([])  # The first frame repaints everything
+    assert not renderer.pending
+
+    renderer.mark(pygame.Rect(10, 10, 20, 20))
+    renderer.mark(pygame.Rect(20, 20, 20, 20))  # Overlaps the first
+    renderer.mark(pygame.Rect(100, 50, 10, 10))
+    assert renderer._merged_dirty() == [pygame.Rect(10, 10, 30, 30), pygame.Rect(100, 50, 10, 10)]
+    assert renderer.render([]) == 30 * 30 + 10 * 10
+    assert renderer.render([]) == 0  # Nothing changed since
+
+def test_mark_clips_to_the_window_and_keeps_its_own_copy(window):
+    renderer = DirtyRenderer(window, solid((200, 100), (0, 0, 0)))
+    rect = pygame.Rect(190, 90, 20, 20)
+    renderer.mark(rect)
+    rect.topleft = (0, 0)  # The caller reusing its rect changes nothing already marked
+    renderer.mark(pygame.Rect(300, 300, 5, 5))  # Off screen
+    renderer.mark(pygame.Rect(50, 50, 0, 0))  # Empty
+    assert renderer.dirty == [pygame.Rect(190, 90, 10, 10)]
+
+def test_render_repaints_only_dirty_regions(window):
+    renderer = DirtyRenderer(window, solid((200, 100), (0, 0, 0)))
+    sprite = Sprite(solid((40, 40), (255, 0, 0)), (0, 0))
+    renderer.render([sprite])
+    assert window.get_at((30, 30))[:3] == (255, 0, 0)
+
+    sprite.surface = solid((40, 40), (0, 255, 0))
+    renderer.mark(pygame.Rect(0, 0, 10, 10))
+    renderer.render([sprite])
+    assert window.get_at((5, 5))[:3] == (0, 255, 0)
+    assert window.get_at((30, 30))[:3] == (255, 0, 0)  # Outside the region: untouched
+    assert renderer.frames == 2 and renderer.frames_presented == 2
+
+class CountingFont:
+    """A pygame font that counts its renders"""
+
+    def __init__(self):
+        pygame.font.init()
+        self.font = pygame.font.Font(None, 16)
+        self.renders = 0
+
+    def render(self, *args):
+        self.renders += 1
+        return self.font.render(*args)
+
+    def get_linesize(self):
+        return self.font.get_linesize()
+
+def test_text_field_renders_only_on_change(window):
+    font = CountingFont()
+    field = TextField(font, "Score: {}", (10, 10))
+    first = field.update(5)
+    assert len(first) == 2 and font.renders == 1
+    assert field.update(5) == () and font.renders == 1
+    old = field.rect.copy()
+    assert field.update(1234) == [old, field.rect] and font.renders == 2
+    assert field.rect.width > old.width
+
+def test_text_panel_clears_to_its_old_region(window):
+    panel = TextPanel(CountingFont(), (190, 10), anchor="topright")
+    panel.update(["p50 1.0", "p95 2.0"])
+    assert panel.rect.right == 190 and panel.image() is not None
+    assert panel.update(["p50 1.0", "p95 2.0"]) == ()
+    shown = panel.rect.copy()
+    assert panel.update([]) == [shown] and panel.image() is None
+
+def test_overlay_is_built_once_per_key(window):
+    window.fill((255, 255, 255))
+    layer = OverlayLayer(alpha=128)
+    lines = lambda: [(solid((10, 10), (255, 0, 0)), 40)]
+    assert layer.show(window, "paused", lines)
+    assert not layer.show(window, "paused", lines)
+    shaded = window.get_at((0, 0))[:3]
+    assert shaded != (255, 255, 255) and window.get_at((100, 45))[:3] == (255, 0, 0)
+    assert layer.show(window, "game over", lines)
+    assert window.get_at((0, 0))[:3] == shaded  # Shaded from the same snapshot, not twice
+    layer.hide()
+    assert not layer.visible
+
+def test_camera_scrolls_to_keep_a_margin():
+    camera = Camera((10, 20), 40, (6, 6))
+    camera.reset((64, 64), (0, 32))
+    assert (camera.cols, camera.rows) == (6, 6)
+    assert (camera.x, camera.y) == (0, 28)  # Ship one cell above the bottom edge
+    assert not camera.follow(1, 31)
+    assert camera.follow(5, 31) and camera.x == 1
+    assert camera.to_screen(5, 31) == (10 + 4 * 40, 20 + 3 * 40)
+    camera.follow(63, 63)
+    assert (camera.x, camera.y) == (58, 58)  # Stops at the grid's edge
+
+def test_camera_culls_to_the_visible_cells():
+    camera = Camera((0, 0), 40, (6, 6))
+    camera.reset((64, 64), (30, 30))
+    cells = list(camera.cells())
+    assert len(cells) == 36
+    assert all(camera.x <= x < camera.x + 6 and camera.y <= y < camera.y + 6 for x, y in cells)
+
+    camera.reset((6, 5), (0, 2))  # A grid smaller than the view shows all of it
+    assert (camera.cols, camera.rows, camera.x, camera.y) == (6, 5, 0, 0)
+    assert len(list(camera.cells())) == 30
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from engine import GameEngine, LEVEL_COMPLETE, GAME_OVER
+from hints import HintSearch
+from level_generator import generate_level_data, level_rng
+from replay import Replay, HEADER, MAGIC, play_back, verify, verify_files
+
+def record_game(seed: int, levels: int = 3, grid_size=(6, 5)) -> Replay:
+    """Play the first levels of a game on hinted moves mixed with random ones"""
+    rng = random.Random(seed)
+    replay = Replay(seed=seed, grid_size=grid_size)
+    engine = GameEngine()
+    state = engine.state
+    while state.level <= levels and not state.game_over:
+        layout = generate_level_data(state.level, rng=level_rng(seed, state.level), grid_size=grid_size).layout
+        engine.load(layout)
+        search = HintSearch(layout, state.total_keys)
+        while True:
+            action = search.best_move(search.pack(engine.position, engine.layout.keys, engine.layout.barriers))[0]
+            if action is None or rng.random() < 0.2:
+                action = rng.randrange(4)
+            replay.record(action)
+            events = engine.act(action)
+            if events & (LEVEL_COMPLETE | GAME_OVER):
+                break
+    replay.score, replay.level = state.score, state.level
+    return replay
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_round_trip_through_bytes(seed):
+    replay = record_game(seed)
+    loaded = Replay.from_bytes(replay.to_bytes())
+    assert loaded == replay
+    assert verify(loaded)
+
+def test_round_trip_through_a_file(tmp_path):
+    replay = record_game(4, grid_size=(8, 7))
+    replay.record(3)  # A move count that does not fill the last byte
+    replay.record(1)
+    path = tmp_path / "game.sprp"
+    replay.save(str(path))
+    loaded = Replay.load(str(path))
+    assert loaded.moves == replay.moves and loaded.grid_size == (8, 7)
+    assert play_back(loaded).score == replay.score
+
+def test_verify_catches_a_wrong_score(tmp_path):
+    replay = record_game(5)
+    assert replay.score > 0
+    replay.score += 100
+    path = tmp_path / "tampered.sprp"
+    replay.save(str(path))
+    assert verify_files([str(path)]) == [(str(path), False, replay.score)]
+
+def test_rejects_bad_data():
+    data = record_game(6).to_bytes()
+    with pytest.raises(ValueError):
+        Replay.from_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        Replay.from_bytes(MAGIC + bytes([1]) + data[5:])  # Only version 2 exists
+    with pytest.raises(ValueError):
+        Replay.from_bytes(data[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        Replay.from_bytes(data[:-1])
@@ -0,0 +1,108 @@
+import pygame
+import pytest
+
+import scheduler
+from scheduler import CpuMeter, FrameScheduler, InputLatency, InputQueue
+
+class FakeClock:
+    """Stands in for the time module; sleep advances it instead of blocking"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.cpu = 0.0
+        self.slept = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def process_time(self):
+        return self.cpu
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+def test_logic_steps_follow_elapsed_time(clock):
+    frames = FrameScheduler(fps=60, tick_rate=60, max_steps=5)
+    assert frames.steps_due() == 1  # The first frame always gets one
+    clock.now += 1 / 60
+    assert frames.steps_due() == 1
+    clock.now += 0.5 / 60
+    assert frames.steps_due() == 0
+    clock.now += 0.5 / 60
+    assert frames.steps_due() == 1  # Carried over from the half step
+    clock.now += 3 / 60
+    assert frames.steps_due() == 3
+    assert frames.steps == 6 and frames.dropped == 0
+
+def test_stalls_are_capped_not_replayed(clock):
+    frames = FrameScheduler(fps=60, tick_rate=60, max_steps=5)
+    frames.steps_due()
+    clock.now += 1.0  # A one second stall
+    assert frames.steps_due() == 5 and frames.dropped == 55
+    clock.now += 1 / 60
+    assert frames.steps_due() == 1
+
+def test_frames_wait_for_a_fixed_grid(clock):
+    frames = FrameScheduler(fps=50)
+    frames.wait()
+    start = clock.now
+    clock.now += 0.005  # A quick frame sleeps out the rest of its period
+    frames.wait()
+    assert clock.now == pytest.approx(start + 0.02)
+    clock.now += 0.1  # A slow frame restarts the grid instead of catching up
+    frames.wait()
+    assert frames.next_frame == pytest.approx(clock.now + 0.02)
+
+def test_idle_wait_returns_the_event_and_grants_a_step(clock):
+    pygame.display.init()
+    try:
+        frames = FrameScheduler(idle_timeout=0.01)
+        frames.steps_due()
+        clock.now += 10.0  # Idle time does not count as logic time
+        event = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_UP)
+        pygame.event.post(event)
+        woke = frames.wait(idle=True)
+        assert woke.type == pygame.KEYDOWN and woke.key == pygame.K_UP
+        assert frames.steps_due() == 1 and frames.dropped == 0
+        assert frames.wait(idle=True) is None  # Timed out with nothing queued
+        assert frames.idle_waits == 2
+    finally:
+        pygame.display.quit()
+
+def test_input_queue_keeps_read_times_in_order():
+    moves = InputQueue(maxlen=2)
+    moves.push("up", 1.0)
+    moves.push("left", 2.0)
+    moves.push("down", 3.0)  # Oldest dropped once full
+    assert len(moves) == 2 and moves.pop() == ("left", 2.0)
+    moves.clear()
+    assert not moves
+
+def test_latency_runs_from_read_to_present(clock):
+    latency = InputLatency()
+    latency.applied(clock.now)
+    latency.applied(clock.now + 0.004)
+    clock.now += 0.010
+    latency.presented()
+    latency.presented()  # Nothing new to present
+    assert sorted(latency.samples) == pytest.approx([0.006, 0.010])
+    assert latency.percentiles()["p99"] == pytest.approx(10.0)
+
+def test_cpu_meter_charges_each_state(clock):
+    meter = CpuMeter()
+    meter.enter("playing")
+    clock.now += 1.0
+    clock.cpu += 0.5
+    meter.enter("waiting")
+    clock.now += 2.0
+    clock.cpu += 0.02
+    meter.enter("exit")
+    assert meter.usage() == pytest.approx({"playing": 0.5, "waiting": 0.01})
+    assert meter.report() == "cpu    playing 50.0% waiting 1.0%"
@@ -0,0 +1,34 @@
+import os
+
+from soak import SoakSample, check, floor_growth, run
+
+def samples(traced_kb, objects=None, surfaces=None, fallbacks=0):
+    count = len(traced_kb)
+    objects = objects or [1000] * count
+    surfaces = surfaces or [40] * count
+    return [SoakSample(levels=i, games=0, moves=i, elapsed=0.0, traced_kb=kb, blocks=0, objects=o,
+                       surfaces=s, collections=0, pooled=0, fallbacks=fallbacks)
+            for i, (kb, o, s) in enumerate(zip(traced_kb, objects, surfaces))]
+
+def test_growth_is_measured_between_floors():
+    # A spike in either half is a worker mid-search, not a leak
+    assert floor_growth(samples([100, 900, 110, 105, 800, 112]), "traced_kb") == 5
+    assert floor_growth(samples([100, 200, 300, 400]), "traced_kb") == 200
+    assert floor_growth(samples([100]), "traced_kb") == 0
+
+def test_check_names_every_threshold_passed():
+    steady = samples([100, 104, 102, 101])
+    assert check(steady, 256, 2000, 4, 3) == []
+    leaking = samples([100, 200, 500, 600], objects=[1000, 1500, 4000, 4100],
+                      surfaces=[40, 40, 52, 52], fallbacks=5)
+    failures = check(leaking, 256, 2000, 4, 3)
+    assert len(failures) == 4
+    assert failures[0].startswith("traced memory grew 400 KB")
+
+def test_short_run_plays_and_samples(monkeypatch):
+    monkeypatch.chdir(os.getcwd())  # run() moves into the game's directory
+    found, baseline, last = run(levels=4, minutes=None, warmup=1, sample_every=1, seed=1)
+    assert [s.levels for s in found][:3] == [1, 2, 3]
+    assert found[-1].levels >= 4 and found[-1].moves > 0
+    assert baseline is not None and last is not None
+    assert check(found, 4096, 100_000, 64, 3) == []
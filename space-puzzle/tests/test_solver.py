@@ -0,0 +1,91 @@
+from collections import deque
+
+import pytest
+
+from engine import GameEngine, DIRECTIONS, GAME_OVER, LEVEL_COMPLETE
+from game_state import CompactLevel, GameState, PathValidator
+from level_generator import generate_level_data, level_rng
+
+def open_level(**kwargs) -> CompactLevel:
+    """The standard 6x5 grid, ship at (0, 2) and portal at (5, 2)"""
+    return CompactLevel(6, 5, **kwargs)
+
+def walled(barrier: bool = True) -> CompactLevel:
+    """Column x=3 blocked by asteroids, with a barrier in the middle row"""
+    level = open_level()
+    geometry = level.geometry
+    for y in (0, 1, 3, 4):
+        level.add_asteroid(geometry.index(3, y))
+    if barrier:
+        level.add_barrier(geometry.index(3, 2), (255, 0, 0))
+    else:
+        level.add_asteroid(geometry.index(3, 2))
+    return level
+
+def brute_force(level: CompactLevel, start_keys: int = 0) -> int:
+    """Fewest moves by breadth-first search over GameEngine states, -1 if none"""
+    engine = GameEngine(GameState())
+    engine.load(level)
+    start = (engine.position, engine.layout.keys, engine.layout.barriers, start_keys)
+    seen = {start}
+    queue = deque([(start, 0)])
+    while queue:
+        (position, keys, barriers, held), moves = queue.popleft()
+        for action in range(len(DIRECTIONS)):
+            engine.state = GameState()
+            engine.state.total_keys = held
+            engine.layout.keys, engine.layout.barriers = keys, barriers
+            engine.position = position
+            events = engine.act(action)
+            if events & LEVEL_COMPLETE:
+                return moves + 1
+            if events & GAME_OVER:
+                continue
+            state = (engine.position, engine.layout.keys, engine.layout.barriers, engine.state.total_keys)
+            if state not in seen:
+                seen.add(state)
+                queue.append((state, moves + 1))
+    return -1
+
+def test_straight_line():
+    result = PathValidator.solve_level(open_level())
+    assert result.solvable and result.moves == 5
+
+def test_key_detour():
+    level = open_level()
+    level.add_key(level.geometry.index(0, 0), (255, 255, 0))
+    assert PathValidator.solve_level(level).moves == 2 + 7
+
+def test_barrier_needs_a_key():
+    assert not PathValidator.solve_level(walled()).solvable
+    assert PathValidator.solve_level(walled(), start_keys=1).moves == 5
+    level = walled()
+    level.add_key(level.geometry.index(0, 0), (255, 255, 0))
+    assert PathValidator.solve_level(level).moves == 9
+
+def test_teleporter_shortcut():
+    level = walled(barrier=False)
+    geometry = level.geometry
+    level.link_teleporters(geometry.index(2, 2), geometry.index(4, 2))
+    assert PathValidator.solve_level(level).moves == 3
+
+def test_unreachable_key_is_rejected_without_search():
+    level = walled(barrier=False)
+    level.add_key(level.geometry.index(5, 0), (255, 255, 0))
+    result = PathValidator.solve_level(level)
+    assert (result.solvable, result.moves, result.states_explored) == (False, -1, 0)
+
+def test_solve_from_cell_codes():
+    grid = [[0] * 6 for _ in range(5)]
+    grid[2][3] = 5
+    result = PathValidator.solve(grid, [(1, 0)], (5, 2), {}, (6, 5))
+    assert result.moves == 1 + 2 + 6
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("level_num", [1, 4, 8])
+def test_matches_brute_force(seed, level_num):
+    layout = generate_level_data(level_num, rng=level_rng(seed, level_num)).layout
+    for start_keys in (0, 1):
+        result = PathValidator.solve_level(layout.copy(), start_keys)
+        assert result.moves == brute_force(layout, start_keys)
+        assert result.solvable == (result.moves >= 0)
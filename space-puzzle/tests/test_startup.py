@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+import pygame
+import pytest
+
+import startup
+from startup import StartupTimer, load_font, load_parallel, load_scaled
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(startup, "CACHE_DIR", str(cache))
+    monkeypatch.setattr(startup, "FONT_CACHE", str(cache / "fonts.json"))
+    pygame.display.init()
+    pygame.font.init()
+    yield cache
+    pygame.quit()
+
+def refuse(*args, **kwargs):
+    raise AssertionError("cache not used")
+
+def test_font_lookup_is_remembered(cache_dir, monkeypatch):
+    font = load_font("monospace", 14)
+    assert font.get_height() > 0
+    assert "monospace:0:0" in json.loads((cache_dir / "fonts.json").read_text())
+
+    monkeypatch.setattr(pygame.font, "SysFont", refuse)
+    assert load_font("monospace", 20).get_height() > font.get_height()
+
+def test_scaled_image_is_cached_until_the_source_changes(cache_dir, tmp_path, monkeypatch):
+    source = tmp_path / "bg.png"
+    image = pygame.Surface((4, 4))
+    image.fill((10, 20, 30))
+    pygame.image.save(image, str(source))
+
+    assert load_scaled(str(source), (8, 6)).get_size() == (8, 6)
+    assert len(list(cache_dir.glob("bg-8x6-*.bmp"))) == 1
+    with monkeypatch.context() as patched:
+        patched.setattr(pygame.transform, "scale", refuse)
+        cached = load_scaled(str(source), (8, 6))
+    assert cached.get_size() == (8, 6) and cached.get_at((7, 5))[:3] == (10, 20, 30)
+
+    stamp = os.stat(source).st_mtime_ns + 1_000_000_000
+    os.utime(source, ns=(stamp, stamp))
+    load_scaled(str(source), (8, 6))
+    assert [path.name for path in cache_dir.glob("bg-8x6-*.bmp")] == [f"bg-8x6-{stamp}.bmp"]
+
+def test_loaders_run_together():
+    started = time.perf_counter()
+    loaded = load_parallel({name: (lambda name=name: time.sleep(0.05) or name) for name in "abcd"})
+    assert loaded == {name: name for name in "abcd"}
+    assert time.perf_counter() - started < 0.15
+
+def test_timer_reports_each_step():
+    timer = StartupTimer(time.perf_counter())
+    timer.mark("imports")
+    timer.mark("display")
+    assert timer.frame_presented() and not timer.frame_presented()
+    report = timer.report()
+    assert report.startswith("First frame after ") and "imports" in report and "display" in report
@@ -0,0 +1,88 @@
+import json
+
+from submission import (Journal, StubEndpoint, SubmissionQueue, Submission, coalesce,
+                        SCORE, ACHIEVEMENT)
+
+def test_journal_keeps_only_unacknowledged_events(tmp_path):
+    path = str(tmp_path / "submissions.journal")
+    journal = Journal(path)
+    first = journal.append(SCORE, "ann", 120, 2)
+    second = journal.append(ACHIEVEMENT, "ann", 3)
+    journal.append(SCORE, "bob", 80, 1)
+    journal.acknowledge([first.seq, second.seq])
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"op": "add", "event": {"seq"')  # Torn by a crash
+
+    reopened = Journal(path)
+    assert [(e.kind, e.player, e.value, e.level) for e in reopened.pending()] == [(SCORE, "bob", 80, 1)]
+    assert reopened.append(SCORE, "bob", 90, 2).seq == 4  # Numbering carries on
+    reopened.close()
+    # Compacted on open: the acknowledged events and the torn line are gone
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["event"]["seq"] for r in records] == [3, 4]
+
+def test_coalesce_one_entry_per_player():
+    events = [
+        Submission(1, SCORE, "ann", 100, 1),
+        Submission(2, ACHIEVEMENT, "ann", 4),
+        Submission(3, SCORE, "ann", 300, 3),
+        Submission(4, SCORE, "ann", 200, 2),
+        Submission(5, ACHIEVEMENT, "ann", 1),
+        Submission(6, ACHIEVEMENT, "ann", 4),
+        Submission(7, ACHIEVEMENT, "bob", 0),
+    ]
+    assert coalesce(events) == [
+        {"player": "ann", "score": 300, "level": 3, "achievements": [1, 4]},
+        {"player": "bob", "score": None, "level": 0, "achievements": [0]},
+    ]
+
+def test_queue_sends_in_batches_and_acknowledges(tmp_path):
+    endpoint = StubEndpoint()
+    queue = SubmissionQueue(endpoint, str(tmp_path / "submissions.journal"), flush_interval=0.05)
+    queue.start()
+    for score in (100, 250, 180):
+        queue.submit_score("ann", score, score // 100)
+    queue.submit_achievement("ann", 2)
+    queue.stop()
+
+    entries = [entry for batch in endpoint.batches for entry in batch["entries"]]
+    assert max(entry["score"] for entry in entries if entry["score"] is not None) == 250
+    assert [a for entry in entries for a in entry["achievements"]] == [2]
+    assert queue.metrics.sent == 4 and queue.metrics.pending == 0
+    assert not Journal(str(tmp_path / "submissions.journal")).pending()
+
+def test_unsent_events_are_sent_after_a_restart(tmp_path):
+    path = str(tmp_path / "submissions.journal")
+    down = SubmissionQueue(StubEndpoint(fail_rate=1.0), path, flush_interval=0.01,
+                           backoff_base=0.01, backoff_max=0.05)
+    down.start()
+    down.submit_score("ann", 500, 5)
+    down.submit_achievement("ann", 7)
+    down.stop(timeout=0.2)
+    assert down.metrics.sent == 0 and down.metrics.retries > 0
+
+    endpoint = StubEndpoint()
+    up = SubmissionQueue(endpoint, path, flush_interval=0.01)
+    assert up.metrics.pending == 2
+    up.start()
+    up.stop()
+    assert endpoint.batches[0]["entries"] == [{"player": "ann", "score": 500, "level": 5, "achievements": [7]}]
+    assert up.metrics.pending == 0
+
+def test_events_after_stop_stay_journaled(tmp_path):
+    path = str(tmp_path / "submissions.journal")
+    queue = SubmissionQueue(StubEndpoint(), path, flush_interval=0.01)
+    queue.start()
+    queue.submit_score("ann", 100, 1)
+    queue.stop()
+    queue.stop()  # Nothing left to stop
+    queue.submit_score("ann", 300, 3)  # The worker is gone; no loop to schedule on
+    assert [event.value for event in Journal(path).pending()] == [300]
+
+    endpoint = StubEndpoint()
+    again = SubmissionQueue(endpoint, path, flush_interval=0.01)
+    again.start()
+    again.stop()
+    assert endpoint.batches[0]["entries"][0]["score"] == 300